@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+
+from fastapi import Request
+
+from app.api.deps import CurrentUser
+from app.api.metrics import record_stage
+from app.api.repositories.admin_scope_repo import AdminScopeRepo
+from app.db.database import Database
+
+
+ScopeKey = tuple[int, str]
+
+
+class AdminScopeCache:
+    """TTL+LRU кэш магазинов/ресторанов администратора по ключу (user_id, role).
+
+    Параллельные промахи по одному ключу склеиваются в один запрос к БД.
+    """
+
+    def __init__(self, ttl_seconds: float = 30.0, max_entries: int = 10_000) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict[ScopeKey, tuple[float, frozenset[int]]] = OrderedDict()
+        self._pending: dict[ScopeKey, asyncio.Task[frozenset[int]]] = {}
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key: ScopeKey, loader: Callable[[], Awaitable[frozenset[int]]]) -> frozenset[int]:
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+        task = self._pending.get(key)
+        if task:
+            self.coalesced += 1
+        else:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader, self._generation))
+            self._pending[key] = task
+        return await asyncio.shield(task)
+
+    async def _load(
+        self,
+        key: ScopeKey,
+        loader: Callable[[], Awaitable[frozenset[int]]],
+        generation: int,
+    ) -> frozenset[int]:
+        try:
+            value = await loader()
+            # Если во время загрузки была инвалидация, результат может быть устаревшим.
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+            return value
+        finally:
+            self._pending.pop(key, None)
+
+    def invalidate(self, user_id: int | None = None) -> None:
+        """Сбрасывает записи пользователя (или весь кэш) после смены назначений администраторов."""
+        self._generation += 1
+        if user_id is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if k[0] == user_id]:
+            del self._entries[key]
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+async def _load_admin_shop_ids(db: Database, user: CurrentUser) -> frozenset[int]:
+    if user.role == "admin_shop":
+        return frozenset(await AdminScopeRepo(db).shop_ids(user.user_id))
+    if user.role == "admin_restaurant":
+        return frozenset(await AdminScopeRepo(db).restaurant_ids(user.user_id))
+    return frozenset()
+
+
+async def allowed_shop_ids(db: Database, user: CurrentUser, cache: AdminScopeCache) -> frozenset[int]:
+    if user.role not in {"admin_shop", "admin_restaurant"}:
+        return frozenset()
+    if user.shop_ids is not None:
+        return user.shop_ids
+    started = time.perf_counter()
+    shop_ids = await cache.get((user.user_id, user.role), lambda: _load_admin_shop_ids(db, user))
+    record_stage("authz", started)
+    return shop_ids
+
+
+def get_scope_cache(request: Request) -> AdminScopeCache:
+    cache = getattr(request.app.state, "scope_cache", None)
+    if not cache:
+        raise RuntimeError("Admin scope cache is not initialized")
+    return cache
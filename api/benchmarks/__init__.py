@@ -0,0 +1 @@
+"""Бенчмарки API. Запуск: python -m app.api.benchmarks.<имя>."""
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_shops
+
+
+ADMIN_ID = 100
+
+
+async def _run_mode(db_path: Path, scope_claims: bool, repeat: int) -> dict:
+    os.environ["DB_PATH"] = str(db_path)
+    os.environ["API_JWT_SCOPE_CLAIMS"] = "1" if scope_claims else "0"
+    from app.api.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            auth = await client.post("/auth/telegram", json={"telegram_user_id": ADMIN_ID})
+            headers = {"Authorization": f"Bearer {auth.json()['access_token']}"}
+
+            async def orders_page() -> None:
+                resp = await client.get("/orders?limit=20", headers=headers)
+                resp.raise_for_status()
+
+            # Без встроенных прав кэш ownership тоже отключён: сравниваем с запросом в БД.
+            app.state.scope_cache.ttl_seconds = 0
+            return await measure(orders_page, repeat)
+
+
+async def _main(repeat: int) -> None:
+    os.environ.setdefault("API_JWT_SECRET", "bench-secret")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "auth.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 50)
+        conn.execute("UPDATE shops SET admin_user_id=? WHERE id % 5 = 0", (ADMIN_ID,))
+        conn.commit()
+        conn.close()
+        report = {
+            "db_lookup": await _run_mode(path, scope_claims=False, repeat=repeat),
+            "token_claims": await _run_mode(path, scope_claims=True, repeat=repeat),
+        }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Латентность запроса администратора с правами в токене и без")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(_main(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.chat_fanout import _free_port, _request
+from app.api.benchmarks.fixtures import create_synthetic_db, seed_categories, seed_products, seed_shops
+
+
+CLIENT_ID = 10
+# Экран магазина в приложении: список магазинов, категории выбранного магазина,
+# товары первой категории, последние заказы и чаты.
+SCREEN = [
+    "/catalog/merchants?type=shop&limit=20",
+    "/catalog/1/categories?limit=20",
+    "/catalog/categories/1/items?merchant_id=1&limit=20",
+    "/orders?limit=20",
+    "/chats?limit=20",
+]
+
+
+class SlowLink:
+    """Клиентское соединение с искусственной задержкой: RTT на каждый обмен и на установку.
+
+    Установка соединения стоит `setup_rtts` RTT (TCP + TLS), каждый запрос — ещё один RTT
+    сверх реального времени сервера.
+    """
+
+    def __init__(self, port: int, rtt: float, setup_rtts: int) -> None:
+        self.port = port
+        self.rtt = rtt
+        self.setup_rtts = setup_rtts
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def connect(self) -> None:
+        await asyncio.sleep(self.rtt * self.setup_rtts)
+        self.reader, self.writer = await asyncio.open_connection("127.0.0.1", self.port)
+
+    async def request(
+        self, method: str, path: str, token: str, body: bytes = b"", headers: dict[str, str] | None = None
+    ) -> bytes:
+        await asyncio.sleep(self.rtt / 2)
+        head = f"{method} {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+        if body:
+            head += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+        self.writer.write(head.encode() + b"\r\n" + body)
+        payload = await self._read_response()
+        await asyncio.sleep(self.rtt / 2)
+        return payload
+
+    async def _read_response(self) -> bytes:
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        headers = {}
+        for line in head.split(b"\r\n")[1:]:
+            if b":" in line:
+                name, value = line.split(b":", 1)
+                headers[name.strip().lower()] = value.strip()
+        if headers.get(b"transfer-encoding") == b"chunked":
+            chunks = []
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).strip(), 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    return b"".join(chunks)
+                chunks.append(chunk[:-2])
+        return await self.reader.readexactly(int(headers.get(b"content-length", b"0")))
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+
+async def _serial(port: int, token: str, rtt: float, setup_rtts: int) -> float:
+    """Как сейчас в приложении: запросы по очереди на одном keep-alive соединении."""
+    started = time.perf_counter()
+    link = SlowLink(port, rtt, setup_rtts)
+    await link.connect()
+    try:
+        for path in SCREEN:
+            await link.request("GET", path, token)
+    finally:
+        link.close()
+    return time.perf_counter() - started
+
+
+async def _parallel(port: int, token: str, rtt: float, setup_rtts: int) -> float:
+    """Все запросы сразу, каждый на своём соединении (HTTP/1.1 без пайплайна)."""
+    started = time.perf_counter()
+
+    async def one(path: str) -> None:
+        link = SlowLink(port, rtt, setup_rtts)
+        await link.connect()
+        try:
+            await link.request("GET", path, token)
+        finally:
+            link.close()
+
+    await asyncio.gather(*(one(path) for path in SCREEN))
+    return time.perf_counter() - started
+
+
+async def _batch(port: int, token: str, rtt: float, setup_rtts: int) -> float:
+    started = time.perf_counter()
+    link = SlowLink(port, rtt, setup_rtts)
+    await link.connect()
+    try:
+        body = json.dumps({"requests": [{"id": str(i), "path": path} for i, path in enumerate(SCREEN)]}).encode()
+        result = json.loads(await link.request("POST", "/batch", token, body))
+        assert all(item["status"] == 200 for item in result["responses"]), result
+    finally:
+        link.close()
+    return time.perf_counter() - started
+
+
+async def _main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "batch.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 50)
+        seed_categories(conn, 1, 20)
+        seed_products(conn, 5_000, [1, 2, 3])
+        conn.execute("UPDATE products SET category_id = 1 WHERE shop_id = 1 AND id % 3 = 0")
+        conn.executemany(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (?, ?, 'new', 100)",
+            ((i % 50 + 1, CLIENT_ID) for i in range(100)),
+        )
+        conn.commit()
+        conn.close()
+
+        port = _free_port()
+        env = {
+            **os.environ,
+            "DB_PATH": str(path),
+            "API_JWT_SECRET": os.getenv("API_JWT_SECRET", "bench-secret"),
+            "API_DB_POOL": "1",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.api.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(200):
+                try:
+                    _request(base_url, "GET", "/health")
+                    break
+                except OSError:
+                    await asyncio.sleep(0.05)
+            token = _request(base_url, "POST", "/auth/telegram", {"telegram_user_id": CLIENT_ID})["access_token"]
+            report: dict = {"screen_requests": len(SCREEN), "setup_rtts": args.setup_rtts}
+            for rtt_ms in [float(x) for x in args.rtt_ms.split(",")]:
+                row = {}
+                for name, scenario in (("serial", _serial), ("parallel", _parallel), ("batch", _batch)):
+                    samples = [await scenario(port, token, rtt_ms / 1000, args.setup_rtts) for _ in range(args.repeat)]
+                    row[f"{name}_p50_ms"] = round(statistics.median(samples) * 1000, 1)
+                report[f"rtt_{rtt_ms:g}ms"] = row
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Загрузка экрана магазина на медленной сети: по очереди, параллельно и через /batch"
+    )
+    parser.add_argument("--rtt-ms", default="0,50,150,300")
+    parser.add_argument("--setup-rtts", type=int, default=2, help="RTT на установку соединения (TCP + TLS 1.3)")
+    parser.add_argument("--repeat", type=int, default=10)
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_categories, seed_shops
+from app.api.migrations import apply_migrations
+from app.api.repositories.catalog_repo import CatalogRepo
+from app.db.database import DBConfig, Database
+from app.repositories.categories_repo import CategoriesRepo
+from app.repositories.shops_repo import ShopsRepo
+
+
+PAGE = 20
+
+
+async def _legacy_shops_page(db: Database, cursor_id: int) -> list[dict]:
+    items = list(await ShopsRepo(db).list_active("shop"))
+    return [row for row in items if int(row["id"]) > cursor_id][: PAGE + 1]
+
+
+async def _legacy_categories_page(db: Database, cursor_id: int) -> list[dict]:
+    items = list(await CategoriesRepo(db).list_for_shop(1, active_only=True))
+    return [row for row in items if int(row["id"]) > cursor_id][: PAGE + 1]
+
+
+async def _run_size(workdir: Path, size: int, repeat: int) -> dict:
+    path = workdir / f"catalog_{size}.db"
+    conn = create_synthetic_db(path)
+    seed_shops(conn, size)
+    seed_categories(conn, shop_id=1, count=size)
+    conn.close()
+
+    db = Database(DBConfig(path=str(path)))
+    await apply_migrations(db)
+    repo = CatalogRepo(db)
+    tail_cursor = size - PAGE * 2
+
+    result: dict[str, dict] = {}
+    for label, cursor_id in (("first_page", 0), ("last_page", tail_cursor)):
+        result[f"shops_legacy_{label}"] = await measure(lambda: _legacy_shops_page(db, cursor_id), repeat)
+        result[f"shops_keyset_{label}"] = await measure(
+            lambda: repo.list_active_shops_page("shop", cursor_id, PAGE + 1), repeat
+        )
+        result[f"categories_legacy_{label}"] = await measure(
+            lambda: _legacy_categories_page(db, cursor_id), repeat
+        )
+        result[f"categories_keyset_{label}"] = await measure(
+            lambda: repo.list_active_categories_page(1, cursor_id, PAGE + 1), repeat
+        )
+    return result
+
+
+async def _main(sizes: list[int], repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        report = {str(size): await _run_size(Path(tmp), size, repeat) for size in sizes}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Латентность страницы каталога в зависимости от размера")
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(_main([int(x) for x in args.sizes.split(",")], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_products, seed_shops
+from app.api.catalog_snapshot import CatalogSnapshot
+from app.api.db_pool import read_conn
+from app.api.migrations import apply_migrations
+from app.api.repositories.search_repo import SearchRepo
+from app.api.routes.catalog import _CATEGORY_ITEMS_QUERY, _SNAPSHOT_CATEGORY_ITEMS_QUERY
+from app.db.database import DBConfig, Database
+
+
+QUERIES = ["хлеб", "самс"]
+
+
+async def _page(db: Database, query, shop_id: int, category_id: int) -> list[tuple]:
+    async with read_conn(db) as conn:
+        return await query.fetch(conn, (shop_id, category_id, 0, 21))
+
+
+async def _run_size(workdir: Path, size: int, repeat: int) -> dict:
+    path = workdir / f"snapshot_{size}.db"
+    conn = create_synthetic_db(path)
+    seed_shops(conn, 200)
+    seed_products(conn, size, shop_ids=list(range(1, 201)))
+    conn.close()
+
+    db = Database(DBConfig(path=str(path)))
+    await apply_migrations(db)
+    await SearchRepo(db).rebuild_index()
+    snapshot = CatalogSnapshot()
+    started = time.perf_counter()
+    await snapshot.refresh(db)
+    result: dict[str, dict | float] = {"full_build_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    # Правка одного товара: пересобирается только его магазин.
+    async with db.conn() as conn:
+        await conn.execute("UPDATE products SET price = price + 1 WHERE id = 1")
+        await conn.commit()
+    started = time.perf_counter()
+    rows = await snapshot.refresh(db)
+    result["incremental_refresh_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    result["incremental_rows"] = rows
+
+    result["category_items_live"] = await measure(lambda: _page(db, _CATEGORY_ITEMS_QUERY, 1, 7), repeat)
+    result["category_items_snapshot"] = await measure(
+        lambda: _page(db, _SNAPSHOT_CATEGORY_ITEMS_QUERY, 1, 7), repeat
+    )
+    live, snap = SearchRepo(db), SearchRepo(db, snapshot=True)
+    for query in QUERIES:
+        result[f"fts_live:{query}"] = await measure(lambda: live.search_fts(query, "shop", None, 21), repeat)
+        result[f"fts_snapshot:{query}"] = await measure(lambda: snap.search_fts(query, "shop", None, 21), repeat)
+        result[f"like_live:{query}"] = await measure(lambda: live.search_like(query, "shop", 0, 21), repeat)
+        result[f"like_snapshot:{query}"] = await measure(lambda: snap.search_like(query, "shop", 0, 21), repeat)
+    return result
+
+
+async def _main(sizes: list[int], repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        report = {str(size): await _run_size(Path(tmp), size, repeat) for size in sizes}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Чтение каталога из живых таблиц и из снимка api_catalog_items")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(_main([int(x) for x in args.sizes.split(",")], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
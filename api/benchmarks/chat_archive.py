@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_shops
+from app.api.chat_archive import ChatArchiver
+from app.api.migrations import apply_migrations
+from app.api.routes.chats import MESSAGE_SORTS, _message_rows
+from app.db.database import DBConfig, Database
+
+
+PHRASES = [
+    "Здравствуйте, заказ уже собирают?",
+    "Да, курьер выедет через 15 минут",
+    "Можно заменить молоко на кефир?",
+    "Заменили, сумма не изменилась",
+    "Спасибо, жду",
+]
+
+
+def _seed(path: Path, orders: int, per_order: int, active_share: float) -> list[int]:
+    """Заказы с чатами: большинство давно закрыты, остальные активны. Возвращает id активных."""
+    conn = create_synthetic_db(path)
+    seed_shops(conn, 50)
+    rnd = random.Random(11)
+    active = []
+    for order_id in range(1, orders + 1):
+        is_active = rnd.random() < active_share
+        if is_active:
+            active.append(order_id)
+        conn.execute(
+            "INSERT INTO orders(id, shop_id, client_user_id, status, total_amount, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, 100, datetime('now', ?), datetime('now', ?))",
+            (
+                order_id,
+                rnd.randint(1, 50),
+                rnd.randint(100, 10_000),
+                "new" if is_active else "done",
+                "-1 days" if is_active else "-200 days",
+                "-1 days" if is_active else "-200 days",
+            ),
+        )
+    conn.executemany(
+        "INSERT INTO order_chat_messages(order_id, sender_user_id, sender_role, message_text, created_at)"
+        " VALUES (?, ?, ?, ?, datetime('now', '-200 days'))",
+        (
+            (order_id, 1, "client" if i % 2 == 0 else "admin_shop", f"{rnd.choice(PHRASES)} #{i}")
+            for order_id in range(1, orders + 1)
+            for i in range(per_order)
+        ),
+    )
+    conn.commit()
+    conn.close()
+    return active
+
+
+def _size(path: Path) -> int:
+    return sum(os.path.getsize(p) for p in (str(path), f"{path}-wal") if os.path.exists(p))
+
+
+def _page(db: Database, order_id: int, sort: str, limit: int = 31):
+    return lambda: _message_rows(db, order_id, sort, MESSAGE_SORTS[sort], None, limit)
+
+
+async def _main(orders: int, per_order: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "chat_archive.db"
+        active = _seed(path, orders, per_order, active_share=0.05)
+        db = Database(DBConfig(path=str(path)))
+        await apply_migrations(db)
+        hot, cold = active[0], next(i for i in range(1, orders + 1) if i not in set(active))
+
+        report: dict[str, object] = {"orders": orders, "messages": orders * per_order, "db_bytes_before": _size(path)}
+        report["active_newest_before"] = await measure(_page(db, hot, "-id"), repeat)
+        report["closed_oldest_before"] = await measure(_page(db, cold, "id"), repeat)
+
+        archiver = ChatArchiver(days=90, closed_statuses=["cancelled", "done"], batch_orders=200, pause_seconds=0)
+        started = time.perf_counter()
+        await archiver.run_pass(db)
+        report["archive_pass_seconds"] = round(time.perf_counter() - started, 2)
+        report["archive"] = archiver.stats()
+        async with db.conn() as conn:
+            await conn.execute("VACUUM")
+            await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        report["db_bytes_after_vacuum"] = _size(path)
+
+        report["active_newest_after"] = await measure(_page(db, hot, "-id"), repeat)
+        report["closed_oldest_after"] = await measure(_page(db, cold, "id"), repeat)
+        report["closed_newest_after"] = await measure(_page(db, cold, "-id"), repeat)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Чаты закрытых заказов в таблице и в сжатом архиве")
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--per-order", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(_main(args.orders, args.per_order, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, seed_shops
+
+
+CLIENT_ID = 10
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _rss_kib(pid: int) -> int:
+    for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+        if line.startswith("VmRSS:"):
+            return int(line.split()[1])
+    return 0
+
+
+def _request(base_url: str, method: str, path: str, payload: dict | None = None, token: str | None = None) -> dict:
+    req = urllib.request.Request(
+        f"{base_url}{path}",
+        data=json.dumps(payload).encode("utf-8") if payload is not None else None,
+        headers={"Content-Type": "application/json", **({"Authorization": f"Bearer {token}"} if token else {})},
+        method=method,
+    )
+    with urllib.request.urlopen(req) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+async def _subscriber(port: int, path: str, token: str, ready: asyncio.Event, received: dict[int, float]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\nAccept: text/event-stream\r\n\r\n".encode()
+    )
+    await writer.drain()
+    await reader.readuntil(b"\r\n\r\n")
+    ready.set()
+    try:
+        while True:
+            chunk = await reader.readuntil(b"\n\n")
+            for line in chunk.decode("utf-8", "replace").splitlines():
+                if line.startswith("id: "):
+                    received.setdefault(int(line[4:]), time.perf_counter())
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _main(subscribers: int, messages: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "chat.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 2)
+        conn.execute(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (2, ?, 'new', 100)", (CLIENT_ID,)
+        )
+        conn.commit()
+        conn.close()
+
+        port = _free_port()
+        env = {**os.environ, "DB_PATH": str(path), "API_JWT_SECRET": os.getenv("API_JWT_SECRET", "bench-secret")}
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.api.main:app", "--port", str(port), "--log-level", "warning"],
+            env=env,
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            for _ in range(100):
+                try:
+                    _request(base_url, "GET", "/health")
+                    break
+                except OSError:
+                    await asyncio.sleep(0.1)
+            token = _request(base_url, "POST", "/auth/telegram", {"telegram_user_id": CLIENT_ID})["access_token"]
+            rss_before = _rss_kib(server.pid)
+
+            received: list[dict[int, float]] = [{} for _ in range(subscribers)]
+            tasks = []
+            for i in range(subscribers):
+                ready = asyncio.Event()
+                tasks.append(asyncio.create_task(_subscriber(port, "/chats/1/stream", token, ready, received[i])))
+                await ready.wait()
+            rss_idle = _rss_kib(server.pid)
+
+            sent: dict[int, float] = {}
+            for i in range(messages):
+                started = time.perf_counter()
+                result = await asyncio.to_thread(
+                    _request, base_url, "POST", "/chats/1/messages", {"text": f"сообщение {i}"}, token
+                )
+                sent[result["message_id"]] = started
+                await asyncio.sleep(0.2)
+            await asyncio.sleep(1.0)
+
+            latencies = [
+                (got[message_id] - sent_at) * 1000
+                for got in received
+                for message_id, sent_at in sent.items()
+                if message_id in got
+            ]
+            latencies.sort()
+            expected = subscribers * messages
+            report = {
+                "subscribers": subscribers,
+                "messages": messages,
+                "delivered": len(latencies),
+                "delivery_ratio": round(len(latencies) / expected, 4) if expected else 0,
+                "fanout_latency_p50_ms": round(statistics.median(latencies), 2) if latencies else None,
+                "fanout_latency_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2) if latencies else None,
+                "server_rss_kib_before": rss_before,
+                "server_rss_kib_idle_subscribers": rss_idle,
+                "rss_per_subscriber_kib": round((rss_idle - rss_before) / subscribers, 2) if subscribers else 0,
+            }
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            server.terminate()
+            server.wait()
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Нагрузочный тест SSE-чатов: тысячи простаивающих подписчиков на одном воркере. "
+        "Нужен достаточный лимит файловых дескрипторов (ulimit -n)."
+    )
+    parser.add_argument("--subscribers", type=int, default=2000)
+    parser.add_argument("--messages", type=int, default=10)
+    args = parser.parse_args()
+    asyncio.run(_main(args.subscribers, args.messages))
+
+
+if __name__ == "__main__":
+    main()
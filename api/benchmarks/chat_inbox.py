@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_shops
+from app.api.migrations import API_MIGRATIONS
+from app.api.routes.chats import _SUMMARY_QUERIES, INBOX_KEYSET
+from app.db.database import DBConfig, Database
+
+
+SHOP_IDS = [1, 2, 3, 4, 5]
+CLIENT_ID = 7
+
+
+async def _legacy_inbox(db: Database, limit: int) -> list:
+    """Прежний list_chats: агрегация MAX() по order_chat_messages на каждый запрос."""
+    async with db.conn() as conn:
+        cur = await conn.execute(
+            """
+            SELECT o.id AS order_id, MAX(m.id) AS last_message_id, MAX(m.created_at) AS last_message_at
+            FROM orders o
+            JOIN order_chat_messages m ON m.order_id = o.id
+            WHERE o.id > ? AND o.shop_id IN (SELECT value FROM json_each(?))
+            GROUP BY o.id
+            ORDER BY o.id ASC
+            LIMIT ?
+            """,
+            (0, json.dumps(SHOP_IDS), limit + 1),
+        )
+        return await cur.fetchall()
+
+
+async def _summary_inbox(db: Database, side: str, owner: object, limit: int) -> list:
+    async with db.conn() as conn:
+        return await _SUMMARY_QUERIES[(INBOX_KEYSET.name, side, False)].fetch(conn, (owner, limit + 1))
+
+
+async def _main(orders: int, messages: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "inbox.db"
+        conn = create_synthetic_db(path)
+        for statement in API_MIGRATIONS:
+            conn.execute(statement)
+        seed_shops(conn, 50)
+        rnd = random.Random(5)
+        conn.executemany(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (?, ?, 'new', 100)",
+            ((rnd.randint(1, 50), CLIENT_ID if i % 100 == 0 else rnd.randint(100, 10_000)) for i in range(orders)),
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_bench_messages_order ON order_chat_messages(order_id, id)")
+        started = time.perf_counter()
+        conn.executemany(
+            "INSERT INTO order_chat_messages(order_id, sender_user_id, sender_role, message_text) VALUES (?, ?, ?, ?)",
+            (
+                (rnd.randint(1, orders), 1, rnd.choice(["client", "admin_shop"]), f"Сообщение {i}")
+                for i in range(messages)
+            ),
+        )
+        conn.commit()
+        insert_seconds = time.perf_counter() - started
+        conn.close()
+
+        db = Database(DBConfig(path=str(path)))
+        report = {
+            "messages": messages,
+            "insert_with_summary_trigger_per_second": round(messages / insert_seconds),
+            "legacy_group_by_admin": await measure(lambda: _legacy_inbox(db, 20), repeat),
+            "summary_admin": await measure(lambda: _summary_inbox(db, "admin", json.dumps(SHOP_IDS), 20), repeat),
+            "summary_client": await measure(lambda: _summary_inbox(db, "client", CLIENT_ID, 20), repeat),
+        }
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Входящие чатов: агрегация против поддерживаемой сводки")
+    parser.add_argument("--orders", type=int, default=20_000)
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(_main(args.orders, args.messages, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import random
+import sqlite3
+import statistics
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+
+# Минимальная схема с колонками, которые использует API.
+# Основная схема создаётся ботом; здесь она нужна только для синтетических баз.
+SYNTHETIC_SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    role TEXT NOT NULL DEFAULT 'client'
+);
+CREATE TABLE IF NOT EXISTS shops (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    business_type TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    admin_user_id INTEGER
+);
+CREATE TABLE IF NOT EXISTS categories (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shop_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shop_id INTEGER NOT NULL,
+    category_id INTEGER,
+    name TEXT NOT NULL,
+    description TEXT,
+    price REAL NOT NULL DEFAULT 0,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    keywords_norm TEXT
+);
+CREATE TABLE IF NOT EXISTS cart_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS orders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    shop_id INTEGER NOT NULL,
+    client_user_id INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'new',
+    total_amount REAL NOT NULL DEFAULT 0,
+    comment TEXT,
+    fulfillment_type TEXT,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP,
+    updated_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS order_items (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    quantity INTEGER NOT NULL,
+    price_at_moment REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS order_chat_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id INTEGER NOT NULL,
+    sender_user_id INTEGER NOT NULL,
+    sender_role TEXT NOT NULL,
+    message_text TEXT NOT NULL,
+    created_at TEXT DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+WORDS = [
+    "хлеб", "молоко", "сыр", "кофе", "чай", "пицца", "суп", "салат", "плов", "лагман",
+    "самса", "манты", "сок", "вода", "торт", "пирог", "мясо", "рис", "apple", "burger",
+]
+
+
+def create_synthetic_db(path: Path) -> sqlite3.Connection:
+    if path.exists():
+        path.unlink()
+    conn = sqlite3.connect(path)
+    conn.executescript(SYNTHETIC_SCHEMA)
+    return conn
+
+
+def seed_shops(conn: sqlite3.Connection, count: int, business_type: str = "shop") -> None:
+    conn.executemany(
+        "INSERT INTO shops(name, business_type, is_active) VALUES (?, ?, ?)",
+        ((f"Магазин {i}", business_type, int(i % 10 != 0)) for i in range(count)),
+    )
+    conn.commit()
+
+
+def seed_categories(conn: sqlite3.Connection, shop_id: int, count: int) -> None:
+    conn.executemany(
+        "INSERT INTO categories(shop_id, name, is_active) VALUES (?, ?, ?)",
+        ((shop_id, f"Категория {i}", int(i % 10 != 0)) for i in range(count)),
+    )
+    conn.commit()
+
+
+def seed_products(conn: sqlite3.Connection, count: int, shop_ids: list[int], seed: int = 1) -> None:
+    rnd = random.Random(seed)
+
+    def rows():
+        for i in range(count):
+            words = rnd.sample(WORDS, 3)
+            yield (
+                rnd.choice(shop_ids),
+                rnd.randint(1, 50),
+                f"{words[0].capitalize()} {i}",
+                " ".join(words),
+                round(rnd.uniform(10, 500), 2),
+                int(i % 20 != 0),
+                " ".join(words),
+            )
+
+    conn.executemany(
+        """
+        INSERT INTO products(shop_id, category_id, name, description, price, is_active, keywords_norm)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        rows(),
+    )
+    conn.commit()
+
+
+async def measure(fn: Callable[[], Awaitable[object]], repeat: int) -> dict[str, float]:
+    samples: list[float] = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        await fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50_ms": round(statistics.median(samples), 3),
+        "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        "mean_ms": round(statistics.fmean(samples), 3),
+    }
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import argparse
+import base64
+import hashlib
+import hmac
+import json
+import os
+import time
+
+from app.api import security
+
+
+def _legacy_decode(token: str) -> dict:
+    """Прежняя проверка: секрет из окружения и полный разбор на каждый вызов."""
+    header_b64, payload_b64, signature_b64 = token.split(".")
+    signing_input = f"{header_b64}.{payload_b64}".encode("utf-8")
+    expected = hmac.new(os.getenv("API_JWT_SECRET", "").encode("utf-8"), signing_input, hashlib.sha256).digest()
+    actual = base64.urlsafe_b64decode(signature_b64 + "=" * (-len(signature_b64) % 4))
+    if not hmac.compare_digest(expected, actual):
+        raise ValueError("bad signature")
+    payload = json.loads(base64.urlsafe_b64decode(payload_b64 + "=" * (-len(payload_b64) % 4)))
+    if int(payload.get("exp", 0)) < int(time.time()):
+        raise ValueError("expired")
+    return payload
+
+
+def _throughput(fn, token: str, count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        fn(token)
+    return round(count / (time.perf_counter() - started))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Пропускная способность проверки JWT")
+    parser.add_argument("--count", type=int, default=200_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault("API_JWT_SECRET", "bench-secret")
+    security.reload_keys()
+    token = security.create_access_token({"sub": 1, "role": "admin_shop", "shops": list(range(10))})
+
+    def uncached(value: str) -> dict:
+        security._verified.clear()
+        return security.decode_access_token(value)
+
+    report = {
+        "legacy_per_second": _throughput(_legacy_decode, token, args.count),
+        "precomputed_key_per_second": _throughput(uncached, token, args.count),
+        "verified_cache_per_second": _throughput(security.decode_access_token, token, args.count),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
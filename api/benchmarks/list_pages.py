@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+from pathlib import Path
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_products, seed_shops
+from app.api.json_pages import id_cursor, page_bytes
+from app.api.routes.orders import _orders_query
+from app.api.schemas import CursorPage
+from app.db.database import DBConfig, Database
+
+
+SHOP_IDS = list(range(1, 11))
+
+
+async def _legacy_orders_page(db: Database, limit: int) -> bytes:
+    """Прежний путь list_orders: IN (?,?,..), dict(r), CursorPage и JSONResponse."""
+    placeholders = ",".join(["?"] * len(SHOP_IDS))
+    async with db.conn() as conn:
+        cur = await conn.execute(
+            f"""
+            SELECT o.*, s.name AS shop_name, s.business_type
+            FROM orders o
+            JOIN shops s ON s.id = o.shop_id
+            WHERE o.id > ? AND o.shop_id IN ({placeholders})
+            ORDER BY o.id ASC
+            LIMIT ?
+            """,
+            (0, *SHOP_IDS, limit + 1),
+        )
+        page = [dict(r) for r in await cur.fetchall()]
+    next_cursor = str(page[limit - 1]["id"]) if len(page) > limit else None
+    result = CursorPage(items=page[:limit], next_cursor=next_cursor)
+    validated = CursorPage.model_validate(result.model_dump())
+    return JSONResponse(content=jsonable_encoder(validated)).body
+
+
+async def _json_orders_page(db: Database, limit: int) -> bytes:
+    async with db.conn() as conn:
+        rows = await _orders_query("admin", False, "id", False).fetch(conn, (json.dumps(SHOP_IDS), limit + 1))
+    return page_bytes(rows, limit, id_cursor)
+
+
+async def _main(orders: int, limit: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "pages.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, len(SHOP_IDS))
+        seed_products(conn, 100, SHOP_IDS)
+        rnd = random.Random(3)
+        conn.executemany(
+            """
+            INSERT INTO orders(shop_id, client_user_id, status, total_amount, comment, fulfillment_type)
+            VALUES (?, ?, 'new', ?, 'позвонить в дверь', 'courier')
+            """,
+            ((rnd.choice(SHOP_IDS), rnd.randint(1, 1000), round(rnd.uniform(100, 5000), 2)) for _ in range(orders)),
+        )
+        conn.commit()
+        conn.close()
+
+        db = Database(DBConfig(path=str(path)))
+        assert json.loads(await _legacy_orders_page(db, limit)) == json.loads(await _json_orders_page(db, limit))
+        report = {
+            "legacy_dict_pydantic": await measure(lambda: _legacy_orders_page(db, limit), repeat),
+            "json_query_layer": await measure(lambda: _json_orders_page(db, limit), repeat),
+        }
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Страница заказов: dict+pydantic против готового JSON из SQLite")
+    parser.add_argument("--orders", type=int, default=10_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    asyncio.run(_main(args.orders, args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
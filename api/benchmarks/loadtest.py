@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import quote
+
+from app.api.benchmarks.fixtures import WORDS, create_synthetic_db
+from app.api.migrations import API_MIGRATIONS, CHAT_SUMMARY_BACKFILL
+
+
+# Клиенты нагрузочного теста — отдельный диапазон user_id, чтобы не пересекаться с админами.
+CLIENT_ID_BASE = 1_000_000
+SEED_CHUNK = 50_000
+
+
+@dataclass(frozen=True)
+class SeedConfig:
+    shops: int = 200
+    categories_per_shop: int = 20
+    products: int = 100_000
+    clients: int = 10_000
+    orders: int = 100_000
+    messages: int = 300_000
+    seed: int = 42
+
+
+def _chunks(rows: Iterator[tuple]) -> Iterator[list[tuple]]:
+    chunk: list[tuple] = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= SEED_CHUNK:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _insert(conn: sqlite3.Connection, sql: str, rows: Iterator[tuple]) -> None:
+    for chunk in _chunks(rows):
+        conn.executemany(sql, chunk)
+    conn.commit()
+
+
+def seed_database(path: Path, config: SeedConfig) -> dict[str, float]:
+    """Синтетическая shop.db нужного размера; возвращает время каждого этапа.
+
+    Пока база наполняется, журнал выключен: она создаётся с нуля и при сбое просто
+    пересоздаётся. Индексы, FTS и сводка чатов строятся одним проходом в конце —
+    это быстрее, чем поддерживать их триггерами на каждой вставке.
+    """
+    rnd = random.Random(config.seed)
+    timings: dict[str, float] = {}
+    conn = create_synthetic_db(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+
+    def stage(name: str, started: float) -> None:
+        timings[name] = round(time.perf_counter() - started, 2)
+
+    started = time.perf_counter()
+    business_types = ["shop", "restaurant"]
+    _insert(
+        conn,
+        "INSERT INTO shops(id, name, business_type, is_active) VALUES (?, ?, ?, 1)",
+        ((i, f"Магазин {i}", business_types[i % 2]) for i in range(1, config.shops + 1)),
+    )
+    _insert(
+        conn,
+        "INSERT INTO categories(shop_id, name, is_active) VALUES (?, ?, 1)",
+        (
+            (shop_id, f"Категория {i}")
+            for shop_id in range(1, config.shops + 1)
+            for i in range(config.categories_per_shop)
+        ),
+    )
+    _insert(
+        conn,
+        "INSERT INTO users(user_id, role) VALUES (?, 'client')",
+        ((CLIENT_ID_BASE + i,) for i in range(config.clients)),
+    )
+    stage("shops_categories_users", started)
+
+    started = time.perf_counter()
+
+    def products() -> Iterator[tuple]:
+        for i in range(config.products):
+            shop_id = rnd.randint(1, config.shops)
+            words = rnd.sample(WORDS, 3)
+            category_id = (shop_id - 1) * config.categories_per_shop + rnd.randint(1, config.categories_per_shop)
+            text = " ".join(words)
+            yield shop_id, category_id, f"{words[0].capitalize()} {i}", text, round(rnd.uniform(10, 500), 2), text
+
+    _insert(
+        conn,
+        """
+        INSERT INTO products(shop_id, category_id, name, description, price, is_active, keywords_norm)
+        VALUES (?, ?, ?, ?, ?, 1, ?)
+        """,
+        products(),
+    )
+    stage("products", started)
+
+    started = time.perf_counter()
+
+    def orders() -> Iterator[tuple]:
+        statuses = ["new", "accepted", "delivering", "done", "cancelled"]
+        for i in range(config.orders):
+            shop_id = rnd.randint(1, config.shops)
+            stamp = f"+{i} minutes"
+            yield (
+                shop_id,
+                CLIENT_ID_BASE + rnd.randrange(config.clients),
+                rnd.choice(statuses),
+                round(rnd.uniform(100, 5000), 2),
+                "courier",
+                stamp,
+                stamp,
+            )
+
+    _insert(
+        conn,
+        """
+        INSERT INTO orders(shop_id, client_user_id, status, total_amount, fulfillment_type, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, datetime('2024-01-01', ?), datetime('2024-01-01', ?))
+        """,
+        orders(),
+    )
+    _insert(
+        conn,
+        "INSERT INTO order_items(order_id, product_id, quantity, price_at_moment) VALUES (?, ?, ?, ?)",
+        (
+            (order_id, rnd.randint(1, config.products), rnd.randint(1, 3), round(rnd.uniform(10, 500), 2))
+            for order_id in range(1, config.orders + 1)
+            for _ in range(rnd.randint(1, 3))
+        ),
+    )
+    stage("orders", started)
+
+    started = time.perf_counter()
+    _insert(
+        conn,
+        "INSERT INTO order_chat_messages(order_id, sender_user_id, sender_role, message_text) VALUES (?, ?, ?, ?)",
+        (
+            (order_id, 0, rnd.choice(["client", "admin_shop"]), f"Сообщение {i} {rnd.choice(WORDS)}")
+            for i, order_id in enumerate(rnd.randint(1, config.orders) for _ in range(config.messages))
+        ),
+    )
+    stage("messages", started)
+
+    started = time.perf_counter()
+    for statement in API_MIGRATIONS:
+        conn.execute(statement)
+    conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+    for statement in CHAT_SUMMARY_BACKFILL:
+        conn.execute(statement)
+    conn.commit()
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("ANALYZE")
+    conn.close()
+    stage("indexes_fts_summary", started)
+    return timings
+
+
+class HttpConnection:
+    """Минимальный keep-alive клиент HTTP/1.1 поверх asyncio: без зависимостей и без сети наружу."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self._reader: asyncio.StreamReader | None = None
+        self._writer: asyncio.StreamWriter | None = None
+
+    async def request(
+        self, method: str, path: str, token: str | None = None, payload: dict | None = None
+    ) -> tuple[int, bytes]:
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else b""
+        head = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", f"Content-Length: {len(body)}"]
+        if payload is not None:
+            head.append("Content-Type: application/json")
+        if token:
+            head.append(f"Authorization: Bearer {token}")
+        self._writer.write(("\r\n".join(head) + "\r\n\r\n").encode("utf-8") + body)
+        try:
+            raw = await self._reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+        lines = raw.split(b"\r\n")
+        status = int(lines[0].split()[1])
+        length = 0
+        for line in lines[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"content-length":
+                length = int(value)
+        return status, await self._reader.readexactly(length)
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+@dataclass
+class Recorder:
+    samples: dict[str, list[float]] = field(default_factory=dict)
+    errors: dict[str, int] = field(default_factory=dict)
+
+    def add(self, endpoint: str, seconds: float, ok: bool) -> None:
+        if ok:
+            self.samples.setdefault(endpoint, []).append(seconds * 1000)
+        else:
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+
+def _percentile(sorted_samples: list[float], q: float) -> float:
+    index = min(max(int(len(sorted_samples) * q + 0.5) - 1, 0), len(sorted_samples) - 1)
+    return round(sorted_samples[index], 3)
+
+
+def summarize(recorder: Recorder, seconds: float) -> dict[str, dict]:
+    endpoints: dict[str, dict] = {}
+    for endpoint in sorted(set(recorder.samples) | set(recorder.errors)):
+        samples = sorted(recorder.samples.get(endpoint, []))
+        errors = recorder.errors.get(endpoint, 0)
+        entry: dict[str, float | int] = {"requests": len(samples), "errors": errors, "rps": round(len(samples) / seconds, 1)}
+        if samples:
+            entry.update(
+                p50_ms=_percentile(samples, 0.50),
+                p95_ms=_percentile(samples, 0.95),
+                p99_ms=_percentile(samples, 0.99),
+                mean_ms=round(statistics.fmean(samples), 3),
+            )
+        endpoints[endpoint] = entry
+    return endpoints
+
+
+# Смесь действий виртуального пользователя: (сценарий, вес).
+SCENARIO_WEIGHTS = {"browse": 50, "search": 25, "order": 10, "chat": 15}
+
+
+class VirtualUser:
+    """Клиент мобильного приложения: листает каталог, ищет, заказывает, пишет в чат."""
+
+    def __init__(self, conn: HttpConnection, recorder: Recorder, user_id: int, rnd: random.Random) -> None:
+        self.conn = conn
+        self.recorder = recorder
+        self.user_id = user_id
+        self.rnd = rnd
+        self.token: str | None = None
+        self.seen_products: list[tuple[int, int]] = []
+        self.order_id: int | None = None
+
+    async def call(self, endpoint: str, method: str, path: str, payload: dict | None = None) -> dict | None:
+        started = time.perf_counter()
+        try:
+            status, body = await self.conn.request(method, path, self.token, payload)
+        except (OSError, asyncio.IncompleteReadError):
+            self.recorder.add(endpoint, time.perf_counter() - started, ok=False)
+            return None
+        ok = 200 <= status < 300
+        self.recorder.add(endpoint, time.perf_counter() - started, ok)
+        return json.loads(body) if ok and body else None
+
+    async def login(self) -> None:
+        auth = await self.call("POST /auth/telegram", "POST", "/auth/telegram", {"telegram_user_id": self.user_id})
+        self.token = auth["access_token"] if auth else None
+
+    async def browse(self) -> None:
+        business_type = self.rnd.choice(["shop", "restaurant"])
+        merchants = await self.call(
+            "GET /catalog/merchants", "GET", f"/catalog/merchants?type={business_type}&limit=20"
+        )
+        if not merchants or not merchants["items"]:
+            return
+        shop_id = self.rnd.choice(merchants["items"])["id"]
+        categories = await self.call("GET /catalog/{id}/categories", "GET", f"/catalog/{shop_id}/categories?limit=20")
+        if not categories or not categories["items"]:
+            return
+        category_id = self.rnd.choice(categories["items"])["id"]
+        items = await self.call(
+            "GET /catalog/categories/{id}/items",
+            "GET",
+            f"/catalog/categories/{category_id}/items?merchant_id={shop_id}&limit=20",
+        )
+        if items:
+            self.seen_products = [(item["shop_id"], item["id"]) for item in items["items"]] or self.seen_products
+
+    async def search(self) -> None:
+        query = self.rnd.choice(WORDS)
+        business_type = self.rnd.choice(["shop", "restaurant"])
+        await self.call("GET /search", "GET", f"/search?q={quote(query)}&type={business_type}&limit=20")
+
+    async def order(self) -> None:
+        if not self.seen_products:
+            await self.browse()
+        if not self.seen_products:
+            return
+        shop_id = self.seen_products[0][0]
+        picks = self.rnd.sample(self.seen_products, min(3, len(self.seen_products)))
+        result = await self.call(
+            "POST /orders",
+            "POST",
+            "/orders",
+            {
+                "shop_id": shop_id,
+                "fulfillment_type": "courier",
+                "comment": "",
+                "items": [{"product_id": product_id, "quantity": self.rnd.randint(1, 3)} for _, product_id in picks],
+            },
+        )
+        if result:
+            self.order_id = result["order_id"]
+        await self.call("GET /orders", "GET", "/orders?limit=20&sort=-created_at")
+
+    async def chat(self) -> None:
+        if self.order_id is None:
+            orders = await self.call("GET /orders", "GET", "/orders?limit=5&sort=-id")
+            if not orders or not orders["items"]:
+                return
+            self.order_id = orders["items"][0]["id"]
+        await self.call(
+            "POST /chats/{id}/messages", "POST", f"/chats/{self.order_id}/messages", {"text": "Когда привезёте?"}
+        )
+        await self.call("GET /chats/{id}/messages", "GET", f"/chats/{self.order_id}/messages?limit=30&sort=-id")
+        await self.call("GET /chats/inbox", "GET", "/chats/inbox?limit=20")
+
+    async def run(self, deadline: float, think_seconds: float) -> None:
+        await self.login()
+        if self.token is None:
+            return
+        scenarios = list(SCENARIO_WEIGHTS)
+        weights = list(SCENARIO_WEIGHTS.values())
+        while time.perf_counter() < deadline:
+            await getattr(self, self.rnd.choices(scenarios, weights)[0])()
+            if think_seconds:
+                await asyncio.sleep(self.rnd.uniform(0, think_seconds * 2))
+
+
+async def run_load(
+    host: str,
+    port: int,
+    users: int,
+    seconds: float,
+    clients: int,
+    think_seconds: float = 0.0,
+    seed: int = 42,
+) -> dict:
+    recorder = Recorder()
+    rnd = random.Random(seed)
+    deadline = time.perf_counter() + seconds
+    connections = [HttpConnection(host, port) for _ in range(users)]
+    vus = [
+        VirtualUser(conn, recorder, CLIENT_ID_BASE + rnd.randrange(clients), random.Random(seed + i))
+        for i, conn in enumerate(connections)
+    ]
+    started = time.perf_counter()
+    await asyncio.gather(*(vu.run(deadline, think_seconds) for vu in vus))
+    elapsed = time.perf_counter() - started
+    for conn in connections:
+        await conn.close()
+    endpoints = summarize(recorder, elapsed)
+    total = sum(entry["requests"] for entry in endpoints.values())
+    return {
+        "elapsed_seconds": round(elapsed, 2),
+        "total_requests": total,
+        "total_errors": sum(entry["errors"] for entry in endpoints.values()),
+        "total_rps": round(total / elapsed, 1),
+        "endpoints": endpoints,
+    }
+
+
+def spawn_server(db_path: Path, port: int, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DB_PATH": str(db_path),
+        "API_JWT_SECRET": os.getenv("API_JWT_SECRET", "loadtest-secret"),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "app.api.serve", "--workers", str(workers), "--host", "127.0.0.1",
+         "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+
+
+async def wait_ready(host: str, port: int, timeout: float = 60.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        conn = HttpConnection(host, port)
+        try:
+            status, _ = await conn.request("GET", "/health")
+            if status == 200:
+                return
+        except OSError:
+            pass
+        finally:
+            await conn.close()
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"API на {host}:{port} не ответил за {timeout} с")
+        await asyncio.sleep(0.2)
+
+
+def run_metadata() -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=False
+        ).stdout.strip()
+    except OSError:
+        commit = ""
+    return {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": commit or None,
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[list[str], bool]:
+    """Сравнивает p95 и rps по эндпоинтам; регрессия — ухудшение больше `threshold` (доля)."""
+    lines: list[str] = []
+    regressed = False
+    for endpoint, now in current["load"]["endpoints"].items():
+        before = baseline["load"]["endpoints"].get(endpoint)
+        if not before or "p95_ms" not in before or "p95_ms" not in now:
+            continue
+        p95_delta = now["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps_delta = now["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        bad = p95_delta > threshold or rps_delta < -threshold
+        regressed = regressed or bad
+        lines.append(
+            f"{'REGRESSION ' if bad else ''}{endpoint}: p95 {before['p95_ms']} -> {now['p95_ms']} ms "
+            f"({p95_delta:+.1%}), rps {before['rps']} -> {now['rps']} ({rps_delta:+.1%})"
+        )
+    return lines, regressed
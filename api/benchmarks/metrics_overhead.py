@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import httpx
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_products, seed_shops
+
+
+CLIENT_ID = 10
+
+
+async def _run_mode(db_path: Path, enabled: bool, repeat: int) -> dict:
+    os.environ["DB_PATH"] = str(db_path)
+    os.environ["API_METRICS"] = "1" if enabled else "0"
+    from app.api.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            auth = await client.post("/auth/telegram", json={"telegram_user_id": CLIENT_ID})
+            headers = {"Authorization": f"Bearer {auth.json()['access_token']}"}
+
+            async def orders_page() -> None:
+                resp = await client.get("/orders?limit=20&sort=-created_at", headers=headers)
+                resp.raise_for_status()
+
+            async def category_items() -> None:
+                resp = await client.get("/catalog/categories/1/items?merchant_id=1&limit=20", headers=headers)
+                resp.raise_for_status()
+
+            await measure(orders_page, 50)
+            return {
+                "orders_page": await measure(orders_page, repeat),
+                "category_items_cached": await measure(category_items, repeat),
+            }
+
+
+async def _main(repeat: int) -> None:
+    os.environ.setdefault("API_JWT_SECRET", "bench-secret")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "metrics.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 10)
+        seed_products(conn, 2000, [1, 2, 3])
+        conn.executemany(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (?, ?, 'new', 100)",
+            ((i % 10 + 1, CLIENT_ID) for i in range(500)),
+        )
+        conn.commit()
+        conn.close()
+        report = {
+            "disabled": await _run_mode(path, enabled=False, repeat=repeat),
+            "enabled": await _run_mode(path, enabled=True, repeat=repeat),
+        }
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Накладные расходы API_METRICS=1 на запрос")
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(_main(args.repeat))
+
+
+if __name__ == "__main__":
+    main()
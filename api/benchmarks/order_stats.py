@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_products, seed_shops
+from app.api.db_pool import read_conn
+from app.api.migrations import apply_migrations, backfill_order_stats
+from app.api.repositories.stats_repo import StatsRepo
+from app.db.database import DBConfig, Database
+
+
+SHOPS = 200
+PRODUCTS = 20_000
+# Крупный магазин: десятая часть всех заказов, на нём и меряется дашборд.
+HOT_SHOP = 1
+STATUSES = ["new", "accepted", "delivering", "done", "done", "done", "cancelled"]
+TODAY = date(2026, 6, 30)
+
+
+def _seed_orders(conn: sqlite3.Connection, orders: int, days: int) -> None:
+    rnd = random.Random(3)
+    products_by_shop: dict[int, list[tuple[int, float]]] = {}
+    for product_id, shop_id, price in conn.execute("SELECT id, shop_id, price FROM products"):
+        products_by_shop.setdefault(shop_id, []).append((product_id, price))
+    shops = [shop_id for shop_id in range(1, SHOPS + 1) if shop_id in products_by_shop]
+    start = TODAY - timedelta(days=days - 1)
+    batch = 50_000
+    for first in range(1, orders + 1, batch):
+        order_rows, item_rows = [], []
+        for order_id in range(first, min(first + batch, orders + 1)):
+            shop_id = HOT_SHOP if rnd.random() < 0.1 else rnd.choice(shops)
+            items = rnd.sample(products_by_shop[shop_id], min(2, len(products_by_shop[shop_id])))
+            quantities = [rnd.randint(1, 3) for _ in items]
+            created = f"{start + timedelta(days=rnd.randrange(days))} {rnd.randrange(24):02d}:{rnd.randrange(60):02d}:00"
+            total = round(sum(price * q for (_, price), q in zip(items, quantities)), 2)
+            order_rows.append((order_id, shop_id, rnd.randint(100, 100_000), rnd.choice(STATUSES), total, created))
+            item_rows.extend((order_id, product_id, q, price) for (product_id, price), q in zip(items, quantities))
+        conn.executemany(
+            "INSERT INTO orders(id, shop_id, client_user_id, status, total_amount, created_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (row + (row[-1],) for row in order_rows),
+        )
+        conn.executemany(
+            "INSERT INTO order_items(order_id, product_id, quantity, price_at_moment) VALUES (?, ?, ?, ?)", item_rows
+        )
+        conn.commit()
+
+
+async def _scan_stats(db: Database, shop_id: int, date_from: date, date_to: date, top: int) -> list:
+    """Та же сводка прямым проходом по orders и order_items — как считал бы запрос без rollup-таблиц."""
+    days = (date_from.isoformat(), f"{date_to.isoformat()} 23:59:59")
+    async with read_conn(db) as conn:
+        results = []
+        for sql in (
+            "SELECT status, COUNT(*), SUM(total_amount) FROM orders"
+            " WHERE shop_id = ? AND created_at BETWEEN ? AND ? GROUP BY status",
+            "SELECT date(created_at), COUNT(*), SUM(total_amount) FROM orders"
+            " WHERE shop_id = ? AND created_at BETWEEN ? AND ? AND status != 'cancelled' GROUP BY 1",
+            "SELECT strftime('%Y-%m-%d %H:00', created_at), COUNT(*), SUM(total_amount) FROM orders"
+            " WHERE shop_id = ? AND created_at BETWEEN ? AND ? AND status != 'cancelled' GROUP BY 1",
+        ):
+            cur = await conn.execute(sql, (shop_id, *days))
+            results.append(await cur.fetchall())
+        cur = await conn.execute(
+            """
+            SELECT i.product_id, SUM(i.quantity), SUM(i.quantity * i.price_at_moment) AS revenue
+            FROM orders o JOIN order_items i ON i.order_id = o.id
+            WHERE o.shop_id = ? AND o.created_at BETWEEN ? AND ? AND o.status != 'cancelled'
+            GROUP BY i.product_id ORDER BY revenue DESC LIMIT ?
+            """,
+            (shop_id, *days, top),
+        )
+        results.append(await cur.fetchall())
+        return results
+
+
+def _write_throughput(path: Path, count: int) -> float:
+    """Заказов в секунду: вставка заказа с двумя позициями и одна смена статуса, по транзакции на заказ."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    started = time.perf_counter()
+    for _ in range(count):
+        cur = conn.execute(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (?, 5, 'new', 300)", (HOT_SHOP,)
+        )
+        conn.executemany(
+            "INSERT INTO order_items(order_id, product_id, quantity, price_at_moment) VALUES (?, ?, 1, 150)",
+            ((cur.lastrowid, 1), (cur.lastrowid, 2)),
+        )
+        conn.commit()
+        conn.execute("UPDATE orders SET status='accepted' WHERE id=?", (cur.lastrowid,))
+        conn.commit()
+    elapsed = time.perf_counter() - started
+    conn.close()
+    return round(count / elapsed)
+
+
+async def _main(orders: int, days: int, repeat: int, writes: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "stats.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, SHOPS)
+        seed_products(conn, PRODUCTS, shop_ids=list(range(1, SHOPS + 1)))
+        started = time.perf_counter()
+        _seed_orders(conn, orders, days)
+        conn.close()
+        report: dict[str, object] = {"orders": orders, "seed_seconds": round(time.perf_counter() - started, 1)}
+
+        db = Database(DBConfig(path=str(path)))
+        await apply_migrations(db)
+        started = time.perf_counter()
+        await backfill_order_stats(db)
+        report["backfill_seconds"] = round(time.perf_counter() - started, 1)
+
+        repo = StatsRepo(db)
+        for period in (7, 30, 92):
+            date_from = TODAY - timedelta(days=period - 1)
+            report[f"scan_{period}d"] = await measure(lambda: _scan_stats(db, HOT_SHOP, date_from, TODAY, 10), repeat)
+            report[f"rollup_{period}d"] = await measure(
+                lambda: repo.shop_stats(HOT_SHOP, date_from, TODAY, None, 10), repeat
+            )
+
+        report["writes_per_second_with_rollups"] = _write_throughput(path, writes)
+        conn = sqlite3.connect(path)
+        for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE '%_stats_%'"):
+            conn.execute(f"DROP TRIGGER {name}")
+        conn.commit()
+        conn.close()
+        report["writes_per_second_without_rollups"] = _write_throughput(path, writes)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Статистика магазина: rollup-таблицы против прохода по заказам")
+    parser.add_argument("--orders", type=int, default=2_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--writes", type=int, default=2_000)
+    args = parser.parse_args()
+    asyncio.run(_main(args.orders, args.days, args.repeat, args.writes))
+
+
+if __name__ == "__main__":
+    main()
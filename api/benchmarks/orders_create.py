@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, seed_products, seed_shops
+from app.api.migrations import apply_migrations
+from app.api.repositories.orders_write_repo import OrdersWriteRepo
+from app.db.database import DBConfig, Database
+from app.repositories.orders_repo import OrdersRepo
+
+
+CLIENT_ID = 1
+
+
+async def _legacy_create(db: Database, shop_id: int, items: dict[int, int]) -> int:
+    """Прежний путь POST /orders: запрос и вставка на каждую позицию."""
+    async with db.conn() as conn:
+        await conn.execute("BEGIN")
+        total = 0.0
+        collected: list[tuple[int, int, float]] = []
+        for product_id, quantity in items.items():
+            cur = await conn.execute("SELECT id, price, shop_id FROM products WHERE id=? AND is_active=1", (product_id,))
+            row = await cur.fetchone()
+            price = float(row["price"])
+            total += price * quantity
+            collected.append((product_id, quantity, price))
+        cur_order = await conn.execute(
+            """
+            INSERT INTO orders (shop_id, client_user_id, status, total_amount, comment, fulfillment_type, updated_at)
+            VALUES (?, ?, 'new', ?, '', 'courier', CURRENT_TIMESTAMP)
+            """,
+            (shop_id, CLIENT_ID, total),
+        )
+        order_id = int(cur_order.lastrowid)
+        for product_id, quantity, price in collected:
+            await conn.execute(
+                "INSERT INTO order_items (order_id, product_id, quantity, price_at_moment) VALUES (?, ?, ?, ?)",
+                (order_id, product_id, quantity, price),
+            )
+        await conn.commit()
+    return order_id
+
+
+async def _fill_cart(db: Database, items: dict[int, int]) -> None:
+    async with db.conn() as conn:
+        await conn.executemany(
+            "INSERT INTO cart_items(user_id, product_id, quantity) VALUES (?, ?, ?)",
+            [(CLIENT_ID, product_id, quantity) for product_id, quantity in items.items()],
+        )
+        await conn.commit()
+
+
+async def _orders_per_second(create, prepare, count: int) -> float:
+    elapsed = 0.0
+    for _ in range(count):
+        if prepare:
+            await prepare()
+        started = time.perf_counter()
+        await create()
+        elapsed += time.perf_counter() - started
+    return round(count / elapsed, 1)
+
+
+async def _main(sizes: list[int], count: int) -> None:
+    report: dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "orders.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 2)
+        seed_products(conn, max(sizes) * 2, shop_ids=[2])
+        conn.execute("UPDATE products SET is_active=1")
+        conn.commit()
+        conn.close()
+
+        db = Database(DBConfig(path=str(path)))
+        await apply_migrations(db)
+        write_repo = OrdersWriteRepo(db)
+        orders_repo = OrdersRepo(db)
+
+        for size in sizes:
+            items = {product_id: 1 + product_id % 3 for product_id in range(1, size + 1)}
+            report[str(size)] = {
+                "legacy_per_item": await _orders_per_second(lambda: _legacy_create(db, 2, items), None, count),
+                "batched": await _orders_per_second(
+                    lambda: write_repo.create_order_with_items(2, CLIENT_ID, "", "courier", items), None, count
+                ),
+                "from_cart": await _orders_per_second(
+                    lambda: orders_repo.create_order_from_cart(
+                        shop_id=2, client_user_id=CLIENT_ID, comment="", fulfillment_type="courier"
+                    ),
+                    lambda: _fill_cart(db, items),
+                    count,
+                ),
+            }
+    print(json.dumps({"orders_per_second": report}, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Заказов в секунду в зависимости от числа позиций")
+    parser.add_argument("--sizes", default="1,5,10,40,100")
+    parser.add_argument("--count", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(_main([int(x) for x in args.sizes.split(",")], args.count))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gzip
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_products, seed_shops
+from app.api.compression import CompressionMiddleware, brotli
+from app.api.json_pages import RowShape, id_cursor, page_bytes
+from app.api.routes.catalog import _CATEGORY_ITEMS_QUERY
+from app.db.database import DBConfig, Database
+
+
+SHAPES = {
+    "objects": RowShape(),
+    "fields": RowShape(fields=("id", "name", "price")),
+    "compact": RowShape(compact=True),
+    "compact_fields": RowShape(fields=("id", "name", "price"), compact=True),
+}
+
+
+def _encoders(middleware: CompressionMiddleware) -> dict[str, tuple]:
+    encoders = {"identity": (lambda body: body, lambda body: body)}
+    for level in (1, 5, 9):
+        encoders[f"gzip-{level}"] = (
+            lambda body, level=level: gzip.compress(body, compresslevel=level, mtime=0),
+            gzip.decompress,
+        )
+    if brotli is not None:
+        for quality in (1, 4, 11):
+            encoders[f"br-{quality}"] = (
+                lambda body, quality=quality: brotli.compress(body, quality=quality),
+                brotli.decompress,
+            )
+    # То, что отдаёт сервер с настройками по умолчанию.
+    encoders["server-default"] = (lambda body: middleware.compress(body, "br" if brotli else "gzip"), None)
+    return encoders
+
+
+def _cpu_us(fn, body: bytes, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(body)
+    return round((time.perf_counter() - started) / repeat * 1_000_000, 1)
+
+
+async def _main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "payload.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 1)
+        seed_products(conn, args.products, [1])
+        # Все товары в одной категории, чтобы страница была полной.
+        conn.execute("UPDATE products SET category_id = 1, is_active = 1")
+        conn.commit()
+        conn.close()
+
+        db = Database(DBConfig(path=str(path)))
+        middleware = CompressionMiddleware(None)
+        encoders = _encoders(middleware)
+        # Время передачи на медленной мобильной сети: RTT + байты / полоса.
+        bytes_per_ms = args.mbps * 1_000_000 / 8 / 1000
+        report: dict = {"limit": args.limit, "mobile": {"mbps": args.mbps, "rtt_ms": args.rtt_ms}}
+
+        for name, shape in SHAPES.items():
+            query = _CATEGORY_ITEMS_QUERY.variant(shape)
+
+            async def build() -> bytes:
+                async with db.conn() as conn:
+                    rows = await query.fetch(conn, (1, 1, 0, args.limit + 1))
+                return page_bytes(rows, args.limit, id_cursor)
+
+            body = await build()
+            result = {"build": await measure(build, args.repeat), "encodings": {}}
+            for encoding, (compress, decompress) in encoders.items():
+                encoded = compress(body)
+                entry = {
+                    "bytes": len(encoded),
+                    "compress_us": _cpu_us(compress, body, args.repeat),
+                    "mobile_transfer_ms": round(args.rtt_ms + len(encoded) / bytes_per_ms, 1),
+                }
+                if decompress is not None:
+                    entry["decompress_us"] = _cpu_us(decompress, encoded, args.repeat)
+                result["encodings"][encoding] = entry
+            report[name] = result
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Страница товаров: байты и CPU для fields=, format=compact и gzip/brotli"
+    )
+    parser.add_argument("--products", type=int, default=1_000)
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--mbps", type=float, default=1.0, help="полоса мобильной сети, Мбит/с")
+    parser.add_argument("--rtt-ms", type=float, default=150.0)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
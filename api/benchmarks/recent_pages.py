@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_shops
+from app.api.json_pages import page_bytes
+from app.api.migrations import API_MIGRATIONS
+from app.api.routes.orders import ORDER_SORTS, _orders_query
+from app.db.database import DBConfig, Database
+
+
+CLIENT_ID = 7
+
+
+async def _page(db: Database, sort: str, cursor: str | None, limit: int) -> tuple[bytes, str | None]:
+    keyset = ORDER_SORTS[sort]
+    after = keyset.decode(cursor, (None,))
+    query = _orders_query("client", False, sort, after is not None)
+    async with db.conn() as conn:
+        rows = await query.fetch(conn, (CLIENT_ID, *(after or ()), limit + 1))
+    body = page_bytes(rows, limit, keyset.cursor_of((None,)))
+    return body, json.loads(body)["next_cursor"]
+
+
+async def _walk_to_latest(db: Database, limit: int) -> int:
+    """Прежний путь к свежим заказам: листать историю по возрастанию id до конца."""
+    pages, cursor = 0, None
+    while True:
+        _, cursor = await _page(db, "id", cursor, limit)
+        pages += 1
+        if cursor is None:
+            return pages
+
+
+async def _plan(db: Database, sort: str) -> list[str]:
+    query = _orders_query("client", False, sort, True)
+    async with db.conn() as conn:
+        await query.fetch(conn, (CLIENT_ID, "9999", 1, 1))
+        cur = await conn.execute(f"EXPLAIN QUERY PLAN {query._sql}", (CLIENT_ID, "9999", 1, 1))
+        return [row[3] for row in await cur.fetchall()]
+
+
+async def _main(orders: int, limit: int, repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "recent.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 20)
+        rnd = random.Random(11)
+        # Каждый 50-й заказ — нашего клиента: история клиента растёт вместе с таблицей.
+        conn.executemany(
+            """
+            INSERT INTO orders(shop_id, client_user_id, status, total_amount, created_at, updated_at)
+            VALUES (?, ?, 'new', 100, datetime('2024-01-01', ?), datetime('2024-01-01', ?))
+            """,
+            (
+                (rnd.randint(1, 20), CLIENT_ID if i % 50 == 0 else rnd.randint(100, 50_000), f"+{i} minutes", f"+{i} minutes")
+                for i in range(orders)
+            ),
+        )
+        for statement in API_MIGRATIONS:
+            conn.execute(statement)
+        conn.commit()
+        conn.close()
+
+        db = Database(DBConfig(path=str(path)))
+        report = {
+            "client_orders": orders // 50,
+            "pages_to_reach_latest_before": await _walk_to_latest(db, limit),
+            "walk_to_latest_ascending": await measure(lambda: _walk_to_latest(db, limit), max(repeat // 10, 1)),
+            "newest_first_page": await measure(lambda: _page(db, "-created_at", None, limit), repeat),
+            "plan_newest_first": await _plan(db, "-created_at"),
+        }
+        _, cursor = await _page(db, "-updated_at", None, limit)
+        report["newest_second_page"] = await measure(lambda: _page(db, "-updated_at", cursor, limit), repeat)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Свежие заказы: листание по возрастанию против keyset по убыванию")
+    parser.add_argument("--orders", type=int, default=500_000)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=100)
+    args = parser.parse_args()
+    os.environ.setdefault("API_JWT_SECRET", "bench-secret")
+    asyncio.run(_main(args.orders, args.limit, args.repeat))
+
+
+if __name__ == "__main__":
+    main()
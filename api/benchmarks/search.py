@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+from app.api.benchmarks.fixtures import create_synthetic_db, measure, seed_products, seed_shops
+from app.api.migrations import apply_migrations
+from app.api.repositories.search_repo import SearchRepo
+from app.db.database import DBConfig, Database
+
+
+# Частые слова, редкая подстрока и запрос без совпадений (худший случай для LIKE).
+QUERIES = ["хлеб", "burger", "самс", "4242", "несуществующий"]
+
+
+async def _run_size(workdir: Path, size: int, repeat: int) -> dict:
+    path = workdir / f"search_{size}.db"
+    conn = create_synthetic_db(path)
+    seed_shops(conn, 200)
+    seed_products(conn, size, shop_ids=list(range(1, 201)))
+    conn.close()
+
+    db = Database(DBConfig(path=str(path)))
+    await apply_migrations(db)
+    repo = SearchRepo(db)
+    await repo.rebuild_index()
+
+    result: dict[str, dict] = {}
+    for query in QUERIES:
+        result[f"like:{query}"] = await measure(lambda: repo.search_like(query, "shop", 0, 21), repeat)
+        result[f"fts:{query}"] = await measure(lambda: repo.search_fts(query, "shop", None, 21), repeat)
+    return result
+
+
+async def _main(sizes: list[int], repeat: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        report = {str(size): await _run_size(Path(tmp), size, repeat) for size in sizes}
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Сравнение LIKE-сканирования и FTS5-поиска")
+    parser.add_argument("--sizes", default="10000,100000")
+    parser.add_argument("--repeat", type=int, default=30)
+    args = parser.parse_args()
+    asyncio.run(_main([int(x) for x in args.sizes.split(",")], args.repeat))
+
+
+if __name__ == "__main__":
+    main()
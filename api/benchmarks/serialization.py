@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from collections.abc import Callable
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.api.responses import FastJSONResponse, StdJSONResponse, orjson
+from app.api.schemas import CursorPage
+
+
+def _merchants_page() -> dict:
+    items = [{"id": i, "name": f"Магазин {i}", "business_type": "shop", "is_active": 1} for i in range(20)]
+    return {"items": items, "next_cursor": "20"}
+
+
+def _products_page() -> dict:
+    items = [
+        {
+            "id": i,
+            "shop_id": 7,
+            "category_id": 3,
+            "name": f"Лагман домашний {i}",
+            "description": "Тянутая лапша, говядина, овощи. Порция 450 г.",
+            "price": 420.5,
+            "is_active": 1,
+            "keywords_norm": "лагман лапша говядина",
+            "merchant_name": "Чайхана",
+            "business_type": "restaurant",
+        }
+        for i in range(100)
+    ]
+    return {"items": items, "next_cursor": "100"}
+
+
+def _orders_page() -> dict:
+    items = [
+        {
+            "id": i,
+            "shop_id": 7,
+            "client_user_id": 1000 + i,
+            "status": "new",
+            "total_amount": 1530.0,
+            "comment": "позвонить в дверь",
+            "fulfillment_type": "courier",
+            "created_at": "2026-10-18 12:00:00",
+            "updated_at": "2026-10-18 12:05:00",
+            "shop_name": "Чайхана",
+            "business_type": "restaurant",
+        }
+        for i in range(100)
+    ]
+    return {"items": items, "next_cursor": "100"}
+
+
+def _messages_page() -> dict:
+    items = [
+        {
+            "id": i,
+            "sender_user_id": 1000,
+            "sender_role": "client",
+            "message_text": "Здравствуйте, можно без лука?",
+            "created_at": "2026-10-18 12:00:00",
+        }
+        for i in range(100)
+    ]
+    return {"items": items, "next_cursor": "100"}
+
+
+PAGES: dict[str, Callable[[], dict]] = {
+    "catalog.merchants": _merchants_page,
+    "catalog.items": _products_page,
+    "orders.list": _orders_page,
+    "chats.messages": _messages_page,
+}
+
+
+def _fastapi_default(page: dict) -> bytes:
+    # Как FastAPI с response_model: валидация, jsonable_encoder, stdlib json.
+    validated = CursorPage.model_validate(page)
+    return JSONResponse(content=jsonable_encoder(validated)).body
+
+
+def _fast_with_model(page: dict) -> bytes:
+    validated = CursorPage.model_validate(page)
+    return FastJSONResponse(content=jsonable_encoder(validated)).body
+
+
+def _std_trusted(page: dict) -> bytes:
+    return StdJSONResponse(content=page).body
+
+
+def _fast_trusted(page: dict) -> bytes:
+    return FastJSONResponse(content=page).body
+
+
+MODES: dict[str, Callable[[dict], bytes]] = {
+    "fastapi_default": _fastapi_default,
+    "fast_with_response_model": _fast_with_model,
+    "std_trusted": _std_trusted,
+    "fast_trusted": _fast_trusted,
+}
+
+
+def _bytes_per_second(fn: Callable[[dict], bytes], page: dict, seconds: float) -> dict[str, float]:
+    count = 0
+    total = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        total += len(fn(page))
+        count += 1
+    elapsed = time.perf_counter() - started
+    return {"mb_per_second": round(total / elapsed / 1_000_000, 2), "pages_per_second": round(count / elapsed)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Скорость сериализации типичных страниц по роутерам")
+    parser.add_argument("--seconds", type=float, default=1.0)
+    args = parser.parse_args()
+
+    report: dict[str, object] = {"orjson": orjson is not None}
+    for page_name, build in PAGES.items():
+        page = build()
+        report[page_name] = {mode: _bytes_per_second(fn, page, args.seconds) for mode, fn in MODES.items()}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.chat_fanout import _free_port, _request
+from app.api.benchmarks.fixtures import create_synthetic_db, seed_categories, seed_products, seed_shops
+
+
+CLIENT_ID = 10
+
+
+def _one_start(db_path: Path, args: argparse.Namespace) -> dict:
+    """Один холодный старт: от запуска процесса до /health и до первой страницы каталога."""
+    port = _free_port()
+    env = {**os.environ, "DB_PATH": str(db_path), "API_JWT_SECRET": os.getenv("API_JWT_SECRET", "bench-secret")}
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError("Сервер завершился при старте")
+            try:
+                _request(base_url, "GET", "/health")
+                break
+            except OSError:
+                time.sleep(0.005)
+        health = time.perf_counter() - started
+        token = _request(base_url, "POST", "/auth/telegram", {"telegram_user_id": CLIENT_ID})["access_token"]
+        page_started = time.perf_counter()
+        _request(base_url, "GET", "/catalog/merchants?type=shop&limit=20", token=token)
+        first_page = time.perf_counter() - page_started
+        return {"health_ms": health * 1000, "first_page_ms": first_page * 1000}
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def _main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "startup.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, args.shops)
+        for shop_id in range(1, 21):
+            seed_categories(conn, shop_id, 10)
+        seed_products(conn, args.products, list(range(1, args.shops + 1)))
+        conn.close()
+
+        runs = [_one_start(path, args) for _ in range(args.repeat)]
+    report = {
+        key: {
+            "p50_ms": round(statistics.median(run[key] for run in runs), 1),
+            "max_ms": round(max(run[key] for run in runs), 1),
+        }
+        for key in ("health_ms", "first_page_ms")
+    }
+    report["repeat"] = args.repeat
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Время до первого запроса: запуск uvicorn app.api.main:app, /health и первая страница каталога"
+    )
+    parser.add_argument("--shops", type=int, default=200)
+    parser.add_argument("--products", type=int, default=20_000)
+    parser.add_argument("--repeat", type=int, default=10)
+    _main(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
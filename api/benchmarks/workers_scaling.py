@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.api.benchmarks.chat_fanout import _free_port, _request, _subscriber
+from app.api.benchmarks.fixtures import create_synthetic_db, seed_shops
+
+
+CLIENT_ID = 10
+PATHS = ["/orders?limit=20", "/catalog/merchants?type=shop&limit=20"]
+
+
+async def _connection(port: int, token: str, deadline: float, latencies: list[float]) -> None:
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            path = PATHS[i % len(PATHS)]
+            i += 1
+            started = time.perf_counter()
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: bench\r\nAuthorization: Bearer {token}\r\n\r\n".encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+    finally:
+        writer.close()
+
+
+def _client_process(port: int, token: str, connections: int, seconds: float, out: multiprocessing.Queue) -> None:
+    async def run() -> list[float]:
+        latencies: list[float] = []
+        deadline = time.perf_counter() + seconds
+        await asyncio.gather(*(_connection(port, token, deadline, latencies) for _ in range(connections)))
+        return latencies
+
+    out.put(asyncio.run(run()))
+
+
+def _load(port: int, token: str, clients: int, connections: int, seconds: float) -> dict:
+    out: multiprocessing.Queue = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_client_process, args=(port, token, connections, seconds, out))
+        for _ in range(clients)
+    ]
+    for proc in procs:
+        proc.start()
+    latencies = sorted(x for _ in procs for x in out.get())
+    for proc in procs:
+        proc.join()
+    return {
+        "requests": len(latencies),
+        "rps": round(len(latencies) / seconds),
+        "p50_ms": round(statistics.median(latencies) * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }
+
+
+async def _cross_worker_delivery(port: int, base_url: str, token: str, messages: int) -> float:
+    """Подписчик висит на одном воркере, сообщения уходят через новые соединения на любые воркеры."""
+    received: dict[int, float] = {}
+    ready = asyncio.Event()
+    task = asyncio.create_task(_subscriber(port, "/chats/1/stream", token, ready, received))
+    await ready.wait()
+    sent = []
+    for i in range(messages):
+        result = await asyncio.to_thread(_request, base_url, "POST", "/chats/1/messages", {"text": f"m{i}"}, token)
+        sent.append(result["message_id"])
+    await asyncio.sleep(1.0)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    return round(sum(1 for message_id in sent if message_id in received) / messages, 4)
+
+
+async def _run_workers(db_path: Path, workers: int, args: argparse.Namespace) -> dict:
+    port = _free_port()
+    env = {**os.environ, "DB_PATH": str(db_path), "API_JWT_SECRET": os.getenv("API_JWT_SECRET", "bench-secret")}
+    server = subprocess.Popen(
+        [sys.executable, "-m", "app.api.serve", "--workers", str(workers), "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                _request(base_url, "GET", "/health")
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        await asyncio.sleep(0.5 * workers)  # остальные воркеры тоже должны подняться
+        token = _request(base_url, "POST", "/auth/telegram", {"telegram_user_id": CLIENT_ID})["access_token"]
+        result = await asyncio.to_thread(_load, port, token, args.clients, args.connections, args.seconds)
+        result["cross_worker_chat_delivery"] = await _cross_worker_delivery(port, base_url, token, args.messages)
+        return result
+    finally:
+        server.terminate()
+        server.wait()
+
+
+async def _main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "workers.db"
+        conn = create_synthetic_db(path)
+        seed_shops(conn, 50)
+        conn.executemany(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (?, ?, 'new', 100)",
+            ((i % 50 + 1, CLIENT_ID) for i in range(200)),
+        )
+        conn.commit()
+        conn.close()
+        report = {"cpu_count": os.cpu_count(), "clients": args.clients, "connections_per_client": args.connections}
+        for workers in [int(x) for x in args.workers.split(",")]:
+            report[f"workers_{workers}"] = await _run_workers(path, workers, args)
+    print(json.dumps(report, indent=2))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Пропускная способность API от числа воркеров app.api.serve и доставка чатов между ними"
+    )
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--clients", type=int, default=4, help="процессов-генераторов нагрузки")
+    parser.add_argument("--connections", type=int, default=16, help="keep-alive соединений на процесс")
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--messages", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(_main(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+from app.api.benchmarks.batch_screen import SlowLink
+from app.api.benchmarks.chat_fanout import _free_port, _request
+from app.api.benchmarks.fixtures import create_synthetic_db, seed_products, seed_shops
+
+
+CLIENT_ID = 10
+# Режимы сервера: прямая запись транзакцией на запрос и write-behind с group commit,
+# каждый с обычным и с полным fsync на коммит.
+MODES = {
+    "direct": {},
+    "write_behind": {"API_WRITE_BEHIND": "1"},
+    "direct_sync_full": {"API_DB_SYNCHRONOUS": "FULL"},
+    "write_behind_sync_full": {"API_WRITE_BEHIND": "1", "API_DB_SYNCHRONOUS": "FULL"},
+}
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * q), len(ordered) - 1)]
+
+
+async def _client(
+    port: int, token: str, product_ids: list[int], order_id: int, deadline: float, args: argparse.Namespace, stats: dict
+) -> None:
+    """Один клиент приложения: оформляет заказ (иногда с повтором по таймауту), пишет в чат, читает заказы."""
+    link = SlowLink(port, 0, 0)
+    await link.connect()
+    try:
+        i = 0
+        while time.perf_counter() < deadline:
+            i += 1
+            key = uuid.uuid4().hex
+            body = json.dumps(
+                {"shop_id": 1, "items": [{"product_id": product_ids[i % len(product_ids)], "quantity": 1}]}
+            ).encode()
+            started = time.perf_counter()
+            result = json.loads(await link.request("POST", "/orders", token, body, {"Idempotency-Key": key}))
+            stats["order_latency"].append(time.perf_counter() - started)
+            if "order_id" not in result:
+                stats["errors"] += 1
+                continue
+            stats["orders"] += 1
+            if i % args.retry_every == 0:
+                # Клиент не дождался ответа и повторил запрос с тем же ключом.
+                again = json.loads(await link.request("POST", "/orders", token, body, {"Idempotency-Key": key}))
+                stats["duplicates"] += again.get("order_id") != result["order_id"]
+            message = json.dumps({"text": f"сообщение {i}"}).encode()
+            started = time.perf_counter()
+            await link.request("POST", f"/chats/{order_id}/messages", token, message)
+            stats["message_latency"].append(time.perf_counter() - started)
+            stats["messages"] += 1
+            if i % args.read_every == 0:
+                await link.request("GET", "/orders?limit=20", token)
+    finally:
+        link.close()
+
+
+async def _run_mode(db_template: Path, tmp: Path, name: str, overrides: dict, args: argparse.Namespace) -> dict:
+    path = tmp / f"{name}.db"
+    path.write_bytes(db_template.read_bytes())
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DB_PATH": str(path),
+        "API_JWT_SECRET": os.getenv("API_JWT_SECRET", "bench-secret"),
+        "API_DB_POOL": "1",
+        **overrides,
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.api.main:app", "--port", str(port), "--log-level", "warning"],
+        env=env,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(200):
+            try:
+                _request(base_url, "GET", "/health")
+                break
+            except OSError:
+                await asyncio.sleep(0.05)
+        token = _request(base_url, "POST", "/auth/telegram", {"telegram_user_id": CLIENT_ID})["access_token"]
+        conn = sqlite3.connect(path)
+        product_ids = [r[0] for r in conn.execute("SELECT id FROM products WHERE shop_id = 1 AND is_active = 1 LIMIT 50")]
+        order_ids = [r[0] for r in conn.execute("SELECT id FROM orders WHERE client_user_id = ?", (CLIENT_ID,))]
+        conn.close()
+
+        stats = {"orders": 0, "messages": 0, "errors": 0, "duplicates": 0, "order_latency": [], "message_latency": []}
+        started = time.perf_counter()
+        deadline = started + args.seconds
+        await asyncio.gather(
+            *(
+                _client(port, token, product_ids, order_ids[n % len(order_ids)], deadline, args, stats)
+                for n in range(args.clients)
+            )
+        )
+        elapsed = time.perf_counter() - started
+        db_stats = _request(base_url, "GET", "/health/db")
+    finally:
+        server.terminate()
+        server.wait()
+
+    conn = sqlite3.connect(path)
+    stored = conn.execute("SELECT COUNT(*) FROM orders WHERE client_user_id = ?", (CLIENT_ID,)).fetchone()[0]
+    conn.close()
+    return {
+        "orders_per_s": round(stats["orders"] / elapsed, 1),
+        "messages_per_s": round(stats["messages"] / elapsed, 1),
+        "order_p50_ms": round(statistics.median(stats["order_latency"]) * 1000, 2),
+        "order_p99_ms": round(_percentile(stats["order_latency"], 0.99) * 1000, 2),
+        "message_p99_ms": round(_percentile(stats["message_latency"], 0.99) * 1000, 2),
+        "errors": stats["errors"],
+        "duplicate_orders_on_retry": stats["duplicates"],
+        # Каждый подтверждённый клиенту заказ должен быть в базе после остановки сервера.
+        "orders_confirmed": stats["orders"],
+        "orders_in_db": stored - len(order_ids),
+        "write_queue": db_stats.get("write_queue"),
+    }
+
+
+async def _main(args: argparse.Namespace) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp = Path(tmp_dir)
+        template = tmp / "template.db"
+        conn = create_synthetic_db(template)
+        seed_shops(conn, 10)
+        seed_products(conn, 1_000, [1, 2, 3])
+        conn.executemany(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (1, ?, 'new', 100)",
+            ((CLIENT_ID,) for _ in range(args.clients)),
+        )
+        conn.commit()
+        conn.close()
+
+        report: dict = {"clients": args.clients, "seconds": args.seconds}
+        for name in args.modes.split(","):
+            report[name] = await _run_mode(template, tmp, name, MODES[name], args)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Всплеск заказов и сообщений чатов: запись транзакцией на запрос против очереди с group commit"
+    )
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--retry-every", type=int, default=10, help="Каждый N-й заказ повторяется с тем же ключом")
+    parser.add_argument("--read-every", type=int, default=5)
+    parser.add_argument("--modes", default=",".join(MODES))
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
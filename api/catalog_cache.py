@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
+import logging
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+from fastapi import Request, Response
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+# Версия списка магазинов (любое изменение shops) хранится под shop_id=0.
+ALL_SHOPS = 0
+
+
+class CatalogVersions:
+    """Зеркало api_catalog_versions в памяти.
+
+    Триггеры на shops/categories/products присваивают магазину новое значение
+    из общего счётчика, поэтому фоновый опрос забирает только изменившиеся строки
+    (`version > последней увиденной`). Проверка версии на запросе не трогает SQLite;
+    отставание ограничено `poll_seconds`.
+    """
+
+    def __init__(self, poll_seconds: float = 1.0) -> None:
+        self.poll_seconds = poll_seconds
+        self._versions: dict[int, int] = {}
+        self._last_seen = 0
+        self._task: asyncio.Task[None] | None = None
+
+    def current(self, shop_id: int) -> int:
+        return self._versions.get(shop_id, 0)
+
+    @property
+    def head(self) -> int:
+        """Последняя увиденная версия каталога по всем магазинам."""
+        return self._last_seen
+
+    async def refresh(self, db: Database) -> None:
+        async with read_conn(db) as conn:
+            cur = await conn.execute(
+                "SELECT shop_id, version FROM api_catalog_versions WHERE version > ?",
+                (self._last_seen,),
+            )
+            rows = await cur.fetchall()
+        for shop_id, version in rows:
+            self._versions[int(shop_id)] = int(version)
+            self._last_seen = max(self._last_seen, int(version))
+
+    def start(self, db: Database) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll_loop(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _poll_loop(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.refresh(db)
+            except Exception:
+                logger.exception("Не удалось обновить версии каталога")
+
+
+@dataclass(frozen=True)
+class CachedPage:
+    version: int
+    etag: str
+    body: bytes
+
+
+class CatalogCache:
+    """LRU готовых тел ответов каталога с ограничением по суммарному размеру."""
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024) -> None:
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, CachedPage] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.bytes_saved = 0
+
+    def get(self, key: tuple, version: int) -> CachedPage | None:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version:
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: CachedPage) -> None:
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old.body)
+        if len(entry.body) > self.max_bytes:
+            return
+        self._entries[key] = entry
+        self._bytes += len(entry.body)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted.body)
+
+    def stats(self) -> dict[str, int | float]:
+        lookups = self.hits + self.misses + self.not_modified
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "not_modified": self.not_modified,
+            "hit_ratio": round((self.hits + self.not_modified) / lookups, 4) if lookups else 0.0,
+            "bytes_saved": self.bytes_saved,
+        }
+
+
+def make_etag(key: tuple, version: int) -> str:
+    # Одинаковые ключ и версия дают побайтно одинаковое тело, поэтому ETag строгий
+    # и вычисляется без тела — 304 отдаётся даже после вытеснения записи из кэша.
+    digest = hashlib.sha1(repr((key, version)).encode("utf-8")).hexdigest()[:24]
+    return f'"{digest}"'
+
+
+def _etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    # Слабое сравнение: после сжатия клиент получает W/-версию того же ETag.
+    return any(tag.strip().removeprefix("W/") in {etag, "*"} for tag in if_none_match.split(","))
+
+
+async def cached_catalog_response(
+    request: Request,
+    key: tuple,
+    shop_id: int,
+    build: Callable[[], Awaitable[bytes]],
+) -> Response:
+    versions: CatalogVersions = request.app.state.catalog_versions
+    cache: CatalogCache = request.app.state.catalog_cache
+    version = versions.current(shop_id)
+    etag = make_etag(key, version)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    entry = cache.get(key, version)
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        cache.not_modified += 1
+        if entry is not None:
+            cache.bytes_saved += len(entry.body)
+        return Response(status_code=304, headers=headers)
+
+    if entry is not None:
+        cache.hits += 1
+        return Response(content=entry.body, media_type="application/json", headers=headers)
+
+    cache.misses += 1
+    body = await build()
+    # Пока строили страницу, версия могла смениться — такую страницу не кэшируем.
+    if versions.current(shop_id) == version:
+        cache.put(key, CachedPage(version=version, etag=etag, body=body))
+    return Response(content=body, media_type="application/json", headers=headers)
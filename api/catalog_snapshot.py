@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import time
+
+from fastapi import Request
+
+from app.api.catalog_cache import ALL_SHOPS
+from app.api.db_pool import read_conn
+from app.api.json_pages import JsonQuery
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_COLUMNS = "id, shop_id, category_id, business_type, merchant_name, price, search_keys, item"
+
+
+def _live_rows(where: str) -> JsonQuery:
+    """Строки снимка в том виде, в каком они должны лежать в api_catalog_items.
+
+    `item` — тот же JSON товара, что отдаёт полная выдача каталога по products;
+    `search_keys` — name, description и keywords_norm в нижнем регистре через перевод строки.
+    """
+    return JsonQuery(
+        f"""
+        SELECT p.id AS id, p.shop_id AS shop_id, p.category_id AS category_id,
+               s.business_type AS business_type, s.name AS merchant_name, p.price AS price,
+               lower(COALESCE(p.name, '')) || char(10) || lower(COALESCE(p.description, ''))
+                   || char(10) || lower(COALESCE(p.keywords_norm, '')) AS search_keys,
+               {{row}} AS item
+        FROM products p
+        LEFT JOIN shops s ON s.id = p.shop_id
+        WHERE p.is_active=1 {where}
+        """,
+        {"p": "products"},
+    )
+
+
+_LIVE_ALL = _live_rows("")
+_LIVE_SHOPS = _live_rows("AND p.shop_id IN (SELECT value FROM json_each(?))")
+
+
+class CatalogSnapshot:
+    """Денормализованный снимок каталога для чтения (api_catalog_items).
+
+    Страницы категорий и поиск читают одну таблицу: без JOIN с shops, без фильтра
+    is_active и без сборки JSON товара. Журнал изменений — api_catalog_versions,
+    который ведут триггеры: фоновый опрос пересобирает только магазины с версией
+    новее версии снимка. Снимок общий для всех воркеров, пересборка идёт в пишущей
+    транзакции, поэтому её выполняет тот воркер, который первым взял блокировку.
+
+    Страница магазина берётся из снимка, только если он не старше версии магазина
+    (`covers`), — в кэш ответов каталога устаревшая страница не попадёт. Поиск идёт
+    по всем магазинам сразу и допускает отставание не больше `max_lag_seconds`
+    (`within_lag`); дальше запросы читают живые таблицы, пока снимок не догонит.
+    """
+
+    def __init__(self, poll_seconds: float = 1.0, max_lag_seconds: float = 5.0) -> None:
+        self.poll_seconds = poll_seconds
+        self.max_lag_seconds = max_lag_seconds
+        # Версия api_catalog_versions, по которую включены изменения; -1 — снимок не прочитан.
+        self.version = -1
+        # Момент (monotonic) начала последней успешной синхронизации: все изменения,
+        # которых нет в снимке, сделаны позже.
+        self.synced_at: float | None = None
+        self._task: asyncio.Task[None] | None = None
+        self.rows_rebuilt = 0
+        self.refreshes = 0
+        self.live_fallbacks = 0
+
+    def covers(self, version: int) -> bool:
+        if self.version >= version:
+            return True
+        self.live_fallbacks += 1
+        return False
+
+    def within_lag(self, head: int) -> bool:
+        if self.version >= 0 and (
+            self.version >= head
+            or (self.synced_at is not None and time.monotonic() - self.synced_at <= self.max_lag_seconds)
+        ):
+            return True
+        self.live_fallbacks += 1
+        return False
+
+    async def refresh(self, db: Database) -> int:
+        """Догоняет журнал изменений. Возвращает число записанных строк снимка."""
+        started = time.monotonic()
+        async with read_conn(db) as conn:
+            cur = await conn.execute(
+                """
+                SELECT (SELECT version FROM api_catalog_snapshot WHERE id=1),
+                       (SELECT COALESCE(MAX(version), 0) FROM api_catalog_versions)
+                """
+            )
+            built, head = await cur.fetchone()
+        written = 0
+        if built is None or built < head:
+            written = await self._apply(db)
+        else:
+            self.version = max(self.version, int(built))
+        self.synced_at = started
+        return written
+
+    async def rebuild(self, db: Database) -> int:
+        """Полная пересборка снимка (после ручного ремонта базы или расхождения в проверке)."""
+        async with db.conn() as conn:
+            await conn.execute("DELETE FROM api_catalog_snapshot")
+            await conn.commit()
+        self.version = -1
+        return await self.refresh(db)
+
+    async def _apply(self, db: Database) -> int:
+        async with db.conn() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = await conn.execute("SELECT version FROM api_catalog_snapshot WHERE id=1")
+                row = await cur.fetchone()
+                if row is None:
+                    await conn.execute("DELETE FROM api_catalog_items")
+                    cur = await conn.execute(
+                        f"INSERT INTO api_catalog_items({SNAPSHOT_COLUMNS}) {await _LIVE_ALL.sql(conn)}"
+                    )
+                    written = cur.rowcount
+                    cur = await conn.execute("SELECT COALESCE(MAX(version), 0) FROM api_catalog_versions")
+                    version = int((await cur.fetchone())[0])
+                else:
+                    built = int(row[0])
+                    cur = await conn.execute(
+                        "SELECT shop_id, version FROM api_catalog_versions WHERE version > ?", (built,)
+                    )
+                    changes = [(int(r[0]), int(r[1])) for r in await cur.fetchall()]
+                    version = max([built, *(v for _, v in changes)])
+                    # Изменение магазина поднимает версию и его самого, и списка магазинов (ALL_SHOPS).
+                    shop_ids = json.dumps(sorted({shop_id for shop_id, _ in changes if shop_id != ALL_SHOPS}))
+                    written = 0
+                    if changes:
+                        await conn.execute(
+                            "DELETE FROM api_catalog_items WHERE shop_id IN (SELECT value FROM json_each(?))",
+                            (shop_ids,),
+                        )
+                        cur = await conn.execute(
+                            f"INSERT INTO api_catalog_items({SNAPSHOT_COLUMNS}) {await _LIVE_SHOPS.sql(conn)}",
+                            (shop_ids,),
+                        )
+                        written = cur.rowcount
+                if version != (int(row[0]) if row is not None else None):
+                    await conn.execute(
+                        """
+                        INSERT INTO api_catalog_snapshot(id, version, refreshed_at) VALUES (1, ?, ?)
+                        ON CONFLICT(id) DO UPDATE SET version=excluded.version, refreshed_at=excluded.refreshed_at
+                        """,
+                        (version, time.time()),
+                    )
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+        self.version = version
+        self.refreshes += 1
+        self.rows_rebuilt += written
+        return written
+
+    def start(self, db: Database) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll_loop(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _poll_loop(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.refresh(db)
+            except Exception:
+                logger.exception("Не удалось обновить снимок каталога")
+
+    def stats(self) -> dict[str, int | float | None]:
+        return {
+            "version": self.version,
+            "lag_seconds": round(time.monotonic() - self.synced_at, 3) if self.synced_at is not None else None,
+            "refreshes": self.refreshes,
+            "rows_rebuilt": self.rows_rebuilt,
+            "live_fallbacks": self.live_fallbacks,
+        }
+
+
+async def check_consistency(db: Database) -> dict:
+    """Сверяет снимок с живыми таблицами одним запросом (одно согласованное чтение).
+
+    Магазины с изменениями новее снимка не сверяются: их догонит ближайший опрос.
+    `missing` — строк нет в снимке, `extra` — в снимке лишние, `changed` — отличаются.
+    """
+    async with read_conn(db) as conn:
+        cur = await conn.execute("SELECT version FROM api_catalog_snapshot WHERE id=1")
+        row = await cur.fetchone()
+        if row is None:
+            return {"built": False}
+        cur = await conn.execute(
+            f"""
+            WITH pending AS (
+                SELECT shop_id FROM api_catalog_versions
+                WHERE version > (SELECT version FROM api_catalog_snapshot WHERE id=1)
+            ),
+            live AS (
+                SELECT * FROM ({await _LIVE_ALL.sql(conn)})
+                WHERE shop_id NOT IN (SELECT shop_id FROM pending)
+            ),
+            snap AS (
+                SELECT {SNAPSHOT_COLUMNS} FROM api_catalog_items
+                WHERE shop_id NOT IN (SELECT shop_id FROM pending)
+            )
+            SELECT 'live', id FROM (SELECT * FROM live EXCEPT SELECT * FROM snap)
+            UNION ALL
+            SELECT 'snapshot', id FROM (SELECT * FROM snap EXCEPT SELECT * FROM live)
+            """
+        )
+        diff = await cur.fetchall()
+        cur = await conn.execute("SELECT COUNT(*) FROM api_catalog_items")
+        rows = int((await cur.fetchone())[0])
+    only_live = {int(r[1]) for r in diff if r[0] == "live"}
+    only_snapshot = {int(r[1]) for r in diff if r[0] == "snapshot"}
+    changed = only_live & only_snapshot
+    return {
+        "built": True,
+        "version": int(row[0]),
+        "rows": rows,
+        "mismatched": len(only_live | only_snapshot),
+        "missing": sorted(only_live - changed)[:20],
+        "extra": sorted(only_snapshot - changed)[:20],
+        "changed": sorted(changed)[:20],
+        "consistent": not diff,
+    }
+
+
+def get_catalog_snapshot(request: Request) -> CatalogSnapshot | None:
+    return getattr(request.app.state, "catalog_snapshot", None)
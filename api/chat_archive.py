@@ -0,0 +1,236 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import time
+import zlib
+
+import aiosqlite
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+try:
+    import zstandard
+except ImportError:  # zstd необязателен: без него архив пишется zlib
+    zstandard = None
+
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_CODECS = ("zlib", "zstd")
+
+# JSON сообщения в выдаче GET /chats/{order_id}/messages. Архив хранит ровно эти
+# строки, поэтому страница из архива побайтно совпадает со страницей из таблицы.
+MESSAGE_JSON = """json_object(
+            'id', id, 'sender_user_id', sender_user_id, 'sender_role', sender_role,
+            'message_text', message_text, 'created_at', created_at
+        )"""
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return zlib.compress(data, 9)
+
+
+def _decompress(codec: str, blob: bytes) -> bytes:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Блок архива чатов сжат zstd, а модуль zstandard не установлен")
+        return zstandard.ZstdDecompressor().decompress(blob)
+    return zlib.decompress(blob)
+
+
+def pack_messages(codec: str, rows: list[tuple[int, str]]) -> bytes:
+    """Блок сообщений заказа: строки `id<TAB>json` через перевод строки, сжатые целиком."""
+    return _compress(codec, "\n".join(f"{message_id}\t{data}" for message_id, data in rows).encode("utf-8"))
+
+
+def unpack_messages(codec: str, blob: bytes) -> list[tuple[int, str]]:
+    rows = []
+    for line in _decompress(codec, blob).decode("utf-8").split("\n"):
+        message_id, _, data = line.partition("\t")
+        rows.append((int(message_id), data))
+    return rows
+
+
+async def archived_messages(
+    conn: aiosqlite.Connection,
+    order_id: int,
+    after_id: int | None,
+    descending: bool,
+    limit: int,
+) -> list[tuple[int, str]]:
+    """Страница архивных сообщений заказа в порядке keyset: (id, json)."""
+    cur = await conn.execute("SELECT codec, block FROM api_chat_archive WHERE order_id=?", (order_id,))
+    row = await cur.fetchone()
+    if row is None:
+        return []
+    rows = unpack_messages(row[0], row[1])
+    if descending:
+        rows = [r for r in reversed(rows) if after_id is None or r[0] < after_id]
+    else:
+        rows = [r for r in rows if after_id is None or r[0] > after_id]
+    return rows[:limit]
+
+
+class ChatArchiver:
+    """Перенос чатов давно закрытых заказов из order_chat_messages в сжатые блоки.
+
+    Заказ попадает в архив, если он в конечном статусе и не менялся `days` дней.
+    Все его сообщения одной транзакцией переезжают в один блок api_chat_archive
+    (сообщения, пришедшие после архивации, дописываются в блок при следующем проходе),
+    поэтому id в архиве всегда меньше id оставшихся в таблице. Сводка api_chat_summary
+    не меняется: список чатов архив не замечает.
+
+    Проход идёт пачками по `batch_orders` заказов с паузой `pause_seconds` между ними,
+    чтобы не держать блокировку записи подряд; курсор по id заказа хранится в памяти,
+    прогресс — в `stats()`. Бот после архивации этих сообщений в своей таблице не видит.
+    """
+
+    def __init__(
+        self,
+        days: float,
+        closed_statuses: list[str],
+        codec: str = "zlib",
+        batch_orders: int = 50,
+        pause_seconds: float = 0.2,
+        interval_seconds: float = 3600.0,
+    ) -> None:
+        if codec not in ARCHIVE_CODECS:
+            raise ValueError(f"Неизвестный кодек архива чатов: {codec}")
+        if codec == "zstd" and zstandard is None:
+            raise RuntimeError("API_CHAT_ARCHIVE_CODEC=zstd требует пакет zstandard")
+        self.days = days
+        self.closed_statuses = closed_statuses
+        self.codec = codec
+        self.batch_orders = batch_orders
+        self.pause_seconds = pause_seconds
+        self.interval_seconds = interval_seconds
+        self._task: asyncio.Task[None] | None = None
+        self._cursor = 0
+        self.running = False
+        self.passes = 0
+        self.orders_archived = 0
+        self.messages_archived = 0
+        self.bytes_raw = 0
+        self.bytes_packed = 0
+        self.last_pass_at: float | None = None
+
+    async def _candidates(self, db: Database) -> list[int]:
+        async with read_conn(db) as conn:
+            cur = await conn.execute(
+                """
+                SELECT o.id
+                FROM orders o
+                WHERE o.id > ?
+                  AND o.status IN (SELECT value FROM json_each(?))
+                  AND COALESCE(o.updated_at, o.created_at) < datetime('now', ?)
+                  AND EXISTS (SELECT 1 FROM order_chat_messages m WHERE m.order_id = o.id)
+                ORDER BY o.id
+                LIMIT ?
+                """,
+                (self._cursor, json.dumps(self.closed_statuses), f"-{self.days} days", self.batch_orders),
+            )
+            return [int(r[0]) for r in await cur.fetchall()]
+
+    async def _archive_batch(self, db: Database, order_ids: list[int]) -> None:
+        orders = messages = raw = packed = 0
+        async with db.conn() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                for order_id in order_ids:
+                    cur = await conn.execute(
+                        f"SELECT id, {MESSAGE_JSON} FROM order_chat_messages WHERE order_id=? ORDER BY id",
+                        (order_id,),
+                    )
+                    live = [(int(r[0]), r[1]) for r in await cur.fetchall()]
+                    if not live:
+                        continue
+                    cur = await conn.execute(
+                        "SELECT codec, block FROM api_chat_archive WHERE order_id=?", (order_id,)
+                    )
+                    existing = await cur.fetchone()
+                    rows = (unpack_messages(existing[0], existing[1]) if existing else []) + live
+                    block = pack_messages(self.codec, rows)
+                    await conn.execute(
+                        """
+                        INSERT INTO api_chat_archive(order_id, codec, block, message_count, last_message_id, archived_at)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(order_id) DO UPDATE SET
+                            codec=excluded.codec,
+                            block=excluded.block,
+                            message_count=excluded.message_count,
+                            last_message_id=excluded.last_message_id,
+                            archived_at=excluded.archived_at
+                        """,
+                        (order_id, self.codec, block, len(rows), rows[-1][0], time.time()),
+                    )
+                    await conn.execute(
+                        "DELETE FROM order_chat_messages WHERE order_id=? AND id <= ?", (order_id, live[-1][0])
+                    )
+                    orders += 1
+                    messages += len(live)
+                    raw += sum(len(data) for _, data in rows)
+                    packed += len(block)
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.commit()
+        self.orders_archived += orders
+        self.messages_archived += messages
+        self.bytes_raw += raw
+        self.bytes_packed += packed
+
+    async def run_pass(self, db: Database) -> int:
+        """Один полный проход по заказам. Возвращает число заархивированных заказов."""
+        self.running = True
+        self._cursor = 0
+        before = self.orders_archived
+        try:
+            while order_ids := await self._candidates(db):
+                await self._archive_batch(db, order_ids)
+                self._cursor = order_ids[-1]
+                await asyncio.sleep(self.pause_seconds)
+        finally:
+            self.running = False
+        self.passes += 1
+        self.last_pass_at = time.time()
+        return self.orders_archived - before
+
+    def start(self, db: Database) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._loop(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _loop(self, db: Database) -> None:
+        while True:
+            try:
+                archived = await self.run_pass(db)
+                if archived:
+                    logger.info("Архив чатов: перенесено заказов %d, %s", archived, self.stats())
+            except Exception:
+                logger.exception("Не удалось заархивировать чаты")
+            await asyncio.sleep(self.interval_seconds)
+
+    def stats(self) -> dict[str, int | float | bool | str | None]:
+        return {
+            "codec": self.codec,
+            "running": self.running,
+            "cursor_order_id": self._cursor,
+            "passes": self.passes,
+            "orders_archived": self.orders_archived,
+            "messages_archived": self.messages_archived,
+            "compression_ratio": round(self.bytes_raw / self.bytes_packed, 2) if self.bytes_packed else None,
+            "last_pass_at": self.last_pass_at,
+        }
+
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Iterable
+
+from fastapi import Request
+
+
+class Subscription:
+    """Подписка на набор топиков с ограниченной очередью.
+
+    Если подписчик не успевает читать и очередь переполнена, он отключается
+    (`overflowed`), а клиент переподключается с последним полученным id.
+    Так медленный клиент не тормозит публикацию и не копит память.
+    """
+
+    def __init__(self, hub: ChatHub, topics: frozenset[str], maxsize: int) -> None:
+        self.hub = hub
+        self.topics = topics
+        self.queue: asyncio.Queue[dict] = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def offer(self, message: dict) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+            self.hub.dropped += 1
+
+    async def get(self, timeout: float) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self) -> None:
+        self.hub.unsubscribe(self)
+
+
+class ChatHub:
+    """Внутрипроцессный pub/sub для сообщений чатов заказов.
+
+    Топики: `order:{order_id}` — чат заказа, `client:{user_id}` и `shop:{shop_id}` —
+    входящие клиента и администратора.
+    """
+
+    def __init__(self, queue_size: int = 100) -> None:
+        self.queue_size = queue_size
+        self._topics: dict[str, set[Subscription]] = {}
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    def subscribe(self, topics: Iterable[str]) -> Subscription:
+        subscription = Subscription(self, frozenset(topics), self.queue_size)
+        for topic in subscription.topics:
+            self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for topic in subscription.topics:
+            subscribers = self._topics.get(topic)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._topics[topic]
+
+    def publish(self, topics: Iterable[str], message: dict) -> None:
+        self.published += 1
+        # Один подписчик может слушать несколько топиков сообщения — доставляем один раз.
+        targets: set[Subscription] = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        for subscription in targets:
+            subscription.offer(message)
+        self.delivered += len(targets)
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "topics": len(self._topics),
+            "subscriptions": len({s for subs in self._topics.values() for s in subs}),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_slow_subscribers": self.dropped,
+        }
+
+
+def message_topics(order: dict) -> list[str]:
+    return [f"order:{order['id']}", f"client:{order['client_user_id']}", f"shop:{order['shop_id']}"]
+
+
+def get_chat_hub(request: Request) -> ChatHub:
+    hub = getattr(request.app.state, "chat_hub", None)
+    if not hub:
+        raise RuntimeError("Chat hub is not initialized")
+    return hub
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import gzip
+import os
+import time
+import zlib
+from collections import OrderedDict
+from collections.abc import Callable
+
+from app.api.metrics import record_stage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli необязателен
+    brotli = None
+
+
+# Сжимаем только текстовые ответы; text/event-stream сюда не входит.
+COMPRESSIBLE_TYPES = (b"application/json", b"text/plain", b"text/html")
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    weights: dict[str, float] = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    return weights
+
+
+class CompressionMiddleware:
+    """ASGI-middleware: gzip/brotli по Accept-Encoding для ответов больше порога.
+
+    Ответы одним телом сжимаются целиком, если они больше порога; потоковый JSON
+    сжимается кусками, SSE проходит как есть. brotli выбирается, если клиент его принимает и пакет
+    установлен. Сжатые тела ответов со строгим ETag (страницы каталога)
+    запоминаются: одинаковый ETag — одинаковое тело, повторно не сжимаем.
+    """
+
+    def __init__(
+        self,
+        app: Callable,
+        min_bytes: int = 1024,
+        gzip_level: int = 5,
+        brotli_quality: int = 4,
+        cache_entries: int = 1024,
+    ) -> None:
+        self.app = app
+        self.min_bytes = min_bytes
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_entries = cache_entries
+        self._cache: OrderedDict[tuple[bytes, str], bytes] = OrderedDict()
+
+    def choose_encoding(self, accept_encoding: str) -> str | None:
+        weights = parse_accept_encoding(accept_encoding)
+        if brotli is not None and weights.get("br", 0.0) > 0:
+            return "br"
+        if weights.get("gzip", 0.0) > 0:
+            return "gzip"
+        return None
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    def _compressed(self, body: bytes, encoding: str, etag: bytes | None) -> bytes:
+        if etag is None or etag.startswith(b"W/"):
+            return self.compress(body, encoding)
+        key = (etag, encoding)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+        compressed = self._cache[key] = self.compress(body, encoding)
+        if len(self._cache) > self.cache_entries:
+            self._cache.popitem(last=False)
+        return compressed
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        accept = next((value for name, value in scope["headers"] if name == b"accept-encoding"), b"")
+        encoding = self.choose_encoding(accept.decode("latin-1")) if accept else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: dict | None = None
+        stream: _StreamCompressor | None = None
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal start, stream
+            if message["type"] == "http.response.start":
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            more_body = message.get("more_body", False)
+            if stream is not None:
+                message["body"] = stream.compress(message.get("body", b""), more_body)
+                await send(message)
+                return
+            if start is None:
+                await send(message)
+                return
+            pending, start = start, None
+            if not more_body:
+                await send(self._encode(pending, message, encoding))
+            elif self._compressible(pending):
+                # Потоковый JSON (например, /batch) сжимается кусками со сбросом после каждого,
+                # чтобы клиент получал элементы сразу, а не в конце ответа.
+                stream = _StreamCompressor(encoding, self.gzip_level, self.brotli_quality)
+                message["body"] = stream.compress(message.get("body", b""), more_body)
+                await send(self._encoded_start(pending, encoding, None))
+            else:
+                await send(pending)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _compressible(start: dict) -> bool:
+        content_type = b""
+        for name, value in start.get("headers", ()):
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _encode(self, start: dict, message: dict, encoding: str) -> dict:
+        """Подменяет тело в `message` на сжатое и возвращает исправленный http.response.start."""
+        body = message.get("body", b"")
+        if len(body) < self.min_bytes or not self._compressible(start):
+            return start
+        etag = next((value for name, value in start.get("headers", ()) if name == b"etag"), None)
+        started = time.perf_counter()
+        compressed = self._compressed(body, encoding, etag)
+        record_stage("compress", started)
+        message["body"] = compressed
+        return self._encoded_start(start, encoding, len(compressed))
+
+    @staticmethod
+    def _encoded_start(start: dict, encoding: str, length: int | None) -> dict:
+        new_headers = []
+        for name, value in start.get("headers", ()):
+            if name == b"content-length":
+                if length is None:
+                    continue
+                value = str(length).encode()
+            elif name == b"etag" and not value.startswith(b"W/"):
+                # Сжатое представление отличается побайтно, поэтому ETag становится слабым,
+                # как у nginx; If-None-Match сравнивается слабо и 304 продолжает работать.
+                value = b"W/" + value
+            new_headers.append((name, value))
+        new_headers.append((b"content-encoding", encoding.encode()))
+        new_headers.append((b"vary", b"Accept-Encoding"))
+        return {**start, "headers": new_headers}
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int) -> None:
+        self._brotli = brotli.Compressor(quality=brotli_quality) if encoding == "br" else None
+        self._gzip = None if self._brotli is not None else zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, more_body: bool) -> bytes:
+        if self._brotli is not None:
+            return self._brotli.process(data) + (self._brotli.flush() if more_body else self._brotli.finish())
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+
+
+def compression_from_env() -> dict[str, int] | None:
+    """Параметры CompressionMiddleware из окружения; None — сжатие выключено."""
+    if os.getenv("API_COMPRESSION", "1") != "1":
+        return None
+    return {
+        "min_bytes": int(os.getenv("API_COMPRESS_MIN_BYTES", "1024")),
+        "gzip_level": int(os.getenv("API_GZIP_LEVEL", "5")),
+        "brotli_quality": int(os.getenv("API_BROTLI_QUALITY", "4")),
+        "cache_entries": int(os.getenv("API_COMPRESS_CACHE_ENTRIES", "1024")),
+    }
@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+import aiosqlite
+
+from app.db.database import DBConfig, Database
+
+
+@dataclass(frozen=True)
+class PoolConfig:
+    readers: int = 4
+    synchronous: str = "NORMAL"
+    mmap_size: int = 256 * 1024 * 1024
+    cache_size_kib: int = 64 * 1024
+    busy_timeout_ms: int = 5000
+
+    @classmethod
+    def from_env(cls) -> PoolConfig:
+        return cls(
+            readers=max(int(os.getenv("API_DB_READERS", "4")), 1),
+            synchronous=os.getenv("API_DB_SYNCHRONOUS", "NORMAL").upper(),
+            mmap_size=int(os.getenv("API_DB_MMAP_SIZE", str(256 * 1024 * 1024))),
+            cache_size_kib=int(os.getenv("API_DB_CACHE_SIZE_KIB", str(64 * 1024))),
+            busy_timeout_ms=int(os.getenv("API_DB_BUSY_TIMEOUT_MS", "5000")),
+        )
+
+
+class PooledDatabase(Database):
+    """Database с тёплыми соединениями: N читателей и один выделенный писатель.
+
+    `conn()` выдаёт соединение писателя, запросы на запись встают в очередь за ним,
+    а не падают с `database is locked`. `read()` выдаёт соединение из пула читателей.
+    Прагмы применяются один раз при открытии соединения.
+    """
+
+    def __init__(self, config: DBConfig, pool: PoolConfig | None = None) -> None:
+        super().__init__(config)
+        self.pool = pool or PoolConfig()
+        self._readers: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+        self._all_readers: list[aiosqlite.Connection] = []
+        self._writer: aiosqlite.Connection | None = None
+        self._write_lock = asyncio.Lock()
+        self._write_owner: asyncio.Task | None = None
+        self._open_lock = asyncio.Lock()
+        self.read_checkouts = 0
+        self.write_checkouts = 0
+        self.read_wait_seconds = 0.0
+        self.write_wait_seconds = 0.0
+        self.max_read_wait_seconds = 0.0
+        self.max_write_wait_seconds = 0.0
+
+    async def _connect(self, readonly: bool) -> aiosqlite.Connection:
+        path = self.config.path
+        if readonly:
+            conn = await aiosqlite.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            conn = await aiosqlite.connect(path)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute(f"PRAGMA busy_timeout={int(self.pool.busy_timeout_ms)}")
+        if not readonly:
+            await conn.execute("PRAGMA journal_mode=WAL")
+        await conn.execute(f"PRAGMA synchronous={self.pool.synchronous}")
+        await conn.execute(f"PRAGMA mmap_size={int(self.pool.mmap_size)}")
+        await conn.execute(f"PRAGMA cache_size=-{int(self.pool.cache_size_kib)}")
+        return conn
+
+    async def open(self) -> None:
+        async with self._open_lock:
+            if self._writer is not None:
+                return
+            # Писатель открывается первым: он переводит базу в WAL.
+            self._writer = await self._connect(readonly=False)
+            for _ in range(self.pool.readers):
+                reader = await self._connect(readonly=True)
+                self._all_readers.append(reader)
+                self._readers.put_nowait(reader)
+
+    async def close(self) -> None:
+        async with self._open_lock:
+            for reader in self._all_readers:
+                await reader.close()
+            self._all_readers.clear()
+            self._readers = asyncio.Queue()
+            if self._writer is not None:
+                await self._writer.close()
+                self._writer = None
+
+    @asynccontextmanager
+    async def conn(self) -> AsyncIterator[aiosqlite.Connection]:
+        if self._writer is None:
+            await self.open()
+        task = asyncio.current_task()
+        if task is not None and self._write_owner is task:
+            # Блокировка не реентерабельна: вложенный conn() ждал бы сам себя вечно.
+            raise RuntimeError("Повторный вход в соединение писателя из той же задачи")
+        started = time.perf_counter()
+        async with self._write_lock:
+            waited = time.perf_counter() - started
+            self.write_checkouts += 1
+            self.write_wait_seconds += waited
+            self.max_write_wait_seconds = max(self.max_write_wait_seconds, waited)
+            writer = self._writer
+            self._write_owner = task
+            try:
+                yield writer
+            finally:
+                self._write_owner = None
+                # Соединение общее: незавершённая транзакция не должна достаться следующему.
+                if writer.in_transaction:
+                    await writer.rollback()
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[aiosqlite.Connection]:
+        if self._writer is None:
+            await self.open()
+        started = time.perf_counter()
+        reader = await self._readers.get()
+        waited = time.perf_counter() - started
+        self.read_checkouts += 1
+        self.read_wait_seconds += waited
+        self.max_read_wait_seconds = max(self.max_read_wait_seconds, waited)
+        try:
+            yield reader
+        finally:
+            if reader.in_transaction:
+                await reader.rollback()
+            self._readers.put_nowait(reader)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "readers": self.pool.readers,
+            "readers_idle": self._readers.qsize(),
+            "writer_busy": int(self._write_lock.locked()),
+            "read_checkouts": self.read_checkouts,
+            "write_checkouts": self.write_checkouts,
+            "read_wait_seconds_total": round(self.read_wait_seconds, 6),
+            "write_wait_seconds_total": round(self.write_wait_seconds, 6),
+            "read_wait_seconds_max": round(self.max_read_wait_seconds, 6),
+            "write_wait_seconds_max": round(self.max_write_wait_seconds, 6),
+        }
+
+
+def read_conn(db: Database):
+    """Соединение для чтения: из пула читателей, если он есть, иначе обычное."""
+    if isinstance(db, PooledDatabase):
+        return db.read()
+    return db.conn()
+
+
+def create_database(path: str) -> Database:
+    if os.getenv("API_DB_POOL", "0") == "1":
+        return PooledDatabase(DBConfig(path=path), PoolConfig.from_env())
+    return Database(DBConfig(path=path))
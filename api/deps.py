@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
+from typing import Any
 
 from fastapi import Depends, Header, HTTPException, Request, status
 
+from app.api.metrics import record_stage
+from app.api.scope_versions import ScopeVersions
 from app.api.security import decode_access_token
 from app.db.database import Database
 
@@ -12,6 +16,13 @@ from app.db.database import Database
 class CurrentUser:
     user_id: int
     role: str
+    # Магазины администратора из токена; None — токен без встроенных прав.
+    shop_ids: frozenset[int] | None = None
+
+
+# Ключ ASGI scope, в котором /batch передаёт подзапросам уже проверенного пользователя.
+# Из HTTP его не выставить: scope собирает сервер, а не клиент.
+BATCH_USER_SCOPE_KEY = "app.api.batch_user"
 
 
 def get_db(request: Request) -> Database:
@@ -30,10 +41,28 @@ def get_token_from_header(authorization: str | None = Header(default=None)) -> s
     return parts[1].strip()
 
 
-def get_current_user(token: str = Depends(get_token_from_header)) -> CurrentUser:
+def _token_shop_ids(request: Request, user_id: int, payload: dict[str, Any]) -> frozenset[int] | None:
+    if "scope_ver" not in payload:
+        return None
+    versions: ScopeVersions | None = getattr(request.app.state, "scope_versions", None)
+    if versions is None or int(payload["scope_ver"]) != versions.current(user_id):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Права доступа изменились, войдите заново")
+    try:
+        return frozenset(int(shop_id) for shop_id in payload.get("shops", []))
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен") from exc
+
+
+def get_current_user(request: Request, token: str = Depends(get_token_from_header)) -> CurrentUser:
+    batch_user = request.scope.get(BATCH_USER_SCOPE_KEY)
+    if batch_user is not None:
+        return batch_user
+    started = time.perf_counter()
     payload = decode_access_token(token)
+    record_stage("jwt", started)
     user_id = int(payload.get("sub", 0))
     role = str(payload.get("role", "")).strip()
     if user_id <= 0 or role not in {"client", "admin_shop", "admin_restaurant"}:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен")
-    return CurrentUser(user_id=user_id, role=role)
+    shop_ids = _token_shop_ids(request, user_id, payload) if role != "client" else None
+    return CurrentUser(user_id=user_id, role=role, shop_ids=shop_ids)
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import secrets
+import time
+from collections.abc import Callable
+
+from fastapi import Request
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[dict], None]
+
+CHAT_MESSAGE = "chat.message"
+SCOPE_INVALIDATE = "scope.invalidate"
+
+
+class EventBus:
+    """События для внутрипроцессных кэшей и подписчиков чатов.
+
+    Событие сразу обрабатывается в своём процессе. В режиме нескольких воркеров
+    (`shared`) оно ещё пишется в api_events, а остальные воркеры забирают новые
+    строки фоновым опросом (`id > последнего увиденного`) — как CatalogVersions.
+    Свои события воркер при опросе пропускает по `origin`. Таблица чистится от
+    событий старше `retention_seconds`: они нужны только воркерам, что живы сейчас.
+    """
+
+    def __init__(self, shared: bool = False, poll_seconds: float = 0.1, retention_seconds: float = 60.0) -> None:
+        self.shared = shared
+        self.poll_seconds = poll_seconds
+        self.retention_seconds = retention_seconds
+        self.origin = f"{os.getpid()}-{secrets.token_hex(4)}"
+        self._handlers: dict[str, list[EventHandler]] = {}
+        self._last_seen = 0
+        self._last_prune = 0.0
+        self._task: asyncio.Task[None] | None = None
+        self.published = 0
+        self.received = 0
+
+    def on(self, channel: str, handler: EventHandler) -> None:
+        self._handlers.setdefault(channel, []).append(handler)
+
+    def _dispatch(self, channel: str, payload: dict) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("Ошибка обработчика события %s", channel)
+
+    def notify(self, channel: str, payload: dict) -> None:
+        """Событие только для своего процесса: для изменений, которые каждый воркер замечает сам."""
+        self._dispatch(channel, payload)
+
+    async def publish(self, db: Database, channel: str, payload: dict) -> None:
+        self.published += 1
+        self._dispatch(channel, payload)
+        if not self.shared:
+            return
+        async with db.conn() as conn:
+            await conn.execute(
+                "INSERT INTO api_events(channel, payload, origin, created_at) VALUES (?, ?, ?, ?)",
+                (channel, json.dumps(payload, ensure_ascii=False), self.origin, time.time()),
+            )
+            await conn.commit()
+
+    async def refresh(self, db: Database) -> None:
+        async with read_conn(db) as conn:
+            cur = await conn.execute(
+                "SELECT id, channel, payload, origin FROM api_events WHERE id > ? ORDER BY id",
+                (self._last_seen,),
+            )
+            rows = await cur.fetchall()
+        for event_id, channel, payload, origin in rows:
+            self._last_seen = int(event_id)
+            if origin == self.origin:
+                continue
+            self.received += 1
+            self._dispatch(channel, json.loads(payload))
+
+    async def _prune(self, db: Database) -> None:
+        async with db.conn() as conn:
+            await conn.execute("DELETE FROM api_events WHERE created_at < ?", (time.time() - self.retention_seconds,))
+            await conn.commit()
+
+    async def start(self, db: Database) -> None:
+        if not self.shared or self._task is not None:
+            return
+        # События до старта воркера к нему не относятся: читаем только новые.
+        async with read_conn(db) as conn:
+            cur = await conn.execute("SELECT COALESCE(MAX(id), 0) FROM api_events")
+            self._last_seen = int((await cur.fetchone())[0])
+        self._task = asyncio.create_task(self._poll_loop(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _poll_loop(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.refresh(db)
+                if time.monotonic() - self._last_prune > self.retention_seconds:
+                    self._last_prune = time.monotonic()
+                    await self._prune(db)
+            except Exception:
+                logger.exception("Не удалось прочитать события других воркеров")
+
+    def stats(self) -> dict[str, int | bool | str]:
+        return {
+            "shared": self.shared,
+            "origin": self.origin,
+            "last_seen": self._last_seen,
+            "published": self.published,
+            "received_from_workers": self.received,
+        }
+
+
+def get_event_bus(request: Request) -> EventBus:
+    bus = getattr(request.app.state, "event_bus", None)
+    if not bus:
+        raise RuntimeError("Event bus is not initialized")
+    return bus
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import time
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass
+
+import aiosqlite
+from fastapi import HTTPException, Request
+from pydantic import BaseModel
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+
+class IdempotencyConflict(Exception):
+    """Ключ уже записан другим запросом (например, параллельным повтором в соседнем воркере)."""
+
+
+def request_fingerprint(route: str, payload: BaseModel) -> str:
+    """Отпечаток тела запроса: повтор с тем же ключом, но другим телом — ошибка клиента."""
+    return hashlib.sha256(f"{route}\n{payload.model_dump_json()}".encode("utf-8")).hexdigest()
+
+
+@dataclass(frozen=True)
+class IdempotencyRecord:
+    user_id: int
+    key: str
+    request_hash: str
+    # Записи старше этого момента (unix time) считаются истёкшими и перезаписываются.
+    expired_before: float
+
+    async def save(self, conn: aiosqlite.Connection, result: dict) -> None:
+        """Сохраняет результат в транзакции `conn`, той же, в которой сделана запись.
+
+        Если живая запись с этим ключом уже есть, поднимает IdempotencyConflict:
+        вызывающий откатывает свою транзакцию и отдаёт сохранённый ответ.
+        """
+        cur = await conn.execute(
+            """
+            INSERT INTO api_idempotency(user_id, key, request_hash, response, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(user_id, key) DO UPDATE SET
+                request_hash=excluded.request_hash,
+                response=excluded.response,
+                created_at=excluded.created_at
+            WHERE api_idempotency.created_at < ?
+            """,
+            (
+                self.user_id,
+                self.key,
+                self.request_hash,
+                json.dumps(result, ensure_ascii=False),
+                time.time(),
+                self.expired_before,
+            ),
+        )
+        if cur.rowcount == 0:
+            raise IdempotencyConflict(self.key)
+
+
+class IdempotencyStore:
+    """Выполняет запрос с Idempotency-Key не больше одного раза за `ttl_seconds`.
+
+    Результат пишется в api_idempotency в той же транзакции, что и сам заказ, поэтому
+    повтор после обрыва связи получает тот же order_id. Одновременные повторы в
+    одном процессе ждут первого запроса, а не гоняются за блокировку записи;
+    между воркерами дубль отсекает первичный ключ таблицы.
+    """
+
+    def __init__(self, ttl_seconds: float = 24 * 3600) -> None:
+        self.ttl_seconds = ttl_seconds
+        self._inflight: dict[tuple[int, str], asyncio.Future[None]] = {}
+        self.replayed = 0
+
+    async def _lookup(self, db: Database, user_id: int, key: str) -> tuple[str, dict] | None:
+        async with read_conn(db) as conn:
+            cur = await conn.execute(
+                "SELECT request_hash, response FROM api_idempotency WHERE user_id=? AND key=? AND created_at >= ?",
+                (user_id, key, time.time() - self.ttl_seconds),
+            )
+            row = await cur.fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _replay(self, stored: tuple[str, dict], request_hash: str) -> dict:
+        stored_hash, result = stored
+        if stored_hash != request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key уже использован с другим запросом")
+        self.replayed += 1
+        return result
+
+    async def run(
+        self,
+        db: Database,
+        user_id: int,
+        key: str,
+        request_hash: str,
+        execute: Callable[[IdempotencyRecord], Awaitable[dict]],
+    ) -> tuple[dict, bool]:
+        """Возвращает (результат, был ли он взят из сохранённых)."""
+        inflight_key = (user_id, key)
+        while (pending := self._inflight.get(inflight_key)) is not None:
+            await asyncio.shield(pending)
+        done = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = done
+        try:
+            stored = await self._lookup(db, user_id, key)
+            if stored is not None:
+                return self._replay(stored, request_hash), True
+            record = IdempotencyRecord(user_id, key, request_hash, time.time() - self.ttl_seconds)
+            try:
+                return await execute(record), False
+            except IdempotencyConflict:
+                stored = await self._lookup(db, user_id, key)
+                if stored is None:
+                    raise HTTPException(status_code=409, detail="Запрос с этим Idempotency-Key ещё выполняется") from None
+                return self._replay(stored, request_hash), True
+        finally:
+            del self._inflight[inflight_key]
+            done.set_result(None)
+
+    async def prune(self, db: Database) -> int:
+        async with db.conn() as conn:
+            cur = await conn.execute(
+                "DELETE FROM api_idempotency WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            await conn.commit()
+        return cur.rowcount
+
+
+def get_idempotency_store(request: Request) -> IdempotencyStore:
+    store = getattr(request.app.state, "idempotency", None)
+    if not store:
+        raise RuntimeError("Idempotency store is not initialized")
+    return store
@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import json
+import time
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+import aiosqlite
+from fastapi import HTTPException, Response
+
+from app.api.metrics import record_stage
+
+
+@dataclass(frozen=True)
+class RowShape:
+    """Форма строк списка: подмножество полей и/или компактные массивы вместо объектов."""
+
+    fields: tuple[str, ...] | None = None
+    compact: bool = False
+
+
+FULL_ROWS = RowShape()
+
+PAGE_FORMATS = ("objects", "compact")
+
+
+def parse_row_shape(fields: str | None, format: str, whitelist: tuple[str, ...]) -> RowShape:
+    """Разбирает `fields=a,b` и `format=` запроса. Поля проверяются по whitelist эндпоинта."""
+    if format not in PAGE_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Некорректный format, допустимо: {', '.join(PAGE_FORMATS)}")
+    selected = None
+    if fields:
+        selected = tuple(dict.fromkeys(name.strip() for name in fields.split(",") if name.strip())) or None
+        unknown = [name for name in selected or () if name not in whitelist]
+        if unknown:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Некорректные поля {', '.join(unknown)}; допустимо: {', '.join(whitelist)}",
+            )
+    return RowShape(fields=selected, compact=format == "compact")
+
+
+class CompactRows(list):
+    """Строки JsonQuery в компактной форме: JSON-массивы значений и общий заголовок `columns`."""
+
+    def __init__(self, rows: list[tuple], columns: list[str]) -> None:
+        super().__init__(rows)
+        self.columns = columns
+
+
+class JsonQuery:
+    """SQL-запрос, который отдаёт каждую строку уже готовым JSON-объектом.
+
+    Шаблон содержит плейсхолдеры `{alias}` вместо списка колонок таблицы:
+    при первом выполнении они раскрываются в пары `'col', alias.col` для
+    `json_object(...)` по `PRAGMA table_info`. Дальше текст SQL не меняется,
+    и SQLite переиспользует подготовленный statement из своего кэша.
+    Строка результата — кортеж: ключи курсора, последним элементом JSON строки.
+
+    Плейсхолдер `{row}` раскрывается в выражение всей строки: колонки таблиц
+    плюс `extra` (ключ -> SQL-выражение). Только для таких запросов работает
+    `variant(shape)`: выбранные поля попадают прямо в SELECT, а компактная
+    форма строится как `json_array(...)` с заголовком колонок.
+
+    `document` — SQL-выражение с уже готовым JSON всей строки (колонка снимка
+    каталога). Тогда полная строка берётся из него как есть, `extra` дописываются
+    через `json_set`, а выбранные поля достаются `json_extract`.
+    """
+
+    def __init__(
+        self,
+        template: str,
+        tables: dict[str, str] | None = None,
+        extra: dict[str, str] | None = None,
+        shape: RowShape = FULL_ROWS,
+        document: str | None = None,
+    ) -> None:
+        self.template = template
+        self.tables = tables or {}
+        self.extra = extra or {}
+        self.shape = shape
+        self.document = document
+        self.columns: list[str] = []
+        self._sql: str | None = None
+        self._variants: dict[RowShape, JsonQuery] = {}
+
+    def variant(self, shape: RowShape) -> JsonQuery:
+        if shape == self.shape:
+            return self
+        query = self._variants.get(shape)
+        if query is None:
+            query = self._variants[shape] = JsonQuery(self.template, self.tables, self.extra, shape, self.document)
+        return query
+
+    async def _compile(self, conn: aiosqlite.Connection) -> str:
+        pairs: dict[str, str] = {}
+        row: dict[str, str] = {}
+        for alias, table in self.tables.items():
+            cur = await conn.execute(f"PRAGMA table_info({table})")
+            columns = [info[1] for info in await cur.fetchall()]
+            pairs[alias] = ", ".join(f"'{column}', {alias}.{column}" for column in columns)
+            for column in columns:
+                if self.document is not None:
+                    row.setdefault(column, f"json_extract({self.document}, '$.{column}')")
+                else:
+                    row.setdefault(column, f"{alias}.{column}")
+        row.update(self.extra)
+        if self.document is not None and self.shape == FULL_ROWS:
+            self.columns = list(row)
+            pairs["row"] = self.document
+            if self.extra:
+                updates = ", ".join(f"'$.{key}', {expr}" for key, expr in self.extra.items())
+                pairs["row"] = f"json_set({self.document}, {updates})"
+            return self.template.format(**pairs)
+        if self.shape.fields is not None:
+            # Поле из whitelist, которого нет в схеме бота, отдаётся как null.
+            row = {name: row.get(name, "NULL") for name in self.shape.fields}
+        self.columns = list(row)
+        if self.shape.compact:
+            pairs["row"] = f"json_array({', '.join(row.values())})"
+        else:
+            pairs["row"] = "json_object(" + ", ".join(f"'{key}', {expr}" for key, expr in row.items()) + ")"
+        return self.template.format(**pairs)
+
+    async def sql(self, conn: aiosqlite.Connection) -> str:
+        if self._sql is None:
+            self._sql = await self._compile(conn)
+        return self._sql
+
+    async def fetch(self, conn: aiosqlite.Connection, params: Sequence[object]) -> list[tuple]:
+        cur = await conn.execute(await self.sql(conn), params)
+        cur.row_factory = None
+        rows = await cur.fetchall()
+        return CompactRows(rows, self.columns) if self.shape.compact else rows
+
+
+def page_bytes(rows: list[tuple], limit: int, cursor_of: Callable[[tuple], str]) -> bytes:
+    """Собирает тело CursorPage из готовых JSON-строк без промежуточных dict.
+
+    Для CompactRows тело — `{"columns": [...], "rows": [[...], ...], "next_cursor": ...}`.
+    """
+    started = time.perf_counter()
+    next_cursor = cursor_of(rows[limit - 1]) if len(rows) > limit else None
+    items = ",".join(row[-1] for row in rows[:limit])
+    if isinstance(rows, CompactRows):
+        columns = json.dumps(rows.columns, ensure_ascii=False, separators=(",", ":"))
+        body = f'{{"columns":{columns},"rows":[{items}],"next_cursor":{json.dumps(next_cursor)}}}'.encode("utf-8")
+    else:
+        body = f'{{"items":[{items}],"next_cursor":{json.dumps(next_cursor)}}}'.encode("utf-8")
+    record_stage("serialize", started)
+    return body
+
+
+def page_response(rows: list[tuple], limit: int, cursor_of: Callable[[tuple], str]) -> Response:
+    return Response(content=page_bytes(rows, limit, cursor_of), media_type="application/json")
+
+
+def id_cursor(row: tuple) -> str:
+    return str(row[0])
+
+
+EMPTY_PAGE = b'{"items":[],"next_cursor":null}'
@@ -1,26 +1,48 @@
 from __future__ import annotations
 
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
-import uvicorn
 from dotenv import load_dotenv
-from fastapi import FastAPI
 
+# .env     API:   (  JWT)   .
+load_dotenv()
+
+from fastapi import FastAPI, Request, Response
+
+from app.api.authz import AdminScopeCache
+from app.api.catalog_cache import CatalogCache, CatalogVersions
+from app.api.catalog_snapshot import CatalogSnapshot
+from app.api.chat_archive import ChatArchiver
+from app.api.chat_hub import ChatHub
+from app.api.compression import CompressionMiddleware, compression_from_env
+from app.api.db_pool import PooledDatabase, create_database
+from app.api.events import CHAT_MESSAGE, SCOPE_INVALIDATE, EventBus
+from app.api.idempotency import IdempotencyStore
+from app.api.metrics import Metrics, MetricsMiddleware, instrument_database, metrics_response
+from app.api.migrations import apply_migrations
+from app.api.order_feed import OrderFeed, archive_statuses_from_env, order_transitions_from_env
+from app.api.responses import response_class_from_env
 from app.api.routes.auth import router as auth_router
-from app.api.routes.catalog import router as catalog_router
+from app.api.routes.batch import router as batch_router
+from app.api.routes.catalog import router as catalog_router, warm_catalog_cache
 from app.api.routes.chats import router as chats_router
 from app.api.routes.orders import router as orders_router
-from app.db.database import DBConfig, Database
-
+from app.api.routes.stats import router as stats_router
+from app.api.scope_versions import ScopeVersions
+from app.api.security import reload_keys
+from app.api.startup import StartupTimings, check_schema
+from app.api.write_queue import GroupCommitWriter
 
-load_dotenv()
-
-from fastapi.openapi.utils import get_openapi
 
 def custom_openapi(app: FastAPI):
     if app.openapi_schema:
         return app.openapi_schema
 
+    #      /docs  /openapi.json     .
+    from fastapi.openapi.utils import get_openapi
+
     openapi_schema = get_openapi(
         title=app.title,
         version=app.version,
@@ -44,19 +66,173 @@ def custom_openapi(app: FastAPI):
     return app.openapi_schema
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    #    .      ,     .
+    timings = app.state.startup_timings = StartupTimings()
+    with timings.phase("keys"):
+        reload_keys()
+    with timings.phase("db_open"):
+        app.state.db = create_database(os.getenv("DB_PATH", "shop.db"))
+        if app.state.metrics is not None:
+            instrument_database(app.state.db, app.state.metrics)
+        if isinstance(app.state.db, PooledDatabase):
+            #    ,   ,     .
+            await app.state.db.open()
+    with timings.phase("schema_check"):
+        await check_schema(app.state.db)
+    #    app.api.serve      .
+    if os.getenv("API_MIGRATE_ON_STARTUP", "1") == "1":
+        with timings.phase("migrations"):
+            await apply_migrations(app.state.db)
+    with timings.phase("background"):
+        await app.state.scope_versions.refresh(app.state.db)
+        app.state.scope_versions.start(app.state.db)
+        await app.state.catalog_versions.refresh(app.state.db)
+        app.state.catalog_versions.start(app.state.db)
+        await app.state.event_bus.start(app.state.db)
+        await app.state.order_feed.refresh(app.state.db)
+        app.state.order_feed.start(app.state.db)
+        if app.state.write_queue is not None:
+            app.state.write_queue.start(app.state.db)
+        if app.state.chat_archiver is not None:
+            app.state.chat_archiver.start(app.state.db)
+    if app.state.catalog_snapshot is not None:
+        #        ;     .
+        with timings.phase("catalog_snapshot"):
+            await app.state.catalog_snapshot.refresh(app.state.db)
+            app.state.catalog_snapshot.start(app.state.db)
+    if os.getenv("API_WARM_CATALOG", "1") == "1":
+        with timings.phase("warm_catalog"):
+            await warm_catalog_cache(app)
+    timings.ready()
+
+    try:
+        yield
+    finally:
+        if app.state.write_queue is not None:
+            #      .
+            await app.state.write_queue.stop()
+        await app.state.scope_versions.stop()
+        await app.state.catalog_versions.stop()
+        if app.state.catalog_snapshot is not None:
+            await app.state.catalog_snapshot.stop()
+        await app.state.event_bus.stop()
+        await app.state.order_feed.stop()
+        if app.state.chat_archiver is not None:
+            await app.state.chat_archiver.stop()
+        if isinstance(app.state.db, PooledDatabase):
+            await app.state.db.close()
+
+
+#      :    lifespan.
 def create_app() -> FastAPI:
-    app = FastAPI(title="ShopBot API", version="0.1.0")
-    db_path = os.getenv("DB_PATH", "shop.db")
-    app.state.db = Database(DBConfig(path=db_path))
+    app = FastAPI(
+        title="ShopBot API",
+        version="0.1.0",
+        default_response_class=response_class_from_env(),
+        lifespan=lifespan,
+    )
+    app.state.search_mode = os.getenv("API_SEARCH_MODE", "fts")
+    app.state.search_index_ready = False
+    app.state.scope_cache = AdminScopeCache(
+        ttl_seconds=float(os.getenv("API_AUTHZ_CACHE_TTL", "30")),
+        max_entries=int(os.getenv("API_AUTHZ_CACHE_SIZE", "10000")),
+    )
+    app.state.catalog_cache = CatalogCache(max_bytes=int(os.getenv("API_CATALOG_CACHE_BYTES", str(32 * 1024 * 1024))))
+    app.state.catalog_versions = CatalogVersions(poll_seconds=float(os.getenv("API_CATALOG_POLL_SECONDS", "1")))
+    app.state.catalog_snapshot = None
+    if os.getenv("API_CATALOG_SNAPSHOT", "1") == "1":
+        app.state.catalog_snapshot = CatalogSnapshot(
+            poll_seconds=float(os.getenv("API_CATALOG_POLL_SECONDS", "1")),
+            max_lag_seconds=float(os.getenv("API_CATALOG_SNAPSHOT_MAX_LAG_SECONDS", "5")),
+        )
+    app.state.chat_hub = ChatHub(queue_size=int(os.getenv("API_CHAT_QUEUE_SIZE", "100")))
+    app.state.chat_heartbeat_seconds = float(os.getenv("API_CHAT_HEARTBEAT_SECONDS", "15"))
+    app.state.jwt_scope_claims = os.getenv("API_JWT_SCOPE_CLAIMS", "0") == "1"
+    app.state.scope_versions = ScopeVersions(
+        refresh_seconds=float(os.getenv("API_SCOPE_REFRESH_SECONDS", "5")),
+        recheck_seconds=float(os.getenv("API_SCOPE_RECHECK_SECONDS", "60")),
+    )
+    app.state.order_feed = OrderFeed(poll_seconds=float(os.getenv("API_ORDER_FEED_POLL_SECONDS", "0.5")))
+    app.state.order_transitions = order_transitions_from_env()
+    app.state.batch_concurrency = int(os.getenv("API_BATCH_CONCURRENCY", "4"))
+    app.state.idempotency = IdempotencyStore(ttl_seconds=float(os.getenv("API_IDEMPOTENCY_TTL_HOURS", "24")) * 3600)
+    # Write-behind:          (group commit).
+    app.state.write_queue = None
+    if os.getenv("API_WRITE_BEHIND", "0") == "1":
+        app.state.write_queue = GroupCommitWriter(
+            max_queue=int(os.getenv("API_WRITE_QUEUE_SIZE", "1000")),
+            max_batch=int(os.getenv("API_WRITE_BATCH", "64")),
+        )
+    #      :     .
+    #      API_ORDER_TRANSITIONS,     .
+    app.state.chat_archiver = None
+    if float(os.getenv("API_CHAT_ARCHIVE_DAYS", "0")) > 0:
+        app.state.chat_archiver = ChatArchiver(
+            days=float(os.getenv("API_CHAT_ARCHIVE_DAYS", "0")),
+            closed_statuses=archive_statuses_from_env(),
+            codec=os.getenv("API_CHAT_ARCHIVE_CODEC", "zlib"),
+            batch_orders=int(os.getenv("API_CHAT_ARCHIVE_BATCH", "50")),
+            pause_seconds=float(os.getenv("API_CHAT_ARCHIVE_PAUSE_MS", "200")) / 1000,
+            interval_seconds=float(os.getenv("API_CHAT_ARCHIVE_INTERVAL_SECONDS", "3600")),
+        )
+    # API_SHARED_EVENTS=1  app.api.serve    .
+    app.state.event_bus = EventBus(
+        shared=os.getenv("API_SHARED_EVENTS", "0") == "1",
+        poll_seconds=float(os.getenv("API_EVENTS_POLL_SECONDS", "0.1")),
+        retention_seconds=float(os.getenv("API_EVENTS_RETENTION_SECONDS", "60")),
+    )
+    app.state.event_bus.on(CHAT_MESSAGE, lambda event: app.state.chat_hub.publish(event["topics"], event["message"]))
+    compression = compression_from_env()
+    if compression is not None:
+        #   MetricsMiddleware,   compress    .
+        app.add_middleware(CompressionMiddleware, **compression)
+    #   :    .
+    app.state.metrics = None
+    if os.getenv("API_METRICS", "0") == "1":
+        app.state.metrics = Metrics(slow_query_ms=float(os.getenv("API_SLOW_QUERY_MS", "200")))
+        app.add_middleware(MetricsMiddleware, metrics=app.state.metrics)
+    app.state.event_bus.on(SCOPE_INVALIDATE, lambda event: app.state.scope_cache.invalidate(event.get("user_id")))
+    #   ,  ,     .
+    app.state.scope_versions.bus = app.state.event_bus
 
     app.include_router(auth_router)
     app.include_router(catalog_router)
     app.include_router(orders_router)
     app.include_router(chats_router)
+    app.include_router(stats_router)
+    app.include_router(batch_router)
 
     @app.get("/health", tags=["system"])
     async def health() -> dict:
         return {"ok": True}
+
+    @app.get("/metrics", tags=["system"], include_in_schema=False)
+    async def metrics(request: Request) -> Response:
+        return metrics_response(request)
+
+    @app.get("/health/caches", tags=["system"])
+    async def health_caches() -> dict:
+        return {
+            "admin_scope": app.state.scope_cache.stats(),
+            "catalog": app.state.catalog_cache.stats(),
+            "catalog_snapshot": app.state.catalog_snapshot.stats() if app.state.catalog_snapshot is not None else None,
+            "chat_hub": app.state.chat_hub.stats(),
+            "events": app.state.event_bus.stats(),
+        }
+
+    @app.get("/health/startup", tags=["system"])
+    async def health_startup() -> dict:
+        return app.state.startup_timings.as_dict()
+
+    @app.get("/health/db", tags=["system"])
+    async def health_db() -> dict:
+        write_queue = app.state.write_queue.stats() if app.state.write_queue is not None else None
+        chat_archive = app.state.chat_archiver.stats() if app.state.chat_archiver is not None else None
+        if isinstance(app.state.db, PooledDatabase):
+            return {"pooled": True, **app.state.db.stats(), "write_queue": write_queue, "chat_archive": chat_archive}
+        return {"pooled": False, "write_queue": write_queue, "chat_archive": chat_archive}
         
     app.openapi = lambda: custom_openapi(app)
 
@@ -67,4 +243,6 @@ app = create_app()
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run("app.api.main:app", host="0.0.0.0", port=int(os.getenv("API_PORT", "8000")), reload=False)
@@ -0,0 +1,206 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+
+from dotenv import load_dotenv
+
+from app.api.catalog_snapshot import CatalogSnapshot, check_consistency
+from app.api.chat_archive import ARCHIVE_CODECS, ChatArchiver
+from app.api.idempotency import IdempotencyStore
+from app.api.migrations import apply_migrations, backfill_chat_summary, backfill_order_stats
+from app.api.order_feed import archive_statuses_from_env
+from app.api.repositories.search_repo import SearchRepo
+from app.api.scope_versions import ScopeVersions
+from app.db.database import DBConfig, Database
+
+
+async def _migrate(db: Database, _: argparse.Namespace) -> None:
+    await apply_migrations(db, force=True)
+    print("Миграции API применены")
+
+
+async def _search_backfill(db: Database, _: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    await SearchRepo(db).rebuild_index()
+    print("Индекс products_fts перестроен")
+
+
+async def _scope_bump(db: Database, args: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    version = await ScopeVersions().bump(db, args.user_id)
+    print(f"Версия прав пользователя {args.user_id}: {version}")
+
+
+async def _token_revoke(db: Database, args: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    async with db.conn() as conn:
+        cur = await conn.execute(
+            """
+            INSERT INTO api_token_versions(user_id, version)
+            VALUES (?, 1)
+            ON CONFLICT(user_id) DO UPDATE SET version=version + 1
+            RETURNING version
+            """,
+            (args.user_id,),
+        )
+        row = await cur.fetchone()
+        await conn.commit()
+    # Access-токены со встроенными правами отклоняются сразу, остальные доживают свой срок.
+    await ScopeVersions().bump(db, args.user_id)
+    print(f"Refresh-токены пользователя {args.user_id} отозваны, версия {row[0]}")
+
+
+async def _scope_recheck(db: Database, _: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    changed = await ScopeVersions().recheck(db)
+    print(f"Права изменились у администраторов: {changed}")
+
+
+async def _chat_summary_backfill(db: Database, _: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    await backfill_chat_summary(db)
+    print("Сводка чатов пересобрана")
+
+
+async def _order_changes_prune(db: Database, args: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    async with db.conn() as conn:
+        # Последнее изменение каждого заказа остаётся: по нему считается голова журнала.
+        cur = await conn.execute(
+            """
+            DELETE FROM api_order_changes
+            WHERE changed_at < datetime('now', ?)
+              AND version < (SELECT MAX(version) FROM api_order_changes)
+            """,
+            (f"-{args.keep_days} days",),
+        )
+        await conn.commit()
+    print(f"Удалено записей журнала заказов: {cur.rowcount}")
+
+
+async def _idempotency_prune(db: Database, args: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    store = IdempotencyStore(ttl_seconds=args.keep_hours * 3600)
+    print(f"Удалено ключей идемпотентности: {await store.prune(db)}")
+
+
+async def _catalog_snapshot_check(db: Database, args: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    snapshot = CatalogSnapshot()
+    await snapshot.refresh(db)
+    report = await check_consistency(db)
+    if not report["consistent"] and args.repair:
+        report["repaired_rows"] = await snapshot.rebuild(db)
+        report["after_repair"] = await check_consistency(db)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if not report["consistent"] and not args.repair:
+        raise SystemExit(1)
+
+
+async def _stats_backfill(db: Database, _: argparse.Namespace) -> None:
+    await apply_migrations(db)
+    shops = await backfill_order_stats(db)
+    print(f"Статистика заказов пересобрана, магазинов: {shops}")
+
+
+def _db_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, f"{path}-wal") if os.path.exists(p))
+
+
+async def _chat_archive(db: Database, args: argparse.Namespace) -> None:
+    try:
+        closed_statuses = archive_statuses_from_env()
+    except RuntimeError as exc:
+        raise SystemExit(str(exc)) from exc
+    await apply_migrations(db)
+    archiver = ChatArchiver(
+        days=args.days,
+        closed_statuses=closed_statuses,
+        codec=args.codec,
+        batch_orders=args.batch,
+        pause_seconds=args.pause_ms / 1000,
+    )
+    size_before = _db_size(db.config.path)
+    await archiver.run_pass(db)
+    report = {**archiver.stats(), "db_bytes_before": size_before}
+    if args.vacuum:
+        # Удалённые строки освобождают страницы, но файл уменьшается только после VACUUM.
+        async with db.conn() as conn:
+            await conn.execute("VACUUM")
+            await conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    report["db_bytes_after"] = _db_size(db.config.path)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+async def _startup_profile(db: Database, args: argparse.Namespace) -> None:
+    """Импорт app.api.main по модулям и этапы lifespan на базе --db."""
+    from app.api.startup import import_profile, summarize_imports
+
+    report = {"imports": summarize_imports(import_profile(args.module), args.top)}
+    os.environ["DB_PATH"] = db.config.path
+    from app.api.main import create_app
+
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        report["lifespan"] = app.state.startup_timings.as_dict()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+COMMANDS = {
+    "migrate": _migrate,
+    "search-backfill": _search_backfill,
+    "scope-bump": _scope_bump,
+    "scope-recheck": _scope_recheck,
+    "token-revoke": _token_revoke,
+    "chat-summary-backfill": _chat_summary_backfill,
+    "order-changes-prune": _order_changes_prune,
+    "idempotency-prune": _idempotency_prune,
+    "catalog-snapshot-check": _catalog_snapshot_check,
+    "chat-archive": _chat_archive,
+    "stats-backfill": _stats_backfill,
+    "startup-profile": _startup_profile,
+}
+
+
+def main() -> None:
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Служебные команды API")
+    parser.add_argument("--db", default=os.getenv("DB_PATH", "shop.db"))
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="Создать индексы и таблицы API")
+    sub.add_parser("search-backfill", help="Перестроить полнотекстовый индекс товаров")
+    scope_bump = sub.add_parser("scope-bump", help="Отозвать токены администратора со встроенными правами")
+    scope_bump.add_argument("--user-id", type=int, required=True)
+    token_revoke = sub.add_parser("token-revoke", help="Отозвать все refresh-токены пользователя")
+    token_revoke.add_argument("--user-id", type=int, required=True)
+    sub.add_parser("scope-recheck", help="Сверить с ботом права известных администраторов и отозвать устаревшие токены")
+    sub.add_parser("chat-summary-backfill", help="Пересобрать сводку чатов и счётчики непрочитанных")
+    prune = sub.add_parser("order-changes-prune", help="Удалить старые записи журнала изменений заказов")
+    prune.add_argument("--keep-days", type=int, default=7)
+    idempotency_prune = sub.add_parser("idempotency-prune", help="Удалить истёкшие ключи Idempotency-Key")
+    idempotency_prune.add_argument("--keep-hours", type=float, default=float(os.getenv("API_IDEMPOTENCY_TTL_HOURS", "24")))
+    snapshot_check = sub.add_parser(
+        "catalog-snapshot-check", help="Догнать снимок каталога и сверить его с таблицами бота"
+    )
+    snapshot_check.add_argument("--repair", action="store_true", help="Пересобрать снимок при расхождении")
+    chat_archive = sub.add_parser("chat-archive", help="Перенести чаты давно закрытых заказов в сжатый архив")
+    chat_archive.add_argument("--days", type=float, default=float(os.getenv("API_CHAT_ARCHIVE_DAYS", "90")))
+    chat_archive.add_argument("--codec", choices=ARCHIVE_CODECS, default=os.getenv("API_CHAT_ARCHIVE_CODEC", "zlib"))
+    chat_archive.add_argument("--batch", type=int, default=50, help="Заказов в одной транзакции")
+    chat_archive.add_argument("--pause-ms", type=float, default=200, help="Пауза между транзакциями")
+    chat_archive.add_argument("--vacuum", action="store_true", help="Вернуть освободившееся место файлу базы")
+    sub.add_parser("stats-backfill", help="Пересобрать статистику заказов для GET /stats по orders и order_items")
+    profile = sub.add_parser("startup-profile", help="Стоимость импорта по модулям и этапы старта API")
+    profile.add_argument("--module", default="app.api.main")
+    profile.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    db = Database(DBConfig(path=args.db))
+    asyncio.run(COMMANDS[args.command](db, args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,388 @@
+from __future__ import annotations
+
+import bisect
+import hashlib
+import logging
+import re
+import time
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any
+
+from fastapi import Request
+from fastapi.responses import PlainTextResponse
+
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.api.sql")
+
+# Границы корзин гистограмм, секунды.
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# Время этапов текущего запроса (jwt, authz, sql, db_wait, serialize).
+# None — метрики выключены или код выполняется вне запроса.
+_request_stages: ContextVar[dict[str, float] | None] = ContextVar("api_request_stages", default=None)
+
+
+def record_stage(stage: str, started: float) -> None:
+    """Добавляет к этапу текущего запроса время с `started` (perf_counter)."""
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + time.perf_counter() - started
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+
+class SqlStat:
+    __slots__ = ("calls", "seconds", "rows", "max_seconds", "last_plan_logged")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.max_seconds = 0.0
+        self.last_plan_logged = 0.0
+
+
+_WHITESPACE = re.compile(r"\s+")
+_PLANNABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+class Metrics:
+    """Счётчики и гистограммы процесса в памяти; отдаются текстом Prometheus.
+
+    Метки ограничены: маршрут — шаблон пути FastAPI, запрос — нормализованный текст
+    SQL (в API он не зависит от параметров), поэтому число серий не растёт с трафиком.
+    """
+
+    def __init__(self, slow_query_ms: float = 200.0, slow_plan_interval_seconds: float = 60.0) -> None:
+        self.slow_query_seconds = slow_query_ms / 1000
+        self.slow_plan_interval_seconds = slow_plan_interval_seconds
+        self.requests: dict[tuple[str, str, str], Histogram] = {}
+        self.stages: dict[str, Histogram] = {}
+        self.sql: dict[str, SqlStat] = {}
+        self.connection_wait: dict[str, Histogram] = {}
+        self.slow_queries = 0
+        self.in_flight = 0
+        self._statement_keys: dict[str, str] = {}
+
+    def statement_key(self, sql: str) -> str:
+        key = self._statement_keys.get(sql)
+        if key is None:
+            text = _WHITESPACE.sub(" ", sql).strip()
+            if len(text) > 160:
+                digest = hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+                text = f"{text[:160]}… #{digest}"
+            key = text
+            if len(self._statement_keys) < 10_000:
+                self._statement_keys[sql] = key
+        return key
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, stages: dict[str, float]) -> None:
+        label = (method, route, str(status))
+        histogram = self.requests.get(label)
+        if histogram is None:
+            histogram = self.requests[label] = Histogram()
+        histogram.observe(seconds)
+        for stage, stage_seconds in stages.items():
+            stage_histogram = self.stages.get(stage)
+            if stage_histogram is None:
+                stage_histogram = self.stages[stage] = Histogram()
+            stage_histogram.observe(stage_seconds)
+
+    def observe_wait(self, kind: str, seconds: float) -> None:
+        histogram = self.connection_wait.get(kind)
+        if histogram is None:
+            histogram = self.connection_wait[kind] = Histogram()
+        histogram.observe(seconds)
+
+    def observe_sql(self, sql: str, seconds: float, rows: int, first: bool) -> SqlStat:
+        key = self.statement_key(sql)
+        stat = self.sql.get(key)
+        if stat is None:
+            stat = self.sql[key] = SqlStat()
+        if first:
+            stat.calls += 1
+        stat.seconds += seconds
+        stat.rows += rows
+        stages = _request_stages.get()
+        if stages is not None:
+            stages["sql"] = stages.get("sql", 0.0) + seconds
+        return stat
+
+    async def log_slow_query(self, conn: Any, sql: str, params: Any, seconds: float, rows: int | None) -> None:
+        self.slow_queries += 1
+        stat = self.sql[self.statement_key(sql)]
+        stat.max_seconds = max(stat.max_seconds, seconds)
+        plan = ""
+        now = time.monotonic()
+        # План одного и того же запроса пишем не чаще раза в интервал.
+        if now - stat.last_plan_logged >= self.slow_plan_interval_seconds and sql.lstrip().upper().startswith(_PLANNABLE):
+            stat.last_plan_logged = now
+            try:
+                cur = await conn.execute(f"EXPLAIN QUERY PLAN {sql}", params or ())
+                plan = "\n".join(f"  {row[3]}" for row in await cur.fetchall())
+            except Exception as exc:  # план — вспомогательная информация
+                plan = f"  (план недоступен: {exc})"
+        slow_query_logger.warning(
+            "Медленный запрос %.1f мс, строк: %s: %s%s",
+            seconds * 1000,
+            "?" if rows is None else rows,
+            self.statement_key(sql),
+            f"\n{plan}" if plan else "",
+        )
+
+    def render(self, db: Database | None = None) -> str:
+        lines: list[str] = []
+        _render_histograms(
+            lines, "api_request_duration_seconds", "Длительность HTTP-запросов",
+            {(("method", m), ("route", r), ("status", s)): h for (m, r, s), h in self.requests.items()},
+        )
+        _render_histograms(
+            lines, "api_request_stage_seconds", "Время этапов запроса: jwt, authz, sql, db_wait, serialize",
+            {(("stage", stage),): h for stage, h in self.stages.items()},
+        )
+        _render_histograms(
+            lines, "api_db_connection_wait_seconds", "Ожидание соединения с БД",
+            {(("kind", kind),): h for kind, h in self.connection_wait.items()},
+        )
+        for name, help_text, kind, getter in (
+            ("api_sql_calls_total", "Выполнений SQL-запроса", "counter", lambda s: s.calls),
+            ("api_sql_seconds_total", "Суммарное время SQL-запроса", "counter", lambda s: round(s.seconds, 6)),
+            ("api_sql_rows_total", "Строк прочитано/изменено запросом", "counter", lambda s: s.rows),
+            ("api_sql_slow_max_seconds", "Самое долгое медленное выполнение", "gauge", lambda s: round(s.max_seconds, 6)),
+        ):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for key, stat in self.sql.items():
+                lines.append(f'{name}{{statement="{_escape(key)}"}} {getter(stat)}')
+        lines.append("# TYPE api_sql_slow_queries_total counter")
+        lines.append(f"api_sql_slow_queries_total {self.slow_queries}")
+        lines.append("# TYPE api_requests_in_flight gauge")
+        lines.append(f"api_requests_in_flight {self.in_flight}")
+        stats = getattr(db, "stats", None)
+        if callable(stats):
+            for key, value in stats().items():
+                lines.append(f"api_db_pool_{key} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _render_histograms(lines: list[str], name: str, help_text: str, series: dict[tuple, Histogram]) -> None:
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for labels, histogram in series.items():
+        base = ",".join(f'{key}="{_escape(value)}"' for key, value in labels)
+        cumulative = 0
+        for bound, count in zip((*BUCKETS, "+Inf"), histogram.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+        lines.append(f"{name}_sum{{{base}}} {round(histogram.total, 6)}")
+        lines.append(f"{name}_count{{{base}}} {histogram.count}")
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: длительность запроса по шаблону маршрута и этапы из record_stage.
+
+    SSE-потоки в гистограмму не попадают: их длительность — время подписки, а не ответа.
+    """
+
+    def __init__(self, app: Callable, metrics: Metrics) -> None:
+        self.app = app
+        self.metrics = metrics
+
+    async def __call__(self, scope: dict, receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        stages: dict[str, float] = {}
+        token = _request_stages.set(stages)
+        started = time.perf_counter()
+        status = 500
+        streaming = False
+
+        async def send_wrapper(message: dict) -> None:
+            nonlocal status, streaming
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                streaming = any(
+                    name == b"content-type" and value.startswith(b"text/event-stream")
+                    for name, value in message.get("headers", ())
+                )
+            await send(message)
+
+        self.metrics.in_flight += 1
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.metrics.in_flight -= 1
+            _request_stages.reset(token)
+            if not streaming:
+                route = scope.get("route")
+                self.metrics.observe_request(
+                    scope["method"],
+                    getattr(route, "path", "unmatched"),
+                    status,
+                    time.perf_counter() - started,
+                    stages,
+                )
+
+
+class InstrumentedCursor:
+    __slots__ = ("_cursor", "_conn", "_metrics", "_sql", "_params", "_elapsed")
+
+    def __init__(self, cursor: Any, conn: Any, metrics: Metrics, sql: str, params: Any, elapsed: float) -> None:
+        object.__setattr__(self, "_cursor", cursor)
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_metrics", metrics)
+        object.__setattr__(self, "_sql", sql)
+        object.__setattr__(self, "_params", params)
+        object.__setattr__(self, "_elapsed", elapsed)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._cursor, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._cursor, name, value)
+
+    def __aiter__(self):
+        return self._cursor.__aiter__()
+
+    async def _fetched(self, started: float, rows: int) -> None:
+        seconds = time.perf_counter() - started
+        self._metrics.observe_sql(self._sql, seconds, rows, first=False)
+        total = self._elapsed + seconds
+        # Если медленным оказался уже execute, запрос залогирован там.
+        if total >= self._metrics.slow_query_seconds > self._elapsed:
+            await self._metrics.log_slow_query(self._conn, self._sql, self._params, total, rows)
+
+    async def fetchall(self) -> list:
+        started = time.perf_counter()
+        rows = await self._cursor.fetchall()
+        await self._fetched(started, len(rows))
+        return rows
+
+    async def fetchone(self) -> Any:
+        started = time.perf_counter()
+        row = await self._cursor.fetchone()
+        await self._fetched(started, int(row is not None))
+        return row
+
+    async def fetchmany(self, size: int | None = None) -> list:
+        started = time.perf_counter()
+        rows = await (self._cursor.fetchmany(size) if size is not None else self._cursor.fetchmany())
+        await self._fetched(started, len(rows))
+        return rows
+
+
+class _TimedExecute:
+    """Результат execute(): как у aiosqlite, его можно и await-ить, и использовать в `async with`."""
+
+    __slots__ = ("_owner", "_sql", "_params", "_cursor")
+
+    def __init__(self, owner: InstrumentedConnection, sql: str, params: Any) -> None:
+        self._owner = owner
+        self._sql = sql
+        self._params = params
+        self._cursor: InstrumentedCursor | None = None
+
+    async def _run(self) -> InstrumentedCursor:
+        conn = self._owner._conn
+        metrics = self._owner._metrics
+        started = time.perf_counter()
+        cursor = await (conn.execute(self._sql) if self._params is None else conn.execute(self._sql, self._params))
+        elapsed = time.perf_counter() - started
+        rowcount = cursor.rowcount if cursor.rowcount and cursor.rowcount > 0 else 0
+        metrics.observe_sql(self._sql, elapsed, rowcount, first=True)
+        if elapsed >= metrics.slow_query_seconds:
+            await metrics.log_slow_query(conn, self._sql, self._params, elapsed, rowcount or None)
+        return InstrumentedCursor(cursor, conn, metrics, self._sql, self._params, elapsed)
+
+    def __await__(self):
+        return self._run().__await__()
+
+    async def __aenter__(self) -> InstrumentedCursor:
+        self._cursor = await self._run()
+        return self._cursor
+
+    async def __aexit__(self, *exc: object) -> None:
+        await self._cursor.close()
+
+
+class InstrumentedConnection:
+    """Обёртка соединения aiosqlite: время, строки и медленные запросы по каждому выражению."""
+
+    __slots__ = ("_conn", "_metrics")
+
+    def __init__(self, conn: Any, metrics: Metrics) -> None:
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_metrics", metrics)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        setattr(self._conn, name, value)
+
+    def execute(self, sql: str, parameters: Any = None) -> _TimedExecute:
+        return _TimedExecute(self, sql, parameters)
+
+    async def executemany(self, sql: str, parameters: Any) -> Any:
+        started = time.perf_counter()
+        cursor = await self._conn.executemany(sql, parameters)
+        elapsed = time.perf_counter() - started
+        self._metrics.observe_sql(sql, elapsed, max(cursor.rowcount, 0), first=True)
+        if elapsed >= self._metrics.slow_query_seconds:
+            await self._metrics.log_slow_query(self._conn, sql, None, elapsed, max(cursor.rowcount, 0))
+        return cursor
+
+
+def _wrap_checkout(checkout: Callable, kind: str, metrics: Metrics) -> Callable:
+    @asynccontextmanager
+    async def wrapped() -> AsyncIterator[InstrumentedConnection]:
+        started = time.perf_counter()
+        async with checkout() as conn:
+            metrics.observe_wait(kind, time.perf_counter() - started)
+            record_stage("db_wait", started)
+            yield InstrumentedConnection(conn, metrics)
+
+    return wrapped
+
+
+def instrument_database(db: Database, metrics: Metrics) -> None:
+    """Хук Database: соединения из conn()/read() выдаются обёрнутыми.
+
+    Подменяются методы экземпляра, поэтому работает и для Database из бота,
+    и для PooledDatabase. Без вызова этой функции накладных расходов нет.
+    """
+    db.conn = _wrap_checkout(db.conn, "write", metrics)
+    if hasattr(db, "read"):
+        db.read = _wrap_checkout(db.read, "read", metrics)
+
+
+def metrics_response(request: Request) -> PlainTextResponse:
+    metrics: Metrics | None = getattr(request.app.state, "metrics", None)
+    if metrics is None:
+        return PlainTextResponse("# metrics disabled, set API_METRICS=1\n", status_code=404)
+    return PlainTextResponse(
+        metrics.render(getattr(request.app.state, "db", None)),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
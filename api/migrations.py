@@ -0,0 +1,517 @@
+from __future__ import annotations
+
+import hashlib
+
+from app.db.database import Database
+
+
+CHAT_PREVIEW_LENGTH = 100
+
+
+def _bump_catalog_version(shop_id_expr: str) -> str:
+    return f"""
+        INSERT INTO api_catalog_versions(shop_id, version)
+        VALUES ({shop_id_expr}, (SELECT COALESCE(MAX(version), 0) + 1 FROM api_catalog_versions))
+        ON CONFLICT(shop_id) DO UPDATE SET version=excluded.version;
+    """
+
+
+def _catalog_version_triggers(table: str, shop_column: str, bump_all_shops: bool) -> list[str]:
+    statements = []
+    for event, rows in (("INSERT", ("new",)), ("UPDATE", ("old", "new")), ("DELETE", ("old",))):
+        body = "".join(_bump_catalog_version(f"{row}.{shop_column}") for row in rows)
+        if bump_all_shops:
+            body += _bump_catalog_version("0")
+        statements.append(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS {table}_catalog_version_{event.lower()}
+            AFTER {event} ON {table} BEGIN
+            {body}
+            END
+            """
+        )
+    return statements
+
+
+# Корзины статистики заказов: день и час создания заказа (UTC, как в orders.created_at).
+def _stats_day(order: str) -> str:
+    return f"date(COALESCE({order}.created_at, '1970-01-01'))"
+
+
+def _stats_hour(order: str) -> str:
+    return f"strftime('%Y-%m-%d %H:00', COALESCE({order}.created_at, '1970-01-01'))"
+
+
+def _order_stats_delta(order: str, sign: str) -> str:
+    """Прибавляет (sign="") или вычитает (sign="-") заказ из дневной и часовой статистики."""
+    return "".join(
+        f"""
+        INSERT INTO {table}(shop_id, {bucket}, status, orders, revenue)
+        VALUES ({order}.shop_id, {expr(order)}, {order}.status, {sign}1, {sign}COALESCE({order}.total_amount, 0))
+        ON CONFLICT(shop_id, {bucket}, status) DO UPDATE SET
+            orders=orders + excluded.orders,
+            revenue=revenue + excluded.revenue;
+        """
+        for table, bucket, expr in (("api_stats_daily", "day", _stats_day), ("api_stats_hourly", "hour", _stats_hour))
+    )
+
+
+_PRODUCT_STATS_UPSERT = """
+        ON CONFLICT(shop_id, day, status, product_id) DO UPDATE SET
+            quantity=quantity + excluded.quantity,
+            revenue=revenue + excluded.revenue;
+"""
+
+
+def _order_products_delta(order: str, sign: str) -> str:
+    """То же для товаров: все позиции заказа под его текущими магазином, днём и статусом."""
+    return f"""
+        INSERT INTO api_stats_products(shop_id, day, status, product_id, quantity, revenue)
+        SELECT {order}.shop_id, {_stats_day(order)}, {order}.status, i.product_id,
+               {sign}SUM(i.quantity), {sign}SUM(i.quantity * i.price_at_moment)
+        FROM order_items i
+        WHERE i.order_id = {order}.id
+        GROUP BY i.product_id
+        {_PRODUCT_STATS_UPSERT}
+    """
+
+
+def _item_products_delta(item: str, sign: str) -> str:
+    return f"""
+        INSERT INTO api_stats_products(shop_id, day, status, product_id, quantity, revenue)
+        SELECT o.shop_id, {_stats_day("o")}, o.status, {item}.product_id,
+               {sign}{item}.quantity, {sign}{item}.quantity * {item}.price_at_moment
+        FROM orders o
+        WHERE o.id = {item}.order_id
+        {_PRODUCT_STATS_UPSERT}
+    """
+
+
+def _stats_triggers() -> list[str]:
+    order_changed = " OR ".join(
+        f"old.{column} IS NOT new.{column}" for column in ("shop_id", "status", "total_amount", "created_at")
+    )
+    item_changed = " OR ".join(
+        f"old.{column} IS NOT new.{column}" for column in ("order_id", "product_id", "quantity", "price_at_moment")
+    )
+    triggers = {
+        "orders_stats_ai AFTER INSERT ON orders": _order_stats_delta("new", "") + _order_products_delta("new", ""),
+        f"""orders_stats_au AFTER UPDATE OF shop_id, status, total_amount, created_at ON orders
+            WHEN {order_changed}""": (
+            _order_stats_delta("old", "-")
+            + _order_products_delta("old", "-")
+            + _order_stats_delta("new", "")
+            + _order_products_delta("new", "")
+        ),
+        "orders_stats_ad AFTER DELETE ON orders": _order_stats_delta("old", "-") + _order_products_delta("old", "-"),
+        "order_items_stats_ai AFTER INSERT ON order_items": _item_products_delta("new", ""),
+        f"""order_items_stats_au AFTER UPDATE OF order_id, product_id, quantity, price_at_moment ON order_items
+            WHEN {item_changed}""": _item_products_delta("old", "-") + _item_products_delta("new", ""),
+        "order_items_stats_ad AFTER DELETE ON order_items": _item_products_delta("old", "-"),
+    }
+    return [f"CREATE TRIGGER IF NOT EXISTS {head} BEGIN {body} END" for head, body in triggers.items()]
+
+
+# Индексы и служебные объекты, которые нужны только API.
+# Все выражения идемпотентны и применяются при старте приложения.
+API_MIGRATIONS: list[str] = [
+    "CREATE INDEX IF NOT EXISTS idx_shops_type_active_id ON shops(business_type, is_active, id)",
+    "CREATE INDEX IF NOT EXISTS idx_categories_shop_active_id ON categories(shop_id, is_active, id)",
+    # Keyset-сортировки GET /orders (см. ORDER_SORTS): страница в любом направлении —
+    # диапазон по индексу владельца, без сортировки всей истории.
+    "CREATE INDEX IF NOT EXISTS idx_orders_client_id ON orders(client_user_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_client_created ON orders(client_user_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_client_updated ON orders(client_user_id, updated_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_shop_id ON orders(shop_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_shop_created ON orders(shop_id, created_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_orders_shop_updated ON orders(shop_id, updated_at, id)",
+    "CREATE INDEX IF NOT EXISTS idx_order_chat_messages_order_id ON order_chat_messages(order_id, id)",
+    """
+    CREATE TABLE IF NOT EXISTS api_admin_scope_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    # Права администратора, какими их в последний раз получил API от бота: роль и
+    # JSON-список магазинов. Расхождение с новым ответом бота поднимает версию (ScopeVersions.observe).
+    """
+    CREATE TABLE IF NOT EXISTS api_admin_scopes (
+        user_id INTEGER PRIMARY KEY,
+        role TEXT NOT NULL,
+        shops TEXT NOT NULL
+    )
+    """,
+    # Версия refresh-токенов пользователя: `manage token-revoke` поднимает её и отзывает все выданные.
+    """
+    CREATE TABLE IF NOT EXISTS api_token_versions (
+        user_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    # Триггеры на shops читали столбец владельца, которого в схеме бота может не быть.
+    "DROP TRIGGER IF EXISTS shops_scope_version_insert",
+    "DROP TRIGGER IF EXISTS shops_scope_version_update",
+    "DROP TRIGGER IF EXISTS shops_scope_version_delete",
+    # События между воркерами (см. EventBus): пишутся только в режиме нескольких процессов.
+    """
+    CREATE TABLE IF NOT EXISTS api_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        channel TEXT NOT NULL,
+        payload TEXT NOT NULL,
+        origin TEXT NOT NULL,
+        created_at REAL NOT NULL
+    )
+    """,
+    # Версии каталога по магазинам для ETag и кэша ответов (shop_id=0 — список магазинов).
+    """
+    CREATE TABLE IF NOT EXISTS api_catalog_versions (
+        shop_id INTEGER PRIMARY KEY,
+        version INTEGER NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_api_catalog_versions_version ON api_catalog_versions(version)",
+    *_catalog_version_triggers("shops", "id", bump_all_shops=True),
+    *_catalog_version_triggers("categories", "shop_id", bump_all_shops=False),
+    *_catalog_version_triggers("products", "shop_id", bump_all_shops=False),
+    # Снимок каталога для чтения (см. CatalogSnapshot): активные товары вместе с типом
+    # и названием магазина, ключами поиска и готовым JSON товара. Пересобирается по
+    # магазинам, чья версия в api_catalog_versions новее версии снимка.
+    """
+    CREATE TABLE IF NOT EXISTS api_catalog_items (
+        id INTEGER PRIMARY KEY,
+        shop_id INTEGER NOT NULL,
+        category_id INTEGER,
+        business_type TEXT,
+        merchant_name TEXT,
+        price REAL,
+        search_keys TEXT NOT NULL,
+        item TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_catalog_items_category ON api_catalog_items(shop_id, category_id, id)",
+    "CREATE INDEX IF NOT EXISTS idx_catalog_items_type ON api_catalog_items(business_type, id)",
+    """
+    CREATE TABLE IF NOT EXISTS api_catalog_snapshot (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL,
+        refreshed_at REAL NOT NULL
+    )
+    """,
+    # Журнал изменений заказов для GET /orders/changes: версия монотонна (AUTOINCREMENT),
+    # строки пишут триггеры, поэтому в журнал попадают и изменения от бота.
+    """
+    CREATE TABLE IF NOT EXISTS api_order_changes (
+        version INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id INTEGER NOT NULL,
+        shop_id INTEGER NOT NULL,
+        client_user_id INTEGER NOT NULL,
+        status TEXT,
+        changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_order_changes_shop ON api_order_changes(shop_id, version)",
+    "CREATE INDEX IF NOT EXISTS idx_order_changes_client ON api_order_changes(client_user_id, version)",
+    """
+    CREATE TRIGGER IF NOT EXISTS orders_change_ai AFTER INSERT ON orders BEGIN
+        INSERT INTO api_order_changes(order_id, shop_id, client_user_id, status)
+        VALUES (new.id, new.shop_id, new.client_user_id, new.status);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS orders_change_au AFTER UPDATE ON orders BEGIN
+        INSERT INTO api_order_changes(order_id, shop_id, client_user_id, status)
+        VALUES (new.id, new.shop_id, new.client_user_id, new.status);
+    END
+    """,
+    # Сводка чатов по сторонам (client/admin): последнее сообщение и непрочитанные.
+    # Заполняется при создании (см. INITIAL_BACKFILLS), поддерживается триггером на вставку
+    # сообщения и сбрасывается в POST /chats/{id}/read.
+    """
+    CREATE TABLE IF NOT EXISTS api_chat_summary (
+        order_id INTEGER NOT NULL,
+        role TEXT NOT NULL,
+        shop_id INTEGER NOT NULL,
+        client_user_id INTEGER NOT NULL,
+        last_message_id INTEGER NOT NULL,
+        last_message_at TEXT,
+        last_message_preview TEXT,
+        unread_count INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (order_id, role)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_chat_summary_client ON api_chat_summary(role, client_user_id, last_message_id)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_summary_shop ON api_chat_summary(role, shop_id, last_message_id)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_summary_client_order ON api_chat_summary(role, client_user_id, order_id)",
+    "CREATE INDEX IF NOT EXISTS idx_chat_summary_shop_order ON api_chat_summary(role, shop_id, order_id)",
+    # Сообщение стороны обнуляет её непрочитанные — так же их считает CHAT_SUMMARY_BACKFILL.
+    "DROP TRIGGER IF EXISTS order_chat_messages_summary_ai",
+    f"""
+    CREATE TRIGGER IF NOT EXISTS order_chat_messages_summary_ai AFTER INSERT ON order_chat_messages BEGIN
+        INSERT INTO api_chat_summary(
+            order_id, role, shop_id, client_user_id,
+            last_message_id, last_message_at, last_message_preview, unread_count
+        )
+        SELECT o.id, side.role, o.shop_id, o.client_user_id,
+               new.id, new.created_at, substr(new.message_text, 1, {CHAT_PREVIEW_LENGTH}),
+               CASE WHEN (new.sender_role = 'client') = (side.role = 'client') THEN 0 ELSE 1 END
+        FROM orders o, (SELECT 'client' AS role UNION ALL SELECT 'admin') side
+        WHERE o.id = new.order_id
+        ON CONFLICT(order_id, role) DO UPDATE SET
+            last_message_id=excluded.last_message_id,
+            last_message_at=excluded.last_message_at,
+            last_message_preview=excluded.last_message_preview,
+            unread_count=CASE WHEN excluded.unread_count = 0 THEN 0 ELSE unread_count + 1 END;
+    END
+    """,
+    # Архив чатов закрытых заказов (см. ChatArchiver): сообщения заказа одним сжатым
+    # блоком строк `id<TAB>json`; codec — zlib или zstd.
+    """
+    CREATE TABLE IF NOT EXISTS api_chat_archive (
+        order_id INTEGER PRIMARY KEY,
+        codec TEXT NOT NULL,
+        block BLOB NOT NULL,
+        message_count INTEGER NOT NULL,
+        last_message_id INTEGER NOT NULL,
+        archived_at REAL NOT NULL
+    )
+    """,
+    # Статистика заказов для GET /stats/shops/{shop_id}: счётчики по магазину, корзине
+    # (день или час создания заказа) и статусу. Поддерживаются триггерами на orders и
+    # order_items, в том числе при записи ботом; смена статуса переносит заказ между
+    # строками. Заказы, созданные до этих таблиц, учитываются при их создании
+    # (см. INITIAL_BACKFILLS); `manage stats-backfill` пересобирает всё по магазинам.
+    "CREATE INDEX IF NOT EXISTS idx_order_items_order_id ON order_items(order_id)",
+    """
+    CREATE TABLE IF NOT EXISTS api_stats_daily (
+        shop_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        PRIMARY KEY (shop_id, day, status)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS api_stats_hourly (
+        shop_id INTEGER NOT NULL,
+        hour TEXT NOT NULL,
+        status TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        PRIMARY KEY (shop_id, hour, status)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS api_stats_products (
+        shop_id INTEGER NOT NULL,
+        day TEXT NOT NULL,
+        status TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        revenue REAL NOT NULL,
+        PRIMARY KEY (shop_id, day, status, product_id)
+    ) WITHOUT ROWID
+    """,
+    *_stats_triggers(),
+    # Ответы на запросы с Idempotency-Key: повтор с тем же ключом получает сохранённый
+    # результат вместо второго заказа. Старые ключи чистит `manage idempotency-prune`.
+    """
+    CREATE TABLE IF NOT EXISTS api_idempotency (
+        user_id INTEGER NOT NULL,
+        key TEXT NOT NULL,
+        request_hash TEXT NOT NULL,
+        response TEXT NOT NULL,
+        created_at REAL NOT NULL,
+        PRIMARY KEY (user_id, key)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_idempotency_created ON api_idempotency(created_at)",
+    # Полнотекстовый индекс поиска. Заполняется в той же транзакции, что и создаётся
+    # (см. INITIAL_BACKFILLS), дальше поддерживается триггерами: 'delete' по строке,
+    # которой нет в индексе, external-content FTS5 считает повреждением базы.
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        name, description, keywords_norm,
+        content='products', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts(rowid, name, description, keywords_norm)
+        VALUES (new.id, new.name, new.description, new.keywords_norm);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description, keywords_norm)
+        VALUES ('delete', old.id, old.name, old.description, old.keywords_norm);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description, keywords_norm ON products BEGIN
+        INSERT INTO products_fts(products_fts, rowid, name, description, keywords_norm)
+        VALUES ('delete', old.id, old.name, old.description, old.keywords_norm);
+        INSERT INTO products_fts(rowid, name, description, keywords_norm)
+        VALUES (new.id, new.name, new.description, new.keywords_norm);
+    END
+    """,
+]
+
+
+# Пересборка сводки чатов по существующим сообщениям. Таблица прочтений бота здесь
+# не используется: непрочитанными считаются сообщения другой стороны после
+# последнего собственного ответа. Сводка заархивированных чатов остаётся как есть.
+CHAT_SUMMARY_BACKFILL = [
+    "DELETE FROM api_chat_summary WHERE order_id NOT IN (SELECT order_id FROM api_chat_archive)",
+    f"""
+    INSERT INTO api_chat_summary(
+        order_id, role, shop_id, client_user_id,
+        last_message_id, last_message_at, last_message_preview, unread_count
+    )
+    SELECT o.id, side.role, o.shop_id, o.client_user_id,
+           last.id, last.created_at, substr(last.message_text, 1, {CHAT_PREVIEW_LENGTH}),
+           (
+               SELECT COUNT(*)
+               FROM order_chat_messages u
+               WHERE u.order_id = o.id
+                 AND (u.sender_role = 'client') != (side.role = 'client')
+                 AND u.id > COALESCE((
+                     SELECT MAX(own.id)
+                     FROM order_chat_messages own
+                     WHERE own.order_id = o.id AND (own.sender_role = 'client') = (side.role = 'client')
+                 ), 0)
+           )
+    FROM orders o
+    JOIN order_chat_messages last ON last.id = (
+        SELECT MAX(m.id) FROM order_chat_messages m WHERE m.order_id = o.id
+    )
+    CROSS JOIN (SELECT 'client' AS role UNION ALL SELECT 'admin') side
+    WHERE o.id NOT IN (SELECT order_id FROM api_chat_archive)
+    """,
+]
+
+
+def _stats_inserts(where: str) -> list[str]:
+    """Статистика по orders и order_items с теми же корзинами, что и в триггерах."""
+    return [
+        *(
+            f"""
+            INSERT INTO {table}(shop_id, {bucket}, status, orders, revenue)
+            SELECT o.shop_id, {expr("o")}, o.status, COUNT(*), SUM(COALESCE(o.total_amount, 0))
+            FROM orders o
+            WHERE {where}
+            GROUP BY 1, 2, 3
+            """
+            for table, bucket, expr in (("api_stats_daily", "day", _stats_day), ("api_stats_hourly", "hour", _stats_hour))
+        ),
+        f"""
+        INSERT INTO api_stats_products(shop_id, day, status, product_id, quantity, revenue)
+        SELECT o.shop_id, {_stats_day("o")}, o.status, i.product_id, SUM(i.quantity), SUM(i.quantity * i.price_at_moment)
+        FROM order_items i
+        JOIN orders o ON o.id = i.order_id
+        WHERE {where}
+        GROUP BY 1, 2, 3, 4
+        """,
+    ]
+
+
+# Пересборка статистики одного магазина (параметр — shop_id).
+STATS_BACKFILL = [
+    "DELETE FROM api_stats_daily WHERE shop_id = ?",
+    "DELETE FROM api_stats_hourly WHERE shop_id = ?",
+    "DELETE FROM api_stats_products WHERE shop_id = ?",
+    *_stats_inserts("o.shop_id = ?"),
+]
+
+
+# Заполнение таблиц, которые ведут триггеры, если они пусты, а исходные данные уже есть:
+# (условие, выражения). Выполняется в транзакции миграций, поэтому триггеры и данные
+# появляются вместе — бот не успевает записать ничего между ними.
+INITIAL_BACKFILLS: list[tuple[str, list[str]]] = [
+    (
+        "NOT EXISTS (SELECT 1 FROM products_fts_docsize) AND EXISTS (SELECT 1 FROM products)",
+        ["INSERT INTO products_fts(products_fts) VALUES('rebuild')"],
+    ),
+    # Без этого GET /chats на существующей базе пуст, пока не запущен chat-summary-backfill.
+    (
+        "NOT EXISTS (SELECT 1 FROM api_chat_summary) AND EXISTS (SELECT 1 FROM order_chat_messages)",
+        CHAT_SUMMARY_BACKFILL,
+    ),
+    # Иначе смена статуса старого заказа вычитает его из пустых строк и счётчики уходят в минус.
+    (
+        "NOT EXISTS (SELECT 1 FROM api_stats_daily) AND EXISTS (SELECT 1 FROM orders)",
+        _stats_inserts("1"),
+    ),
+]
+
+
+# Отпечаток набора миграций: если он уже записан в базе, старт воркера обходится
+# одним чтением вместо десятков DDL в пишущей транзакции.
+_DIGEST_SOURCE = [*API_MIGRATIONS, *(f"{check}: {'; '.join(statements)}" for check, statements in INITIAL_BACKFILLS)]
+MIGRATIONS_DIGEST = hashlib.sha1("\n".join(_DIGEST_SOURCE).encode("utf-8")).hexdigest()
+
+
+async def _applied_digest(db: Database) -> str | None:
+    async with db.conn() as conn:
+        cur = await conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'api_schema'")
+        if await cur.fetchone() is None:
+            return None
+        cur = await conn.execute("SELECT digest FROM api_schema WHERE id = 1")
+        row = await cur.fetchone()
+        return row[0] if row else None
+
+
+async def apply_migrations(db: Database, force: bool = False) -> bool:
+    """Применяет API_MIGRATIONS, если они изменились с прошлого раза. Возвращает, применялись ли.
+
+    `force` применяет всё заново — например, если индекс удалили вручную.
+    """
+    if not force and await _applied_digest(db) == MIGRATIONS_DIGEST:
+        return False
+    async with db.conn() as conn:
+        await conn.execute("BEGIN IMMEDIATE")
+        try:
+            for statement in API_MIGRATIONS:
+                await conn.execute(statement)
+            for check, statements in INITIAL_BACKFILLS:
+                cur = await conn.execute(f"SELECT {check}")
+                if (await cur.fetchone())[0]:
+                    for statement in statements:
+                        await conn.execute(statement)
+            await conn.execute(
+                "CREATE TABLE IF NOT EXISTS api_schema (id INTEGER PRIMARY KEY CHECK (id = 1), digest TEXT NOT NULL)"
+            )
+            await conn.execute(
+                "INSERT INTO api_schema(id, digest) VALUES (1, ?) ON CONFLICT(id) DO UPDATE SET digest = excluded.digest",
+                (MIGRATIONS_DIGEST,),
+            )
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+    return True
+
+
+async def backfill_chat_summary(db: Database) -> None:
+    async with db.conn() as conn:
+        await conn.execute("BEGIN IMMEDIATE")
+        for statement in CHAT_SUMMARY_BACKFILL:
+            await conn.execute(statement)
+        await conn.commit()
+
+
+async def backfill_order_stats(db: Database) -> int:
+    """Пересобирает api_stats_* по orders и order_items. Возвращает число магазинов.
+
+    Каждый магазин — своя пишущая транзакция: бот ждёт блокировку не дольше
+    пересборки одного магазина, а триггеры продолжают счёт с пересобранных строк.
+    """
+    async with db.conn() as conn:
+        cur = await conn.execute("SELECT shop_id FROM orders UNION SELECT shop_id FROM api_stats_daily")
+        shop_ids = [int(r[0]) for r in await cur.fetchall()]
+        for shop_id in shop_ids:
+            await conn.execute("BEGIN IMMEDIATE")
+            for statement in STATS_BACKFILL:
+                await conn.execute(statement, (shop_id,))
+            await conn.commit()
+    return len(shop_ids)
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+
+from fastapi import Request
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+# Разрешённые переходы статусов для массовой смены: откуда -> куда.
+# Переопределяется JSON-объектом в API_ORDER_TRANSITIONS, если у бота другие статусы.
+DEFAULT_ORDER_TRANSITIONS: dict[str, list[str]] = {
+    "new": ["accepted", "cancelled"],
+    "accepted": ["delivering", "done", "cancelled"],
+    "delivering": ["done"],
+}
+
+
+def order_transitions_from_env() -> dict[str, frozenset[str]]:
+    raw = os.getenv("API_ORDER_TRANSITIONS")
+    transitions = json.loads(raw) if raw else DEFAULT_ORDER_TRANSITIONS
+    return {source: frozenset(targets) for source, targets in transitions.items()}
+
+
+def archive_statuses_from_env() -> list[str]:
+    """Закрытые статусы для архива чатов — только из явно заданного API_ORDER_TRANSITIONS.
+
+    Архив удаляет сообщения из таблицы бота, поэтому статусы DEFAULT_ORDER_TRANSITIONS
+    для него не годятся: это предположение о статусах бота, а не его данные.
+    """
+    if not os.getenv("API_ORDER_TRANSITIONS"):
+        raise RuntimeError("Архив чатов требует API_ORDER_TRANSITIONS: переходы статусов заказа из бота")
+    statuses = terminal_statuses(order_transitions_from_env())
+    if not statuses:
+        raise RuntimeError("В API_ORDER_TRANSITIONS нет статусов без исходящих переходов")
+    return statuses
+
+
+def sources_for(transitions: dict[str, frozenset[str]], target: str) -> list[str]:
+    return sorted(source for source, targets in transitions.items() if target in targets)
+
+
+def terminal_statuses(transitions: dict[str, frozenset[str]]) -> list[str]:
+    """Статусы, из которых переходов нет: заказ в них закрыт."""
+    targets = set().union(*transitions.values())
+    return sorted(targets - transitions.keys())
+
+
+class OrderFeed:
+    """Голова журнала api_order_changes в памяти и ожидание новых изменений.
+
+    Журнал пишут триггеры на orders, поэтому в нём и изменения, сделанные ботом.
+    Один фоновый опрос MAX(version) на процесс будит всех ждущих long-poll
+    запросов; сами ждущие в БД не ходят, пока голова не сдвинулась.
+    """
+
+    def __init__(self, poll_seconds: float = 0.5) -> None:
+        self.poll_seconds = poll_seconds
+        self.head = 0
+        self.oldest = 0
+        self._changed = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    async def refresh(self, db: Database) -> None:
+        async with read_conn(db) as conn:
+            # Отдельные подзапросы: так SQLite берёт MIN и MAX из краёв первичного ключа.
+            cur = await conn.execute(
+                """
+                SELECT COALESCE((SELECT MIN(version) FROM api_order_changes), 0),
+                       COALESCE((SELECT MAX(version) FROM api_order_changes), 0)
+                """
+            )
+            oldest, head = await cur.fetchone()
+        self.oldest = int(oldest)
+        self.advance(int(head))
+
+    def advance(self, head: int) -> None:
+        if head > self.head:
+            self.head = head
+            # Будим всех текущих ждущих, следующие ждут уже на новом Event.
+            self._changed.set()
+            self._changed = asyncio.Event()
+
+    async def wait_beyond(self, head: int, timeout: float) -> bool:
+        if self.head > head:
+            return True
+        try:
+            await asyncio.wait_for(self._changed.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def start(self, db: Database) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._poll_loop(db))
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+    async def _poll_loop(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(self.poll_seconds)
+            try:
+                await self.refresh(db)
+            except Exception:
+                logger.exception("Не удалось обновить журнал изменений заказов")
+
+
+def get_order_feed(request: Request) -> OrderFeed:
+    feed = getattr(request.app.state, "order_feed", None)
+    if not feed:
+        raise RuntimeError("Order feed is not initialized")
+    return feed
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+
+from fastapi import HTTPException
+
+
+def _b64url_encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+# Обрезанная подпись: курсор не секрет, подпись лишь защищает от подделанных ключей.
+_SIGNATURE_BYTES = 12
+_cursor_mac: hmac.HMAC | None = None
+
+
+def _get_cursor_mac() -> hmac.HMAC:
+    global _cursor_mac
+    if _cursor_mac is None:
+        secret = os.getenv("API_CURSOR_SECRET") or os.getenv("API_JWT_SECRET", "")
+        if not secret:
+            raise RuntimeError("API_CURSOR_SECRET/API_JWT_SECRET is empty. Set it in environment or .env")
+        # Отдельный ключ: подпись курсора нельзя выдать за подпись токена.
+        key = hmac.new(secret.encode("utf-8"), b"api-cursor", hashlib.sha256).digest()
+        _cursor_mac = hmac.new(key, digestmod=hashlib.sha256)
+    return _cursor_mac
+
+
+def _sign(payload: str, context: str) -> bytes:
+    mac = _get_cursor_mac().copy()
+    mac.update(f"{context}\n{payload}".encode("utf-8"))
+    return mac.digest()[:_SIGNATURE_BYTES]
+
+
+def _bad_cursor() -> HTTPException:
+    return HTTPException(status_code=400, detail="Некорректный cursor")
+
+
+@dataclass(frozen=True)
+class Keyset:
+    """Сортировка по составному ключу с keyset-пагинацией.
+
+    `columns` — SQL-выражения ключа, последнее должно быть уникальным (обычно id).
+    Запрос выбирает колонки ключа первыми в строке, затем JSON — как ждёт JsonQuery.
+    Курсор — значения ключа последней строки, подписанные вместе с именем сортировки
+    и фильтрами запроса: курсор от другого списка или других фильтров отклоняется.
+    """
+
+    name: str
+    columns: tuple[str, ...]
+    descending: bool = False
+
+    def predicate(self, has_cursor: bool) -> str:
+        # Сравнение row values SQLite выполняет диапазоном по составному индексу.
+        if not has_cursor:
+            return "1"
+        op = "<" if self.descending else ">"
+        placeholders = ", ".join("?" for _ in self.columns)
+        return f"({', '.join(self.columns)}) {op} ({placeholders})"
+
+    def order_by(self) -> str:
+        direction = "DESC" if self.descending else "ASC"
+        return ", ".join(f"{column} {direction}" for column in self.columns)
+
+    def encode(self, values: Sequence[object], filters: Sequence[object] = ()) -> str:
+        payload = _b64url_encode(json.dumps(list(values), separators=(",", ":")).encode("utf-8"))
+        signature = _b64url_encode(_sign(payload, self._context(filters)))
+        return f"{payload}.{signature}"
+
+    def decode(self, cursor: str | None, filters: Sequence[object] = ()) -> list | None:
+        """Значения ключа из курсора или None для первой страницы; 400 при подделке."""
+        if not cursor:
+            return None
+        payload, sep, signature = cursor.partition(".")
+        if not sep:
+            raise _bad_cursor()
+        try:
+            expected = _sign(payload, self._context(filters))
+            if not hmac.compare_digest(_b64url_decode(signature), expected):
+                raise _bad_cursor()
+            values = json.loads(_b64url_decode(payload))
+        except (ValueError, UnicodeDecodeError) as exc:
+            raise _bad_cursor() from exc
+        if not isinstance(values, list) or len(values) != len(self.columns):
+            raise _bad_cursor()
+        return values
+
+    def cursor_of(self, filters: Sequence[object] = ()) -> Callable[[tuple], str]:
+        """Функция для page_bytes: курсор по первым колонкам строки JsonQuery."""
+        width = len(self.columns)
+        return lambda row: self.encode(row[:width], filters)
+
+    def _context(self, filters: Sequence[object]) -> str:
+        return json.dumps([self.name, self.descending, list(filters)], separators=(",", ":"), default=str)
+
+
+def parse_sort(value: str | None, keysets: dict[str, Keyset], default: str) -> Keyset:
+    """Разбирает `sort=field` / `sort=-field` в одну из разрешённых сортировок."""
+    keyset = keysets.get(value or default)
+    if keyset is None:
+        raise HTTPException(status_code=400, detail=f"Некорректная сортировка, допустимо: {', '.join(keysets)}")
+    return keyset
+
+
+def sort_options(name: str, fields: dict[str, tuple[str, ...]]) -> dict[str, Keyset]:
+    """Для каждого поля — возрастающая (`field`) и убывающая (`-field`) сортировка."""
+    options: dict[str, Keyset] = {}
+    for field, columns in fields.items():
+        options[field] = Keyset(f"{name}:{field}", columns)
+        options[f"-{field}"] = Keyset(f"{name}:-{field}", columns, descending=True)
+    return options
@@ -0,0 +1 @@
+"""Репозитории API: запросы, оптимизированные под постраничную выдачу."""
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import os
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+class AdminScopeRepo:
+    """Магазины и рестораны администратора.
+
+    По умолчанию — утилиты бота (app.handlers_admin_*): права доступа решает та же
+    логика, что и в боте. Импорт ленивый, при первом запросе, а не при старте
+    воркера: эти пакеты тянут aiogram и хендлеры бота.
+    API_ADMIN_SCOPE_SOURCE=sql читает shops.admin_user_id напрямую, одним запросом.
+    Включать его только после сверки с ботом: запрос повторяет логику бота по схеме,
+    а не по его коду.
+    """
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+        self.source = os.getenv("API_ADMIN_SCOPE_SOURCE", "bot")
+
+    async def _ids(self, user_id: int, business_type: str) -> list[int]:
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute(
+                "SELECT id FROM shops WHERE admin_user_id = ? AND business_type = ? ORDER BY id",
+                (user_id, business_type),
+            )
+            return [int(r[0]) for r in await cur.fetchall()]
+
+    async def shop_ids(self, user_id: int) -> list[int]:
+        if self.source != "sql":
+            from app.handlers_admin_shop.utils import get_admin_shop_ids
+
+            return list(await get_admin_shop_ids(self.db, user_id))
+        return await self._ids(user_id, "shop")
+
+    async def restaurant_ids(self, user_id: int) -> list[int]:
+        if self.source != "sql":
+            from app.handlers_admin_restaurant.utils import get_admin_restaurant_ids
+
+            return list(await get_admin_restaurant_ids(self.db, user_id))
+        return await self._ids(user_id, "restaurant")
+
+    async def resolve_role(self, user_id: int) -> tuple[str, list[int]]:
+        """Роль пользователя и его магазины: магазины важнее ресторанов, без них — client.
+
+        В режиме bot — до двух вызовов утилит бота, в режиме sql — одно чтение shops.
+        """
+        if self.source != "sql":
+            if shop_ids := await self.shop_ids(user_id):
+                return "admin_shop", shop_ids
+            if restaurant_ids := await self.restaurant_ids(user_id):
+                return "admin_restaurant", restaurant_ids
+            return "client", []
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute(
+                """
+                SELECT business_type, id FROM shops
+                WHERE admin_user_id = ? AND business_type IN ('shop', 'restaurant')
+                ORDER BY id
+                """,
+                (user_id,),
+            )
+            rows = await cur.fetchall()
+        for business_type, role in (("shop", "admin_shop"), ("restaurant", "admin_restaurant")):
+            ids = [int(r[1]) for r in rows if r[0] == business_type]
+            if ids:
+                return role, ids
+        return "client", []
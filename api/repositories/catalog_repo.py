@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+class CatalogRepo:
+    """Keyset-выборки каталога: каждая страница читает не больше `limit + 1` строк."""
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    async def list_active_shops_page(self, business_type: str, after_id: int, limit: int) -> list[dict]:
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute(
+                """
+                SELECT *
+                FROM shops
+                WHERE business_type=? AND is_active=1 AND id>?
+                ORDER BY id ASC
+                LIMIT ?
+                """,
+                (business_type, after_id, limit),
+            )
+            return [dict(r) for r in await cur.fetchall()]
+
+    async def list_active_categories_page(self, shop_id: int, after_id: int, limit: int) -> list[dict]:
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute(
+                """
+                SELECT *
+                FROM categories
+                WHERE shop_id=? AND is_active=1 AND id>?
+                ORDER BY id ASC
+                LIMIT ?
+                """,
+                (shop_id, after_id, limit),
+            )
+            return [dict(r) for r in await cur.fetchall()]
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import aiosqlite
+
+from app.api.write_queue import GroupCommitWriter, run_write
+from app.db.database import Database
+
+
+class ChatWriteRepo:
+    """Запись сообщений чата: через очередь group commit (API_WRITE_BEHIND=1) или своей транзакцией.
+
+    Та же вставка, что у ChatRepo бота, но вместе с id возвращает и сохранённый
+    created_at; сводку api_chat_summary обновляет триггер.
+    """
+
+    def __init__(self, db: Database, queue: GroupCommitWriter | None = None) -> None:
+        self.db = db
+        self.queue = queue
+
+    async def add_message(
+        self, order_id: int, sender_user_id: int, sender_role: str, text: str
+    ) -> tuple[int, str | None]:
+        """Возвращает (id, created_at) новой строки."""
+
+        async def op(conn: aiosqlite.Connection) -> tuple[int, str | None]:
+            cur = await conn.execute(
+                """
+                INSERT INTO order_chat_messages (order_id, sender_user_id, sender_role, message_text)
+                VALUES (?, ?, ?, ?)
+                RETURNING id, created_at
+                """,
+                (order_id, sender_user_id, sender_role, text),
+            )
+            message_id, created_at = (await cur.fetchall())[0]
+            return int(message_id), created_at
+
+        return await run_write(self.db, self.queue, op)
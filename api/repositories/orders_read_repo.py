@@ -0,0 +1,39 @@
+from __future__ import annotations
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+class OrdersReadRepo:
+    """Заказ и его позиции — через пул читателей.
+
+    Проверки доступа к заказу и чату стоят на горячем пути каждого запроса.
+    OrdersRepo бота читает через соединение писателя (`db.conn()`): с пулом
+    проверка вставала бы в очередь за записями, а внутри открытой записи — ждала
+    бы саму себя. Заказ отдаётся в той же форме, что и в списке GET /orders.
+    """
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    async def get_order(self, order_id: int) -> dict | None:
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute(
+                """
+                SELECT o.*, s.name AS shop_name, s.business_type
+                FROM orders o
+                LEFT JOIN shops s ON s.id = o.shop_id
+                WHERE o.id = ?
+                """,
+                (order_id,),
+            )
+            row = await cur.fetchone()
+            columns = [d[0] for d in cur.description]
+        return dict(zip(columns, row)) if row else None
+
+    async def get_order_items(self, order_id: int) -> list[dict]:
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute("SELECT * FROM order_items WHERE order_id = ? ORDER BY id", (order_id,))
+            rows = await cur.fetchall()
+            columns = [d[0] for d in cur.description]
+        return [dict(zip(columns, row)) for row in rows]
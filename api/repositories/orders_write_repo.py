@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+
+import aiosqlite
+
+from app.api.idempotency import IdempotencyRecord
+from app.api.write_queue import GroupCommitWriter, run_write
+from app.db.database import Database
+
+
+class OrderTransitionError(ValueError):
+    """Часть заказов нельзя перевести в статус; `rejected` — [{order_id, reason}]."""
+
+    def __init__(self, rejected: list[dict]) -> None:
+        super().__init__("Недопустимая смена статуса")
+        self.rejected = rejected
+
+
+def merge_quantities(items: list[tuple[int, int]]) -> dict[int, int]:
+    """Склеивает повторяющиеся товары, сохраняя порядок первого вхождения."""
+    merged: dict[int, int] = {}
+    for product_id, quantity in items:
+        merged[product_id] = merged.get(product_id, 0) + quantity
+    return merged
+
+
+class OrdersWriteRepo:
+    def __init__(self, db: Database, queue: GroupCommitWriter | None = None) -> None:
+        self.db = db
+        self.queue = queue
+
+    async def create_order_with_items(
+        self,
+        shop_id: int,
+        client_user_id: int,
+        comment: str,
+        fulfillment_type: str,
+        items: dict[int, int],
+        idempotency: IdempotencyRecord | None = None,
+    ) -> int:
+        """Создаёт заказ одной выборкой цен и одной пакетной вставкой позиций.
+
+        `items` — product_id -> quantity. Ошибки валидации поднимаются как ValueError.
+        С очередью group commit заказ пишется в общей транзакции пачки; ответ в обоих
+        случаях возвращается только после COMMIT. `idempotency` сохраняется в той же транзакции.
+        """
+
+        async def op(conn: aiosqlite.Connection) -> int:
+            order_id = await self._insert_order(conn, shop_id, client_user_id, comment, fulfillment_type, items)
+            if idempotency is not None:
+                await idempotency.save(conn, {"order_id": order_id})
+            return order_id
+
+        return await run_write(self.db, self.queue, op)
+
+    @staticmethod
+    async def _insert_order(
+        conn: aiosqlite.Connection,
+        shop_id: int,
+        client_user_id: int,
+        comment: str,
+        fulfillment_type: str,
+        items: dict[int, int],
+    ) -> int:
+        product_ids = list(items)
+        placeholders = ",".join(["?"] * len(product_ids))
+        cur = await conn.execute(
+            f"SELECT id, price, shop_id FROM products WHERE id IN ({placeholders}) AND is_active=1",
+            product_ids,
+        )
+        rows = {int(r["id"]): r for r in await cur.fetchall()}
+
+        total = 0.0
+        collected: list[tuple[int, int, float]] = []
+        for product_id, quantity in items.items():
+            row = rows.get(product_id)
+            if not row:
+                raise ValueError(f"Товар {product_id} не найден")
+            if int(row["shop_id"]) != shop_id:
+                raise ValueError("Все товары должны быть из одного магазина")
+            price = float(row["price"])
+            total += price * quantity
+            collected.append((product_id, quantity, price))
+
+        cur_order = await conn.execute(
+            """
+            INSERT INTO orders (shop_id, client_user_id, status, total_amount, comment, fulfillment_type, updated_at)
+            VALUES (?, ?, 'new', ?, ?, ?, CURRENT_TIMESTAMP)
+            """,
+            (shop_id, client_user_id, total, comment, fulfillment_type),
+        )
+        order_id = int(cur_order.lastrowid)
+
+        await conn.executemany(
+            """
+            INSERT INTO order_items (order_id, product_id, quantity, price_at_moment)
+            VALUES (?, ?, ?, ?)
+            """,
+            [(order_id, product_id, quantity, price) for product_id, quantity, price in collected],
+        )
+        return order_id
+
+    async def bulk_transition(
+        self,
+        order_ids: list[int],
+        status: str,
+        allowed_sources: list[str],
+        shop_ids: frozenset[int],
+    ) -> list[int]:
+        """Переводит заказы в `status` одним UPDATE в одной транзакции: всё или ничего.
+
+        Доступ (магазины администратора) и допустимость перехода проверяются в WHERE
+        для всего набора сразу. Если обновились не все заказы, транзакция
+        откатывается, а причины отказа собираются одной выборкой.
+        """
+        ids_json = json.dumps(order_ids)
+        async with self.db.conn() as conn:
+            await conn.execute("BEGIN IMMEDIATE")
+            try:
+                cur = await conn.execute(
+                    """
+                    UPDATE orders SET status = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id IN (SELECT value FROM json_each(?))
+                      AND shop_id IN (SELECT value FROM json_each(?))
+                      AND status IN (SELECT value FROM json_each(?))
+                    RETURNING id
+                    """,
+                    (status, ids_json, json.dumps(sorted(shop_ids)), json.dumps(allowed_sources)),
+                )
+                updated = [int(r[0]) for r in await cur.fetchall()]
+                if len(updated) == len(order_ids):
+                    await conn.commit()
+                    return updated
+
+                cur = await conn.execute(
+                    "SELECT id, shop_id, status FROM orders WHERE id IN (SELECT value FROM json_each(?))",
+                    (ids_json,),
+                )
+                found = {int(r[0]): (int(r[1]), r[2]) for r in await cur.fetchall()}
+            except BaseException:
+                await conn.rollback()
+                raise
+            await conn.rollback()
+
+        rejected = []
+        # Статусы в found уже после UPDATE, поэтому обновившиеся заказы пропускаем.
+        done = set(updated)
+        for order_id in order_ids:
+            if order_id in done:
+                continue
+            if order_id not in found:
+                rejected.append({"order_id": order_id, "reason": "Заказ не найден"})
+            elif found[order_id][0] not in shop_ids:
+                rejected.append({"order_id": order_id, "reason": "Нет доступа к заказу"})
+            elif found[order_id][1] not in allowed_sources:
+                rejected.append({"order_id": order_id, "reason": f"Переход {found[order_id][1]} -> {status} недопустим"})
+        raise OrderTransitionError(rejected)
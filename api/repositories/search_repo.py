@@ -0,0 +1,167 @@
+from __future__ import annotations
+
+from app.api.db_pool import read_conn
+from app.api.json_pages import FULL_ROWS, JsonQuery, RowShape
+from app.db.database import Database
+
+
+# Веса bm25 для колонок products_fts: name, description, keywords_norm.
+BM25_WEIGHTS = "10.0, 1.0, 5.0"
+# Триграммный токенайзер не находит подстроки короче трёх символов.
+FTS_MIN_QUERY_LENGTH = 3
+
+# Поля товара в выдаче поиска вдобавок к колонкам products.
+_SEARCH_EXTRA = {"merchant_name": "s.name", "business_type": "s.business_type"}
+
+
+def fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+_FTS_QUERY = JsonQuery(
+    f"""
+    SELECT r.id, r.rank, {{row}}
+    FROM (
+        SELECT *
+        FROM (
+            SELECT p.id AS id, bm25(products_fts, {BM25_WEIGHTS}) AS rank
+            FROM products_fts
+            JOIN products p ON p.id = products_fts.rowid
+            JOIN shops s ON s.id = p.shop_id
+            WHERE products_fts MATCH ?
+              AND s.business_type=?
+              AND p.is_active=1
+        )
+        WHERE rank > ? OR (rank = ? AND id > ?)
+        ORDER BY rank ASC, id ASC
+        LIMIT ?
+    ) r
+    JOIN products p ON p.id = r.id
+    JOIN shops s ON s.id = p.shop_id
+    ORDER BY r.rank ASC, r.id ASC
+    """,
+    {"p": "products"},
+    _SEARCH_EXTRA,
+)
+
+_LIKE_QUERY = JsonQuery(
+    """
+    SELECT p.id, {row}
+    FROM products p
+    JOIN shops s ON s.id = p.shop_id
+    WHERE s.business_type=?
+      AND p.is_active=1
+      AND p.id>?
+      AND (
+        lower(p.name) LIKE ?
+        OR lower(COALESCE(p.description, '')) LIKE ?
+        OR lower(COALESCE(p.keywords_norm, '')) LIKE ?
+      )
+    ORDER BY p.id ASC
+    LIMIT ?
+    """,
+    {"p": "products"},
+    _SEARCH_EXTRA,
+)
+
+
+# Те же запросы по снимку каталога: тип и название магазина уже в строке,
+# неактивных товаров в снимке нет, LIKE идёт по одной колонке search_keys.
+_SNAPSHOT_EXTRA = {"merchant_name": "c.merchant_name", "business_type": "c.business_type"}
+
+_SNAPSHOT_FTS_QUERY = JsonQuery(
+    f"""
+    SELECT r.id, r.rank, {{row}}
+    FROM (
+        SELECT *
+        FROM (
+            SELECT c.id AS id, bm25(products_fts, {BM25_WEIGHTS}) AS rank
+            FROM products_fts
+            JOIN api_catalog_items c ON c.id = products_fts.rowid
+            WHERE products_fts MATCH ?
+              AND c.business_type=?
+        )
+        WHERE rank > ? OR (rank = ? AND id > ?)
+        ORDER BY rank ASC, id ASC
+        LIMIT ?
+    ) r
+    JOIN api_catalog_items c ON c.id = r.id
+    ORDER BY r.rank ASC, r.id ASC
+    """,
+    {"p": "products"},
+    _SNAPSHOT_EXTRA,
+    document="c.item",
+)
+
+_SNAPSHOT_LIKE_QUERY = JsonQuery(
+    """
+    SELECT c.id, {row}
+    FROM api_catalog_items c
+    WHERE c.business_type=?
+      AND c.id>?
+      AND c.search_keys LIKE ?
+    ORDER BY c.id ASC
+    LIMIT ?
+    """,
+    {"p": "products"},
+    _SNAPSHOT_EXTRA,
+    document="c.item",
+)
+
+
+class SearchRepo:
+    """Поиск товаров. Строки — кортежи JsonQuery: ключи курсора и JSON товара.
+
+    С `snapshot=True` запросы читают снимок каталога (api_catalog_items) вместо products и shops.
+    """
+
+    def __init__(self, db: Database, snapshot: bool = False) -> None:
+        self.db = db
+        self.snapshot = snapshot
+
+    async def search_fts(
+        self,
+        query: str,
+        business_type: str,
+        after: tuple[float, int] | None,
+        limit: int,
+        shape: RowShape = FULL_ROWS,
+    ) -> list[tuple]:
+        """Ранжированный поиск по products_fts: строки (id, rank, json).
+
+        `after` — (rank, id) последней строки прошлой страницы.
+        """
+        after_rank, after_id = after if after else (float("-inf"), 0)
+        fts_query = _SNAPSHOT_FTS_QUERY if self.snapshot else _FTS_QUERY
+        async with read_conn(self.db) as conn:
+            return await fts_query.variant(shape).fetch(
+                conn, (fts_phrase(query), business_type, after_rank, after_rank, after_id, limit)
+            )
+
+    async def search_like(
+        self,
+        query: str,
+        business_type: str,
+        after_id: int,
+        limit: int,
+        shape: RowShape = FULL_ROWS,
+    ) -> list[tuple]:
+        """Сканирование LIKE для сравнения и коротких запросов: строки (id, json)."""
+        like = f"%{query.lower()}%"
+        async with read_conn(self.db) as conn:
+            if self.snapshot:
+                return await _SNAPSHOT_LIKE_QUERY.variant(shape).fetch(conn, (business_type, after_id, like, limit))
+            return await _LIKE_QUERY.variant(shape).fetch(conn, (business_type, after_id, like, like, like, limit))
+
+    async def index_ready(self) -> bool:
+        """Заполнен ли products_fts: пустой индекс при непустом каталоге ничего не находит."""
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute(
+                "SELECT EXISTS (SELECT 1 FROM products_fts_docsize) OR NOT EXISTS (SELECT 1 FROM products)"
+            )
+            return bool((await cur.fetchone())[0])
+
+    async def rebuild_index(self) -> None:
+        async with self.db.conn() as conn:
+            await conn.execute("INSERT INTO products_fts(products_fts) VALUES('rebuild')")
+            await conn.commit()
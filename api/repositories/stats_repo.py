@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+
+from app.api.db_pool import read_conn
+from app.db.database import Database
+
+
+# Статусы, которые без явного фильтра не попадают в выручку, ряды и топ товаров.
+DEFAULT_EXCLUDED_STATUSES = ("cancelled",)
+
+_STATUS_FILTERS = {
+    True: "status IN (SELECT value FROM json_each(?))",
+    False: "status NOT IN (SELECT value FROM json_each(?))",
+}
+
+_BY_STATUS_QUERY = """
+    SELECT status, SUM(orders), ROUND(SUM(revenue), 2)
+    FROM api_stats_daily
+    WHERE shop_id = ? AND day BETWEEN ? AND ?
+    GROUP BY status
+    HAVING SUM(orders) != 0
+    ORDER BY status
+"""
+
+
+def _series_query(table: str, bucket: str, status_filter: str) -> str:
+    return f"""
+        SELECT {bucket}, SUM(orders), ROUND(SUM(revenue), 2)
+        FROM {table}
+        WHERE shop_id = ? AND {bucket} BETWEEN ? AND ? AND {status_filter}
+        GROUP BY {bucket}
+        HAVING SUM(orders) != 0
+        ORDER BY {bucket}
+    """
+
+
+def _top_products_query(status_filter: str) -> str:
+    return f"""
+        SELECT t.product_id, p.name, t.quantity, t.revenue
+        FROM (
+            SELECT product_id, SUM(quantity) AS quantity, ROUND(SUM(revenue), 2) AS revenue
+            FROM api_stats_products
+            WHERE shop_id = ? AND day BETWEEN ? AND ? AND {status_filter}
+            GROUP BY product_id
+            HAVING SUM(quantity) > 0
+            ORDER BY revenue DESC, product_id
+            LIMIT ?
+        ) t
+        LEFT JOIN products p ON p.id = t.product_id
+        ORDER BY t.revenue DESC, t.product_id
+    """
+
+
+_BY_DAY_QUERIES = {k: _series_query("api_stats_daily", "day", sql) for k, sql in _STATUS_FILTERS.items()}
+_BY_HOUR_QUERIES = {k: _series_query("api_stats_hourly", "hour", sql) for k, sql in _STATUS_FILTERS.items()}
+_TOP_PRODUCTS_QUERIES = {k: _top_products_query(sql) for k, sql in _STATUS_FILTERS.items()}
+
+
+class StatsRepo:
+    """Статистика заказов магазина из api_stats_*; orders и order_items не читаются.
+
+    Заказ относится к дню и часу создания (UTC). by_status — все статусы за период,
+    остальные разделы — только `statuses` (по умолчанию всё, кроме DEFAULT_EXCLUDED_STATUSES).
+    """
+
+    def __init__(self, db: Database) -> None:
+        self.db = db
+
+    async def shop_stats(
+        self,
+        shop_id: int,
+        date_from: date,
+        date_to: date,
+        statuses: list[str] | None,
+        top: int,
+    ) -> dict:
+        included = statuses is not None
+        status_param = json.dumps(statuses if included else DEFAULT_EXCLUDED_STATUSES)
+        days = (date_from.isoformat(), date_to.isoformat())
+        hours = (f"{days[0]} 00:00", f"{days[1]} 23:00")
+        async with read_conn(self.db) as conn:
+            cur = await conn.execute(_BY_STATUS_QUERY, (shop_id, *days))
+            by_status = [{"status": r[0], "orders": r[1], "revenue": r[2]} for r in await cur.fetchall()]
+            cur = await conn.execute(_BY_DAY_QUERIES[included], (shop_id, *days, status_param))
+            by_day = [{"day": r[0], "orders": r[1], "revenue": r[2]} for r in await cur.fetchall()]
+            cur = await conn.execute(_BY_HOUR_QUERIES[included], (shop_id, *hours, status_param))
+            by_hour = [{"hour": r[0], "orders": r[1], "revenue": r[2]} for r in await cur.fetchall()]
+            cur = await conn.execute(_TOP_PRODUCTS_QUERIES[included], (shop_id, *days, status_param, top))
+            top_products = [
+                {"product_id": r[0], "name": r[1], "quantity": r[2], "revenue": r[3]} for r in await cur.fetchall()
+            ]
+        return {
+            "shop_id": shop_id,
+            "date_from": days[0],
+            "date_to": days[1],
+            "statuses": statuses,
+            "totals": {
+                "orders": sum(row["orders"] for row in by_day),
+                "revenue": round(sum(row["revenue"] for row in by_day), 2),
+            },
+            "by_status": by_status,
+            "by_day": by_day,
+            "by_hour": by_hour,
+            "top_products": top_products,
+        }
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+from app.api.metrics import record_stage
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson необязателен
+    orjson = None
+
+
+class StdJSONResponse(JSONResponse):
+    """Компактный stdlib JSON без ASCII-экранирования кириллицы."""
+
+    def render(self, content: Any) -> bytes:
+        started = time.perf_counter()
+        body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        record_stage("serialize", started)
+        return body
+
+
+class FastJSONResponse(StdJSONResponse):
+    """orjson, если установлен, иначе stdlib."""
+
+    def render(self, content: Any) -> bytes:
+        if orjson is None:
+            return super().render(content)
+        started = time.perf_counter()
+        body = orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        record_stage("serialize", started)
+        return body
+
+
+RESPONSE_CLASSES: dict[str, type[JSONResponse]] = {
+    "fast": FastJSONResponse,
+    "std": StdJSONResponse,
+    "default": JSONResponse,
+}
+
+
+def response_class_from_env() -> type[JSONResponse]:
+    name = os.getenv("API_JSON_RESPONSE", "fast")
+    try:
+        return RESPONSE_CLASSES[name]
+    except KeyError as exc:
+        raise RuntimeError(f"Unknown API_JSON_RESPONSE={name!r}, expected one of {sorted(RESPONSE_CLASSES)}") from exc
+
+
+def trusted_response(content: Any, status_code: int = 200) -> FastJSONResponse:
+    """Ответ в обход response_model: без повторной валидации и jsonable_encoder.
+
+    Только для данных, которые мы сами собрали из строк БД (dict/list примитивов).
+    """
+    return FastJSONResponse(content=content, status_code=status_code)
+
+
+def trusted_page(items: list[dict], next_cursor: str | None) -> FastJSONResponse:
+    return trusted_response({"items": items, "next_cursor": next_cursor})
@@ -1,42 +1,105 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 
+from app.api.db_pool import read_conn
 from app.api.deps import get_db
-from app.api.schemas import TelegramAuthRequest, TokenResponse
-from app.api.security import create_access_token
+from app.api.events import SCOPE_INVALIDATE, EventBus, get_event_bus
+from app.api.repositories.admin_scope_repo import AdminScopeRepo
+from app.api.schemas import RefreshTokenRequest, TelegramAuthRequest, TokenResponse
+from app.api.security import (
+    JWT_EXPIRE_SECONDS,
+    create_access_token,
+    create_refresh_token,
+    decode_refresh_token,
+)
 from app.db.database import Database
-from app.handlers_admin_restaurant.utils import get_admin_restaurant_ids
-from app.handlers_admin_shop.utils import get_admin_shop_ids
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
 
-async def _resolve_role(db: Database, user_id: int) -> str:
-    shop_ids = await get_admin_shop_ids(db, user_id)
-    if shop_ids:
-        return "admin_shop"
-    restaurant_ids = await get_admin_restaurant_ids(db, user_id)
-    if restaurant_ids:
-        return "admin_restaurant"
-    return "client"
+# Claims, которые переносятся из refresh-токена в новый access-токен.
+_CARRIED_CLAIMS = ("sub", "role", "shops", "scope_ver")
 
 
 @router.post("/telegram", response_model=TokenResponse)
-async def auth_by_telegram(payload: TelegramAuthRequest, db: Database = Depends(get_db)) -> TokenResponse:
-    role = await _resolve_role(db, payload.telegram_user_id)
+async def auth_by_telegram(
+    request: Request,
+    payload: TelegramAuthRequest,
+    db: Database = Depends(get_db),
+    bus: EventBus = Depends(get_event_bus),
+) -> TokenResponse:
+    role, merchant_ids = await AdminScopeRepo(db).resolve_role(payload.telegram_user_id)
+    # Вход сверяет права с записанными: если бот их поменял, старые токены отзываются.
+    scope_ver = await request.app.state.scope_versions.observe(db, payload.telegram_user_id, role, merchant_ids)
+    # Повторный вход — естественная точка обновления назначений администратора.
+    # Сброс нужен и при роли client: в кэше могли остаться права снятого администратора.
+    await bus.publish(db, SCOPE_INVALIDATE, {"user_id": payload.telegram_user_id})
     db_role = "admin" if role in {"admin_shop", "admin_restaurant"} else "client"
 
-    async with db.conn() as conn:
-        await conn.execute(
+    async with read_conn(db) as conn:
+        cur = await conn.execute(
             """
-            INSERT INTO users(user_id, role)
-            VALUES (?, ?)
-            ON CONFLICT(user_id) DO UPDATE SET role=excluded.role
+            SELECT (SELECT role FROM users WHERE user_id = ?),
+                   (SELECT version FROM api_token_versions WHERE user_id = ?)
             """,
-            (payload.telegram_user_id, db_role),
+            (payload.telegram_user_id, payload.telegram_user_id),
         )
-        await conn.commit()
+        stored_role, token_version = await cur.fetchone()
 
-    token = create_access_token({"sub": payload.telegram_user_id, "role": role})
-    return TokenResponse(access_token=token)
+    # Повторные входы не занимают писателя SQLite, если роль не изменилась.
+    if stored_role != db_role:
+        async with db.conn() as conn:
+            await conn.execute(
+                """
+                INSERT INTO users(user_id, role)
+                VALUES (?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET role=excluded.role
+                """,
+                (payload.telegram_user_id, db_role),
+            )
+            await conn.commit()
+
+    claims: dict = {"sub": payload.telegram_user_id, "role": role}
+    if role != "client" and getattr(request.app.state, "jwt_scope_claims", False):
+        claims["shops"] = sorted(merchant_ids)
+        claims["scope_ver"] = scope_ver
+    return TokenResponse(
+        access_token=create_access_token(claims),
+        expires_in=JWT_EXPIRE_SECONDS,
+        refresh_token=create_refresh_token({**claims, "tok_ver": token_version or 0}),
+    )
+
+
+@router.post("/refresh", response_model=TokenResponse)
+async def refresh_access_token(
+    payload: RefreshTokenRequest,
+    db: Database = Depends(get_db),
+) -> TokenResponse:
+    """Новый access-токен из claims refresh-токена.
+
+    Одно чтение таблиц API сверяет токен с состоянием пользователя: версией
+    refresh-токенов (`manage token-revoke`), ролью, которую API последний раз
+    получил от бота, и версией прав. Снятый администратор (см. ScopeVersions.recheck)
+    и отозванный токен не продлевают доступ, а входят заново.
+    """
+    claims = decode_refresh_token(payload.refresh_token)
+    if int(claims.get("sub", 0)) <= 0 or claims.get("role") not in {"client", "admin_shop", "admin_restaurant"}:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен")
+    user_id = int(claims["sub"])
+    async with read_conn(db) as conn:
+        cur = await conn.execute(
+            """
+            SELECT COALESCE((SELECT version FROM api_token_versions WHERE user_id = ?), 0),
+                   COALESCE((SELECT role FROM api_admin_scopes WHERE user_id = ?), 'client'),
+                   COALESCE((SELECT version FROM api_admin_scope_versions WHERE user_id = ?), 0)
+            """,
+            (user_id, user_id, user_id),
+        )
+        token_version, role, scope_version = await cur.fetchone()
+    if int(claims.get("tok_ver", -1)) != token_version:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Токен отозван, войдите заново")
+    if role != claims["role"] or ("scope_ver" in claims and int(claims["scope_ver"]) != scope_version):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Права доступа изменились, войдите заново")
+    access_claims = {key: claims[key] for key in _CARRIED_CLAIMS if key in claims}
+    return TokenResponse(access_token=create_access_token(access_claims), expires_in=JWT_EXPIRE_SECONDS)
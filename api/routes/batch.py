@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from collections.abc import AsyncIterator
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from app.api.deps import BATCH_USER_SCOPE_KEY, CurrentUser, get_current_user
+from app.api.schemas import BatchRequest, BatchSubRequest
+
+router = APIRouter(tags=["batch"])
+
+logger = logging.getLogger(__name__)
+
+
+BATCH_PREFIXES = ("/catalog/", "/search", "/orders", "/chats", "/stats/")
+# Потоковые и долгие ответы держали бы весь пакет, поэтому в него не попадают.
+BATCH_EXCLUDED = ("/stream", "/orders/changes")
+# Заголовки родительского запроса, которые подзапросу не подходят: тело и сжатие
+# относятся к самому /batch, а условный запрос у каждого подзапроса свой.
+_DROPPED_HEADERS = {b"content-length", b"content-type", b"accept-encoding", b"if-none-match"}
+# Ключи scope, которые проставил маршрут /batch; подзапрос сопоставляется заново.
+_ROUTE_SCOPE_KEYS = ("route", "endpoint", "path_params", "fastapi_inner_astack", "fastapi_function_astack")
+
+
+def _rejection(sub: BatchSubRequest, path: str) -> tuple[int, str] | None:
+    if sub.method.upper() != "GET":
+        return 405, "В пакете допускаются только GET-запросы"
+    if not path.startswith(BATCH_PREFIXES) or path.endswith(BATCH_EXCLUDED):
+        return 404, "Маршрут недоступен в пакете"
+    return None
+
+
+def _sub_scope(scope: dict, path: str, query: str, user: CurrentUser) -> dict:
+    sub = {key: value for key, value in scope.items() if key not in _ROUTE_SCOPE_KEYS}
+    sub.update(
+        method="GET",
+        path=path,
+        raw_path=path.encode("utf-8"),
+        query_string=query.encode("utf-8"),
+        headers=[(name, value) for name, value in scope["headers"] if name not in _DROPPED_HEADERS],
+    )
+    sub[BATCH_USER_SCOPE_KEY] = user
+    return sub
+
+
+async def _dispatch(request: Request, sub: BatchSubRequest, user: CurrentUser) -> tuple[int, bytes, bytes]:
+    """Выполняет подзапрос в этом же процессе через роутер приложения: (status, content-type, тело)."""
+    url = urlsplit(sub.path)
+    rejection = _rejection(sub, url.path)
+    if rejection is not None:
+        status, detail = rejection
+        return status, b"application/json", json.dumps({"detail": detail}, ensure_ascii=False).encode("utf-8")
+
+    status = 500
+    content_type = b""
+    chunks: list[bytes] = []
+
+    async def receive() -> dict:
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        nonlocal status, content_type
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            content_type = next((value for name, value in message.get("headers", ()) if name == b"content-type"), b"")
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await request.app.router(_sub_scope(request.scope, url.path, url.query, user), receive, send)
+    except Exception:
+        logger.exception("Подзапрос пакета завершился ошибкой: %s", sub.path)
+        return 500, b"application/json", b'{"detail":"Internal Server Error"}'
+    return status, content_type, b"".join(chunks)
+
+
+def _item(sub_id: str, status: int, content_type: bytes, body: bytes) -> bytes:
+    if not body:
+        payload = b"null"
+    elif content_type.startswith(b"application/json"):
+        payload = body
+    else:
+        payload = json.dumps(body.decode("utf-8", "replace"), ensure_ascii=False).encode("utf-8")
+    return b'{"id":' + json.dumps(sub_id, ensure_ascii=False).encode("utf-8") + b',"status":%d,"body":' % status + payload + b"}"
+
+
+@router.post("/batch")
+async def batch(
+    payload: BatchRequest,
+    request: Request,
+    user: CurrentUser = Depends(get_current_user),
+) -> StreamingResponse:
+    """Несколько GET-подзапросов к каталогу, заказам и чатам за один round trip.
+
+    Токен проверяется один раз; подзапросы идут параллельно (не больше
+    API_BATCH_CONCURRENCY одновременно) на соединениях пула читателей.
+    Ответ — `{"responses": [{id, status, body}, ...]}`, элементы отдаются потоком
+    по мере готовности, поэтому их порядок не совпадает с порядком запроса.
+    """
+    ids = [sub.id for sub in payload.requests]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="id подзапросов должны быть уникальны")
+    limit = asyncio.Semaphore(request.app.state.batch_concurrency)
+
+    async def run(sub: BatchSubRequest) -> bytes:
+        async with limit:
+            return _item(sub.id, *await _dispatch(request, sub, user))
+
+    async def stream() -> AsyncIterator[bytes]:
+        tasks = [asyncio.create_task(run(sub)) for sub in payload.requests]
+        try:
+            yield b'{"responses":['
+            for i, done in enumerate(asyncio.as_completed(tasks)):
+                yield (b"," if i else b"") + await done
+            yield b"]}"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/json")
@@ -1,120 +1,217 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from typing import get_args
 
+from fastapi import APIRouter, Depends, FastAPI, Query, Request, Response
+
+from app.api.catalog_cache import ALL_SHOPS, CachedPage, cached_catalog_response, make_etag
+from app.api.catalog_snapshot import get_catalog_snapshot
+from app.api.db_pool import read_conn
 from app.api.deps import get_current_user, get_db
+from app.api.json_pages import JsonQuery, page_bytes, page_response, parse_row_shape
+from app.api.pagination import Keyset
+from app.api.repositories.catalog_repo import CatalogRepo
+from app.api.repositories.search_repo import FTS_MIN_QUERY_LENGTH, SearchRepo
+from app.api.responses import trusted_page
 from app.api.schemas import BusinessType, CursorPage
 from app.db.database import Database
-from app.repositories.categories_repo import CategoriesRepo
-from app.repositories.shops_repo import ShopsRepo
 
 router = APIRouter(tags=["catalog"])
 
 
-def _parse_cursor(cursor: str | None) -> int:
-    if not cursor:
-        return 0
-    try:
-        return max(int(cursor), 0)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="Некорректный cursor") from exc
+ID_KEYSET = Keyset("catalog:id", ("id",))
+# Строки FTS упорядочены по (rank, id); в кортеже JsonQuery они идут как (id, rank).
+RANK_KEYSET = Keyset("catalog:rank", ("rank", "id"))
+
+
+# Поля, которые можно запросить через fields=; выбор уходит прямо в SELECT.
+PRODUCT_FIELDS = ("id", "shop_id", "category_id", "name", "description", "price", "is_active")
+SEARCH_FIELDS = (*PRODUCT_FIELDS, "merchant_name", "business_type")
+FIELDS_DESCRIPTION = "Поля через запятую; без параметра — все колонки"
+FORMAT_DESCRIPTION = "objects — список объектов, compact — columns и rows-массивы"
+
 
+def _after_id(values: list | None) -> int:
+    return int(values[0]) if values else 0
 
-def _build_next_cursor(items: list[dict], limit: int) -> str | None:
+
+def _build_next_cursor(items: list[dict], limit: int, filters: tuple) -> str | None:
     if len(items) <= limit:
         return None
-    return str(items[limit - 1]["id"])
+    return ID_KEYSET.encode([items[limit - 1]["id"]], filters)
+
+
+async def _merchants_page(db: Database, type: str, limit: int, cursor_id: int) -> bytes:
+    page = await CatalogRepo(db).list_active_shops_page(type, cursor_id, limit + 1)
+    return trusted_page(page[:limit], _build_next_cursor(page, limit, ("merchants", type))).body
+
+
+async def _categories_page(db: Database, merchant_id: int, limit: int, cursor_id: int) -> bytes:
+    page = await CatalogRepo(db).list_active_categories_page(merchant_id, cursor_id, limit + 1)
+    return trusted_page(page[:limit], _build_next_cursor(page, limit, ("categories", merchant_id))).body
 
 
 @router.get("/catalog/merchants", response_model=CursorPage)
 async def list_merchants(
+    request: Request,
     type: BusinessType = Query(...),
     limit: int = Query(default=20, ge=1, le=100),
     cursor: str | None = None,
     _: object = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> CursorPage:
-    cursor_id = _parse_cursor(cursor)
-    items = list(await ShopsRepo(db).list_active(type))
-    filtered = [row for row in items if int(row["id"]) > cursor_id]
-    page = filtered[: limit + 1]
-    next_cursor = _build_next_cursor(page, limit)
-    return CursorPage(items=page[:limit], next_cursor=next_cursor)
+) -> Response:
+    cursor_id = _after_id(ID_KEYSET.decode(cursor, ("merchants", type)))
+    return await cached_catalog_response(
+        request,
+        ("merchants", type, limit, cursor_id),
+        ALL_SHOPS,
+        lambda: _merchants_page(db, type, limit, cursor_id),
+    )
 
 
 @router.get("/catalog/{merchant_id}/categories", response_model=CursorPage)
 async def list_categories(
+    request: Request,
     merchant_id: int,
     limit: int = Query(default=20, ge=1, le=100),
     cursor: str | None = None,
     _: object = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> CursorPage:
-    cursor_id = _parse_cursor(cursor)
-    repo = CategoriesRepo(db)
-    items = list(await repo.list_for_shop(merchant_id, active_only=True))
-    filtered = [row for row in items if int(row["id"]) > cursor_id]
-    page = filtered[: limit + 1]
-    next_cursor = _build_next_cursor(page, limit)
-    return CursorPage(items=page[:limit], next_cursor=next_cursor)
+) -> Response:
+    cursor_id = _after_id(ID_KEYSET.decode(cursor, ("categories", merchant_id)))
+    return await cached_catalog_response(
+        request,
+        ("categories", merchant_id, limit, cursor_id),
+        merchant_id,
+        lambda: _categories_page(db, merchant_id, limit, cursor_id),
+    )
+
+
+_CATEGORY_ITEMS_QUERY = JsonQuery(
+    """
+    SELECT p.id, {row}
+    FROM products p
+    WHERE p.shop_id=? AND p.category_id=? AND p.is_active=1 AND p.id>?
+    ORDER BY p.id ASC
+    LIMIT ?
+    """,
+    {"p": "products"},
+)
+
+# Та же страница из снимка каталога: без фильтра is_active и без сборки JSON товара.
+_SNAPSHOT_CATEGORY_ITEMS_QUERY = JsonQuery(
+    """
+    SELECT c.id, {row}
+    FROM api_catalog_items c
+    WHERE c.shop_id=? AND c.category_id=? AND c.id>?
+    ORDER BY c.id ASC
+    LIMIT ?
+    """,
+    {"p": "products"},
+    document="c.item",
+)
+
+
+def _rank_cursor(filters: tuple):
+    return lambda row: RANK_KEYSET.encode([row[1], row[0]], filters)
 
 
 @router.get("/catalog/categories/{category_id}/items", response_model=CursorPage)
 async def list_category_items(
+    request: Request,
     category_id: int,
     merchant_id: int = Query(..., gt=0),
     limit: int = Query(default=20, ge=1, le=100),
     cursor: str | None = None,
+    fields: str | None = Query(default=None, description=FIELDS_DESCRIPTION),
+    format: str = Query(default="objects", description=FORMAT_DESCRIPTION),
     _: object = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> CursorPage:
-    cursor_id = _parse_cursor(cursor)
-    async with db.conn() as conn:
-        cur = await conn.execute(
-            """
-            SELECT *
-            FROM products
-            WHERE shop_id=? AND category_id=? AND is_active=1 AND id>?
-            ORDER BY id ASC
-            LIMIT ?
-            """,
-            (merchant_id, category_id, cursor_id, limit + 1),
-        )
-        page = [dict(r) for r in await cur.fetchall()]
-    next_cursor = _build_next_cursor(page, limit)
-    return CursorPage(items=page[:limit], next_cursor=next_cursor)
+) -> Response:
+    shape = parse_row_shape(fields, format, PRODUCT_FIELDS)
+    filters = ("category_items", merchant_id, category_id)
+    cursor_id = _after_id(ID_KEYSET.decode(cursor, filters))
+    snapshot = get_catalog_snapshot(request)
+
+    async def build() -> bytes:
+        # Снимок годится, только если в нём уже есть последнее изменение магазина:
+        # страница кэшируется под этой версией.
+        if snapshot is not None and snapshot.covers(request.app.state.catalog_versions.current(merchant_id)):
+            query = _SNAPSHOT_CATEGORY_ITEMS_QUERY.variant(shape)
+        else:
+            query = _CATEGORY_ITEMS_QUERY.variant(shape)
+        async with read_conn(db) as conn:
+            rows = await query.fetch(conn, (merchant_id, category_id, cursor_id, limit + 1))
+        return page_bytes(rows, limit, ID_KEYSET.cursor_of(filters))
+
+    key = ("category_items", merchant_id, category_id, limit, cursor_id, shape)
+    return await cached_catalog_response(request, key, merchant_id, build)
+
+
+async def _fts_ready(request: Request, repo: SearchRepo) -> bool:
+    # Пока индекс не заполнен, поиск идёт через LIKE, а не отдаёт пустые страницы.
+    # Заполненный индекс дальше ведут триггеры, поэтому проверка нужна до первого успеха.
+    if not request.app.state.search_index_ready:
+        request.app.state.search_index_ready = await repo.index_ready()
+    return request.app.state.search_index_ready
 
 
 @router.get("/search", response_model=CursorPage)
 async def search_products(
+    request: Request,
     q: str = Query(..., min_length=1),
     type: BusinessType = Query(...),
     limit: int = Query(default=20, ge=1, le=100),
     cursor: str | None = None,
+    fields: str | None = Query(default=None, description=FIELDS_DESCRIPTION),
+    format: str = Query(default="objects", description=FORMAT_DESCRIPTION),
     _: object = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> CursorPage:
-    cursor_id = _parse_cursor(cursor)
-    like = f"%{q.strip().lower()}%"
-    async with db.conn() as conn:
-        cur = await conn.execute(
-            """
-            SELECT p.*, s.name AS merchant_name, s.business_type
-            FROM products p
-            JOIN shops s ON s.id = p.shop_id
-            WHERE s.business_type=?
-              AND p.is_active=1
-              AND p.id>?
-              AND (
-                lower(p.name) LIKE ?
-                OR lower(COALESCE(p.description, '')) LIKE ?
-                OR lower(COALESCE(p.keywords_norm, '')) LIKE ?
-              )
-            ORDER BY p.id ASC
-            LIMIT ?
-            """,
-            (type, cursor_id, like, like, like, limit + 1),
+) -> Response:
+    shape = parse_row_shape(fields, format, SEARCH_FIELDS)
+    query = q.strip()
+    snapshot = get_catalog_snapshot(request)
+    repo = SearchRepo(
+        db, snapshot=snapshot is not None and snapshot.within_lag(request.app.state.catalog_versions.head)
+    )
+    mode = getattr(request.app.state, "search_mode", "fts")
+
+    if mode == "fts" and len(query) >= FTS_MIN_QUERY_LENGTH and await _fts_ready(request, repo):
+        filters = ("search", query, type)
+        after = RANK_KEYSET.decode(cursor, filters)
+        rows = await repo.search_fts(
+            query, type, (float(after[0]), int(after[1])) if after else None, limit + 1, shape
         )
-        page = [dict(r) for r in await cur.fetchall()]
-    next_cursor = _build_next_cursor(page, limit)
-    return CursorPage(items=page[:limit], next_cursor=next_cursor)
+        return page_response(rows, limit, _rank_cursor(filters))
+
+    filters = ("search_like", query, type)
+    rows = await repo.search_like(query, type, _after_id(ID_KEYSET.decode(cursor, filters)), limit + 1, shape)
+    return page_response(rows, limit, ID_KEYSET.cursor_of(filters))
+
+
+async def warm_catalog_cache(app: FastAPI, limit: int = 20) -> int:
+    """Кладёт в кэш каталога первые страницы, с которых начинается клиент.
+
+    Это первая страница магазинов каждого типа и первые страницы категорий
+    показанных на ней магазинов — с теми же ключами, что и у эндпоинтов.
+    Вызывается при старте, после catalog_versions.refresh(). Возвращает число страниц.
+    """
+    db: Database = app.state.db
+    cache = app.state.catalog_cache
+    versions = app.state.catalog_versions
+    warmed = 0
+
+    def put(key: tuple, shop_id: int, body: bytes) -> None:
+        nonlocal warmed
+        version = versions.current(shop_id)
+        cache.put(key, CachedPage(version=version, etag=make_etag(key, version), body=body))
+        warmed += 1
+
+    for business_type in get_args(BusinessType):
+        body = await _merchants_page(db, business_type, limit, 0)
+        put(("merchants", business_type, limit, 0), ALL_SHOPS, body)
+        for shop in json.loads(body)["items"]:
+            merchant_id = int(shop["id"])
+            put(("categories", merchant_id, limit, 0), merchant_id, await _categories_page(db, merchant_id, limit, 0))
+    return warmed
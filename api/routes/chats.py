@@ -1,29 +1,36 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+from collections.abc import AsyncIterator
 
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from app.api.authz import AdminScopeCache, allowed_shop_ids, get_scope_cache
+from app.api.chat_archive import MESSAGE_JSON, archived_messages
+from app.api.chat_hub import ChatHub, Subscription, get_chat_hub, message_topics
+from app.api.db_pool import read_conn
 from app.api.deps import CurrentUser, get_current_user, get_db
+from app.api.events import CHAT_MESSAGE, EventBus, get_event_bus
+from app.api.json_pages import EMPTY_PAGE, JsonQuery, page_response
+from app.api.pagination import Keyset, parse_sort, sort_options
+from app.api.repositories.chat_write_repo import ChatWriteRepo
+from app.api.repositories.orders_read_repo import OrdersReadRepo
 from app.api.schemas import CursorPage, SendChatMessageRequest
+from app.api.write_queue import GroupCommitWriter, get_write_queue
 from app.db.database import Database
-from app.handlers_admin_restaurant.utils import get_admin_restaurant_ids
-from app.handlers_admin_shop.utils import get_admin_shop_ids
 from app.repositories.chat_reads_repo import ChatReadsRepo
-from app.repositories.chat_repo import ChatRepo
-from app.repositories.orders_repo import OrdersRepo
 
 router = APIRouter(prefix="/chats", tags=["chats"])
 
 
-async def _allowed_shop_ids(db: Database, user: CurrentUser) -> set[int]:
-    if user.role == "admin_shop":
-        return set(await get_admin_shop_ids(db, user.user_id))
-    if user.role == "admin_restaurant":
-        return set(await get_admin_restaurant_ids(db, user.user_id))
-    return set()
-
-
-async def _assert_order_chat_access(db: Database, user: CurrentUser, order_id: int) -> dict:
-    order = await OrdersRepo(db).get_order(order_id)
+async def _assert_order_chat_access(
+    db: Database,
+    user: CurrentUser,
+    order_id: int,
+    scope_cache: AdminScopeCache,
+) -> dict:
+    order = await OrdersReadRepo(db).get_order(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
@@ -32,19 +39,98 @@ async def _assert_order_chat_access(db: Database, user: CurrentUser, order_id: i
             raise HTTPException(status_code=403, detail="Нет доступа к чату")
         return order
 
-    allowed = await _allowed_shop_ids(db, user)
+    allowed = await allowed_shop_ids(db, user, scope_cache)
     if int(order["shop_id"]) not in allowed:
         raise HTTPException(status_code=403, detail="Нет доступа к чату")
     return order
 
 
-def _parse_cursor(cursor: str | None) -> int:
-    if not cursor:
-        return 0
-    try:
-        return max(int(cursor), 0)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="Некорректный cursor") from exc
+CHATS_KEYSET = Keyset("chats", ("cs.order_id",))
+INBOX_KEYSET = Keyset("inbox", ("cs.last_message_id",), descending=True)
+MESSAGE_SORTS = sort_options("messages", {"id": ("id",)})
+
+_SUMMARY_JSON = """json_object(
+        'order_id', cs.order_id, 'last_message_id', cs.last_message_id, 'last_message_at', cs.last_message_at,
+        'last_message_preview', cs.last_message_preview, 'unread_count', cs.unread_count
+    )"""
+
+_SUMMARY_OWNER_FILTERS = {
+    "client": "cs.role = 'client' AND cs.client_user_id = ?",
+    "admin": "cs.role = 'admin' AND cs.shop_id IN (SELECT value FROM json_each(?))",
+}
+
+
+def _summary_query(keyset: Keyset, owner_filter: str, has_cursor: bool) -> JsonQuery:
+    return JsonQuery(
+        f"""
+        SELECT {keyset.columns[0]}, {_SUMMARY_JSON}
+        FROM api_chat_summary cs
+        WHERE {owner_filter} AND {keyset.predicate(has_cursor)}
+        ORDER BY {keyset.order_by()}
+        LIMIT ?
+        """
+    )
+
+
+_SUMMARY_QUERIES = {
+    (keyset.name, side, has_cursor): _summary_query(keyset, sql, has_cursor)
+    for keyset in (CHATS_KEYSET, INBOX_KEYSET)
+    for side, sql in _SUMMARY_OWNER_FILTERS.items()
+    for has_cursor in (False, True)
+}
+
+
+def _chat_side(role: str) -> str:
+    return "client" if role == "client" else "admin"
+
+
+async def _summary_owner(
+    db: Database,
+    user: CurrentUser,
+    scope_cache: AdminScopeCache,
+) -> object | None:
+    if user.role == "client":
+        return user.user_id
+    allowed = await allowed_shop_ids(db, user, scope_cache)
+    return json.dumps(sorted(allowed)) if allowed else None
+
+
+def _messages_query(keyset: Keyset, has_cursor: bool) -> JsonQuery:
+    return JsonQuery(
+        f"""
+        SELECT id, {MESSAGE_JSON}
+        FROM order_chat_messages
+        WHERE order_id=? AND {keyset.predicate(has_cursor)}
+        ORDER BY {keyset.order_by()}
+        LIMIT ?
+        """
+    )
+
+
+_MESSAGES_QUERIES = {
+    (sort, has_cursor): _messages_query(keyset, has_cursor)
+    for sort, keyset in MESSAGE_SORTS.items()
+    for has_cursor in (False, True)
+}
+
+
+async def _summary_page(
+    keyset: Keyset,
+    cursor: str | None,
+    limit: int,
+    user: CurrentUser,
+    db: Database,
+    scope_cache: AdminScopeCache,
+) -> Response:
+    after = keyset.decode(cursor)
+    owner = await _summary_owner(db, user, scope_cache)
+    if owner is None:
+        return Response(content=EMPTY_PAGE, media_type="application/json")
+
+    query = _SUMMARY_QUERIES[(keyset.name, _chat_side(user.role), after is not None)]
+    async with read_conn(db) as conn:
+        rows = await query.fetch(conn, (owner, *(after or ()), limit + 1))
+    return page_response(rows, limit, keyset.cursor_of())
 
 
 @router.get("", response_model=CursorPage)
@@ -53,40 +139,21 @@ async def list_chats(
     cursor: str | None = None,
     user: CurrentUser = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> CursorPage:
-    cursor_id = _parse_cursor(cursor)
-    where = ["o.id > ?"]
-    params: list[object] = [cursor_id]
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+) -> Response:
+    return await _summary_page(CHATS_KEYSET, cursor, limit, user, db, scope_cache)
 
-    if user.role == "client":
-        where.append("o.client_user_id = ?")
-        params.append(user.user_id)
-    else:
-        allowed = await _allowed_shop_ids(db, user)
-        if not allowed:
-            return CursorPage(items=[], next_cursor=None)
-        placeholders = ",".join(["?"] * len(allowed))
-        where.append(f"o.shop_id IN ({placeholders})")
-        params.extend(sorted(allowed))
-
-    where_sql = " AND ".join(where)
-    async with db.conn() as conn:
-        cur = await conn.execute(
-            f"""
-            SELECT o.id AS order_id, MAX(m.id) AS last_message_id, MAX(m.created_at) AS last_message_at
-            FROM orders o
-            JOIN order_chat_messages m ON m.order_id = o.id
-            WHERE {where_sql}
-            GROUP BY o.id
-            ORDER BY o.id ASC
-            LIMIT ?
-            """,
-            (*params, limit + 1),
-        )
-        page = [dict(r) for r in await cur.fetchall()]
 
-    next_cursor = str(page[limit - 1]["order_id"]) if len(page) > limit else None
-    return CursorPage(items=page[:limit], next_cursor=next_cursor)
+@router.get("/inbox", response_model=CursorPage)
+async def list_inbox(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: str | None = None,
+    user: CurrentUser = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+) -> Response:
+    """Чаты по свежести последнего сообщения с числом непрочитанных."""
+    return await _summary_page(INBOX_KEYSET, cursor, limit, user, db, scope_cache)
 
 
 @router.get("/{order_id}/messages", response_model=CursorPage)
@@ -94,27 +161,187 @@ async def list_messages(
     order_id: int,
     limit: int = Query(default=30, ge=1, le=100),
     cursor: str | None = None,
+    sort: str = Query(default="id", description="id — от старых к новым, -id — сначала новые"),
     user: CurrentUser = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> CursorPage:
-    await _assert_order_chat_access(db, user, order_id)
-    cursor_id = _parse_cursor(cursor)
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+) -> Response:
+    keyset = parse_sort(sort, MESSAGE_SORTS, "id")
+    filters = (order_id,)
+    after = keyset.decode(cursor, filters)
+    await _assert_order_chat_access(db, user, order_id, scope_cache)
 
-    async with db.conn() as conn:
-        cur = await conn.execute(
-            """
-            SELECT id, sender_user_id, sender_role, message_text, created_at
-            FROM order_chat_messages
-            WHERE order_id=? AND id>?
-            ORDER BY id ASC
-            LIMIT ?
-            """,
-            (order_id, cursor_id, limit + 1),
+    rows = await _message_rows(db, order_id, sort, keyset, after, limit + 1)
+    return page_response(rows, limit, keyset.cursor_of(filters))
+
+
+async def _message_rows(
+    db: Database, order_id: int, sort: str, keyset: Keyset, after: list | None, limit: int
+) -> list[tuple]:
+    """Страница сообщений заказа из таблицы и архива чатов: строки (id, json)."""
+    query = _MESSAGES_QUERIES[(sort, after is not None)]
+    async with read_conn(db) as conn:
+        rows = await query.fetch(conn, (order_id, *(after or ()), limit))
+        # Архивные id меньше живых, поэтому при -id полная страница из таблицы архив не трогает.
+        # Таблица читается раньше архива: если архивация прошла между чтениями, сообщения
+        # окажутся в обоих списках (дубли отбрасываются), но не потеряются.
+        archived = []
+        if not (keyset.descending and len(rows) == limit):
+            archived = await archived_messages(conn, order_id, after[0] if after else None, keyset.descending, limit)
+    if not archived:
+        return rows
+    seen = {row[0] for row in rows}
+    return sorted(
+        [*rows, *(row for row in archived if row[0] not in seen)],
+        key=lambda row: row[0],
+        reverse=keyset.descending,
+    )[:limit]
+
+
+# Сколько пропущенных сообщений досылается при переподключении с Last-Event-ID.
+STREAM_BACKLOG_LIMIT = 500
+
+_STREAM_MESSAGE_JSON = """json_object(
+        'id', m.id, 'order_id', m.order_id, 'sender_user_id', m.sender_user_id,
+        'sender_role', m.sender_role, 'message_text', m.message_text, 'created_at', m.created_at
+    )"""
+
+
+def _backlog_query(owner_filter: str) -> JsonQuery:
+    return JsonQuery(
+        f"""
+        SELECT m.id, {_STREAM_MESSAGE_JSON}
+        FROM order_chat_messages m
+        JOIN orders o ON o.id = m.order_id
+        WHERE {owner_filter} AND m.id > ?
+        ORDER BY m.id ASC
+        LIMIT ?
+        """
+    )
+
+
+_BACKLOG_QUERIES = {
+    "order": _backlog_query("m.order_id = ?"),
+    "client": _backlog_query("o.client_user_id = ?"),
+    "admin": _backlog_query("o.shop_id IN (SELECT value FROM json_each(?))"),
+}
+
+
+def _sse_event(message_id: int, data: str) -> bytes:
+    return f"id: {message_id}\nevent: message\ndata: {data}\n\n".encode("utf-8")
+
+
+async def _sse_stream(
+    subscription: Subscription,
+    backlog: list[tuple],
+    heartbeat_seconds: float,
+) -> AsyncIterator[bytes]:
+    # Живые сообщения могут повторять досланные из backlog. Сравнивать с последним id
+    # нельзя: от других воркеров сообщения приходят с задержкой опроса и не по порядку.
+    backlog_ids = {message_id for message_id, _ in backlog}
+    try:
+        for message_id, data in backlog:
+            yield _sse_event(message_id, data)
+        while True:
+            if subscription.overflowed and subscription.queue.empty():
+                # Клиент не успевал читать: пусть переподключится с Last-Event-ID.
+                yield b"event: overflow\ndata: {}\n\n"
+                return
+            message = await subscription.get(heartbeat_seconds)
+            if message is None:
+                yield b": ping\n\n"
+                continue
+            if message["id"] in backlog_ids:
+                continue
+            yield _sse_event(message["id"], json.dumps(message, ensure_ascii=False))
+    finally:
+        subscription.close()
+
+
+def _parse_last_event_id(last_event_id: str | None) -> int | None:
+    if not last_event_id:
+        return None
+    try:
+        return max(int(last_event_id), 0)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Некорректный Last-Event-ID") from exc
+
+
+async def _open_stream(
+    request: Request,
+    db: Database,
+    hub: ChatHub,
+    topics: list[str],
+    backlog_query: JsonQuery,
+    owner: object,
+    last_event_id: int | None,
+) -> StreamingResponse:
+    # Подписываемся до чтения пропущенного, чтобы не потерять сообщения между ними.
+    subscription = hub.subscribe(topics)
+    backlog: list[tuple] = []
+    if last_event_id is not None:
+        try:
+            async with read_conn(db) as conn:
+                backlog = await backlog_query.fetch(conn, (owner, last_event_id, STREAM_BACKLOG_LIMIT))
+        except BaseException:
+            subscription.close()
+            raise
+    heartbeat = getattr(request.app.state, "chat_heartbeat_seconds", 15.0)
+    return StreamingResponse(
+        _sse_stream(subscription, backlog, heartbeat),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/stream")
+async def stream_inbox(
+    request: Request,
+    last_event_id: str | None = Header(default=None),
+    user: CurrentUser = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+    hub: ChatHub = Depends(get_chat_hub),
+) -> StreamingResponse:
+    """SSE-поток новых сообщений во всех чатах пользователя."""
+    last_id = _parse_last_event_id(last_event_id)
+    if user.role == "client":
+        return await _open_stream(
+            request, db, hub, [f"client:{user.user_id}"], _BACKLOG_QUERIES["client"], user.user_id, last_id
         )
-        page = [dict(r) for r in await cur.fetchall()]
+    allowed = sorted(await allowed_shop_ids(db, user, scope_cache))
+    return await _open_stream(
+        request,
+        db,
+        hub,
+        [f"shop:{shop_id}" for shop_id in allowed],
+        _BACKLOG_QUERIES["admin"],
+        json.dumps(allowed),
+        last_id,
+    )
+
 
-    next_cursor = str(page[limit - 1]["id"]) if len(page) > limit else None
-    return CursorPage(items=page[:limit], next_cursor=next_cursor)
+@router.get("/{order_id}/stream")
+async def stream_messages(
+    order_id: int,
+    request: Request,
+    last_event_id: str | None = Header(default=None),
+    user: CurrentUser = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+    hub: ChatHub = Depends(get_chat_hub),
+) -> StreamingResponse:
+    """SSE-поток сообщений чата заказа вместо опроса /messages."""
+    await _assert_order_chat_access(db, user, order_id, scope_cache)
+    return await _open_stream(
+        request,
+        db,
+        hub,
+        [f"order:{order_id}"],
+        _BACKLOG_QUERIES["order"],
+        order_id,
+        _parse_last_event_id(last_event_id),
+    )
 
 
 @router.post("/{order_id}/messages")
@@ -123,9 +350,29 @@ async def send_message(
     payload: SendChatMessageRequest,
     user: CurrentUser = Depends(get_current_user),
     db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+    bus: EventBus = Depends(get_event_bus),
+    queue: GroupCommitWriter | None = Depends(get_write_queue),
 ) -> dict:
-    await _assert_order_chat_access(db, user, order_id)
-    message_id = await ChatRepo(db).add_message(order_id, user.user_id, user.role, payload.text.strip())
+    order = await _assert_order_chat_access(db, user, order_id, scope_cache)
+    text = payload.text.strip()
+    # created_at берётся из вставленной строки: в потоке то же время, что и в истории.
+    message_id, created_at = await ChatWriteRepo(db, queue).add_message(order_id, user.user_id, user.role, text)
+    await bus.publish(
+        db,
+        CHAT_MESSAGE,
+        {
+            "topics": message_topics(order),
+            "message": {
+                "id": message_id,
+                "order_id": order_id,
+                "sender_user_id": user.user_id,
+                "sender_role": user.role,
+                "message_text": text,
+                "created_at": created_at,
+            },
+        },
+    )
     return {"message_id": message_id}
 
 
@@ -134,7 +381,28 @@ async def mark_chat_read(
     order_id: int,
     user: CurrentUser = Depends(get_current_user),
     db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
 ) -> dict:
-    await _assert_order_chat_access(db, user, order_id)
+    await _assert_order_chat_access(db, user, order_id, scope_cache)
+    side = _chat_side(user.role)
+    async with read_conn(db) as conn:
+        cur = await conn.execute(
+            "SELECT last_message_id FROM api_chat_summary WHERE order_id=? AND role=?", (order_id, side)
+        )
+        row = await cur.fetchone()
     await ChatReadsRepo(db).mark_read(order_id, user.role, user.user_id)
+    if row is None:
+        return {"ok": True}
+    # Отметку прочтения пишет репозиторий бота своей транзакцией, поэтому сброс ограничен
+    # последним сообщением, которое было в чате до неё: если за это время пришло новое,
+    # одно условное UPDATE его не обнулит — непрочитанные останутся до следующего прочтения.
+    async with db.conn() as conn:
+        await conn.execute(
+            """
+            UPDATE api_chat_summary SET unread_count=0
+            WHERE order_id=? AND role=? AND unread_count != 0 AND last_message_id <= ?
+            """,
+            (order_id, side, row[0]),
+        )
+        await conn.commit()
     return {"ok": True}
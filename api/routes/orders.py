@@ -1,36 +1,43 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+import json
+import time
+from functools import cache
 
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+
+from app.api.authz import AdminScopeCache, allowed_shop_ids, get_scope_cache
+from app.api.db_pool import read_conn
 from app.api.deps import CurrentUser, get_current_user, get_db
-from app.api.schemas import CreateOrderRequest, CursorPage
+from app.api.idempotency import (
+    IDEMPOTENCY_HEADER,
+    REPLAYED_HEADER,
+    IdempotencyRecord,
+    IdempotencyStore,
+    get_idempotency_store,
+    request_fingerprint,
+)
+from app.api.json_pages import EMPTY_PAGE, JsonQuery, page_response, parse_row_shape
+from app.api.order_feed import OrderFeed, get_order_feed, sources_for
+from app.api.pagination import parse_sort, sort_options
+from app.api.repositories.orders_read_repo import OrdersReadRepo
+from app.api.repositories.orders_write_repo import OrdersWriteRepo, OrderTransitionError, merge_quantities
+from app.api.responses import trusted_response
+from app.api.schemas import BulkStatusRequest, CreateOrderRequest, CursorPage
+from app.api.write_queue import GroupCommitWriter, get_write_queue, run_write
 from app.db.database import Database
-from app.handlers_admin_restaurant.utils import get_admin_restaurant_ids
-from app.handlers_admin_shop.utils import get_admin_shop_ids
 from app.repositories.orders_repo import OrdersRepo
 
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
-def _parse_cursor(cursor: str | None) -> int:
-    if not cursor:
-        return 0
-    try:
-        return max(int(cursor), 0)
-    except ValueError as exc:
-        raise HTTPException(status_code=400, detail="Некорректный cursor") from exc
-
-
-async def _allowed_shop_ids(db: Database, user: CurrentUser) -> set[int]:
-    if user.role == "admin_shop":
-        return set(await get_admin_shop_ids(db, user.user_id))
-    if user.role == "admin_restaurant":
-        return set(await get_admin_restaurant_ids(db, user.user_id))
-    return set()
-
-
-async def _assert_order_access(db: Database, user: CurrentUser, order_id: int) -> dict:
-    order = await OrdersRepo(db).get_order(order_id)
+async def _assert_order_access(
+    db: Database,
+    user: CurrentUser,
+    order_id: int,
+    scope_cache: AdminScopeCache,
+) -> dict:
+    order = await OrdersReadRepo(db).get_order(order_id)
     if not order:
         raise HTTPException(status_code=404, detail="Заказ не найден")
 
@@ -39,56 +46,199 @@ async def _assert_order_access(db: Database, user: CurrentUser, order_id: int) -
             raise HTTPException(status_code=403, detail="Нет доступа к заказу")
         return order
 
-    allowed = await _allowed_shop_ids(db, user)
+    allowed = await allowed_shop_ids(db, user, scope_cache)
     if int(order["shop_id"]) not in allowed:
         raise HTTPException(status_code=403, detail="Нет доступа к заказу")
     return order
 
 
+ORDER_SORTS = sort_options(
+    "orders",
+    {
+        "id": ("o.id",),
+        "created_at": ("o.created_at", "o.id"),
+        "updated_at": ("o.updated_at", "o.id"),
+    },
+)
+
+ORDER_FIELDS = (
+    "id", "shop_id", "client_user_id", "status", "total_amount", "comment",
+    "fulfillment_type", "created_at", "updated_at", "shop_name", "business_type",
+)
+
+# Форма SQL не зависит от числа магазинов администратора: их список передаётся
+# одним JSON-параметром в json_each, поэтому кэш подготовленных запросов SQLite работает.
+_OWNER_FILTERS = {
+    "client": "o.client_user_id = ?",
+    "admin": "o.shop_id IN (SELECT value FROM json_each(?))",
+}
+
+
+@cache
+def _orders_query(scope: str, with_status: bool, sort: str, has_cursor: bool) -> JsonQuery:
+    keyset = ORDER_SORTS[sort]
+    status_filter = "AND o.status = ?" if with_status else ""
+    return JsonQuery(
+        f"""
+        SELECT {", ".join(keyset.columns)}, {{row}}
+        FROM orders o
+        JOIN shops s ON s.id = o.shop_id
+        WHERE {_OWNER_FILTERS[scope]} {status_filter} AND {keyset.predicate(has_cursor)}
+        ORDER BY {keyset.order_by()}
+        LIMIT ?
+        """,
+        {"o": "orders"},
+        {"shop_name": "s.name", "business_type": "s.business_type"},
+    )
+
+
 @router.get("", response_model=CursorPage)
 async def list_orders(
     limit: int = Query(default=20, ge=1, le=100),
     cursor: str | None = None,
     status: str | None = None,
+    sort: str = Query(default="id", description="id, created_at, updated_at; `-` — по убыванию"),
+    fields: str | None = Query(default=None, description="Поля через запятую; без параметра — все колонки"),
+    format: str = Query(default="objects", description="objects — список объектов, compact — columns и rows-массивы"),
     user: CurrentUser = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> CursorPage:
-    cursor_id = _parse_cursor(cursor)
-    params: list[object] = [cursor_id]
-    where = ["o.id > ?"]
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+) -> Response:
+    keyset = parse_sort(sort, ORDER_SORTS, "id")
+    shape = parse_row_shape(fields, format, ORDER_FIELDS)
+    filters = (status,)
+    after = keyset.decode(cursor, filters)
+    params: list[object] = []
 
     if user.role == "client":
-        where.append("o.client_user_id = ?")
+        scope = "client"
         params.append(user.user_id)
     else:
-        allowed = await _allowed_shop_ids(db, user)
+        allowed = await allowed_shop_ids(db, user, scope_cache)
         if not allowed:
-            return CursorPage(items=[], next_cursor=None)
-        placeholders = ",".join(["?"] * len(allowed))
-        where.append(f"o.shop_id IN ({placeholders})")
-        params.extend(sorted(allowed))
+            return Response(content=EMPTY_PAGE, media_type="application/json")
+        scope = "admin"
+        params.append(json.dumps(sorted(allowed)))
 
     if status:
-        where.append("o.status = ?")
         params.append(status)
+    if after is not None:
+        params.extend(after)
+
+    query = _orders_query(scope, bool(status), sort, after is not None).variant(shape)
+    async with read_conn(db) as conn:
+        rows = await query.fetch(conn, (*params, limit + 1))
+    return page_response(rows, limit, keyset.cursor_of(filters))
+
 
-    where_sql = " AND ".join(where)
-    async with db.conn() as conn:
-        cur = await conn.execute(
-            f"""
-            SELECT o.*, s.name AS shop_name, s.business_type
-            FROM orders o
-            JOIN shops s ON s.id = o.shop_id
-            WHERE {where_sql}
-            ORDER BY o.id ASC
+# Максимальное ожидание long-poll: меньше типичных таймаутов прокси и мобильных клиентов.
+CHANGES_MAX_TIMEOUT = 60.0
+
+_CHANGE_OWNER_FILTERS = {
+    "client": "c.client_user_id = ?",
+    "admin": "c.shop_id IN (SELECT value FROM json_each(?))",
+}
+
+
+def _changes_query(owner_filter: str) -> JsonQuery:
+    # Несколько изменений одного заказа схлопываются в одно — с последней версией.
+    return JsonQuery(
+        f"""
+        SELECT v.version, json_object('version', v.version, 'order', json_object({{o}}))
+        FROM (
+            SELECT c.order_id, MAX(c.version) AS version
+            FROM api_order_changes c
+            WHERE {owner_filter} AND c.version > ?
+            GROUP BY c.order_id
+            ORDER BY version
             LIMIT ?
-            """,
-            (*params, limit + 1),
-        )
-        page = [dict(r) for r in await cur.fetchall()]
+        ) v
+        JOIN orders o ON o.id = v.order_id
+        ORDER BY v.version
+        """,
+        {"o": "orders"},
+    )
+
+
+_CHANGES_QUERIES = {scope: _changes_query(sql) for scope, sql in _CHANGE_OWNER_FILTERS.items()}
+
+
+def _changes_body(rows: list[tuple], limit: int, version: int) -> bytes:
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if rows:
+        version = int(rows[-1][0])
+    items = ",".join(row[-1] for row in rows)
+    return f'{{"items":[{items}],"version":{version},"has_more":{json.dumps(has_more)}}}'.encode("utf-8")
+
+
+@router.get("/changes")
+async def order_changes(
+    since: int | None = Query(default=None, ge=0, description="version из прошлого ответа; без него — текущая голова"),
+    timeout: float = Query(default=25.0, ge=0, le=CHANGES_MAX_TIMEOUT),
+    limit: int = Query(default=100, ge=1, le=500),
+    user: CurrentUser = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+    feed: OrderFeed = Depends(get_order_feed),
+) -> Response:
+    """Заказы, изменившиеся после версии `since` (long-poll до `timeout` секунд).
+
+    Ответ: `items` — [{version, order}], `version` — передать как since в следующий раз.
+    """
+    if since is None:
+        await feed.refresh(db)
+        return Response(content=_changes_body([], limit, feed.head), media_type="application/json")
+    if since and since < feed.oldest - 1:
+        raise HTTPException(status_code=410, detail="Журнал изменений обрезан, перечитайте заказы через GET /orders")
+
+    if user.role == "client":
+        scope, owner = "client", user.user_id
+    else:
+        allowed = await allowed_shop_ids(db, user, scope_cache)
+        if not allowed:
+            return Response(content=_changes_body([], limit, since), media_type="application/json")
+        scope, owner = "admin", json.dumps(sorted(allowed))
 
-    next_cursor = str(page[limit - 1]["id"]) if len(page) > limit else None
-    return CursorPage(items=page[:limit], next_cursor=next_cursor)
+    deadline = time.monotonic() + timeout
+    while True:
+        # Голова берётся до запроса: пустой ответ означает, что до неё изменений нет.
+        observed = feed.head
+        async with read_conn(db) as conn:
+            rows = await _CHANGES_QUERIES[scope].fetch(conn, (owner, since, limit + 1))
+        remaining = deadline - time.monotonic()
+        if rows or remaining <= 0:
+            break
+        if not await feed.wait_beyond(observed, remaining):
+            break
+    return Response(content=_changes_body(rows, limit, max(since, observed)), media_type="application/json")
+
+
+@router.post("/status")
+async def bulk_update_status(
+    request: Request,
+    payload: BulkStatusRequest,
+    user: CurrentUser = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+    feed: OrderFeed = Depends(get_order_feed),
+) -> dict:
+    """Массовая смена статуса в одной транзакции: либо все заказы, либо ни один."""
+    if user.role == "client":
+        raise HTTPException(status_code=403, detail="Менять статус может только администратор")
+    sources = sources_for(request.app.state.order_transitions, payload.status)
+    if not sources:
+        raise HTTPException(status_code=400, detail=f"Неизвестный целевой статус {payload.status}")
+
+    allowed = await allowed_shop_ids(db, user, scope_cache)
+    order_ids = list(dict.fromkeys(payload.order_ids))
+    try:
+        updated = await OrdersWriteRepo(db).bulk_transition(order_ids, payload.status, sources, allowed)
+    except OrderTransitionError as exc:
+        raise HTTPException(status_code=409, detail={"message": str(exc), "rejected": exc.rejected}) from exc
+    # Ждущие long-poll увидят изменения сразу, не дожидаясь опроса журнала.
+    await feed.refresh(db)
+    return {"updated": updated, "status": payload.status}
 
 
 @router.get("/{order_id}")
@@ -96,71 +246,78 @@ async def get_order(
     order_id: int,
     user: CurrentUser = Depends(get_current_user),
     db: Database = Depends(get_db),
-) -> dict:
-    order = await _assert_order_access(db, user, order_id)
-    items = await OrdersRepo(db).get_order_items(order_id)
-    return {"order": order, "items": items}
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+) -> Response:
+    order = await _assert_order_access(db, user, order_id, scope_cache)
+    items = await OrdersReadRepo(db).get_order_items(order_id)
+    return trusted_response({"order": order, "items": items})
 
 
-@router.post("")
-async def create_order(
+async def _create_order(
+    db: Database,
+    queue: GroupCommitWriter | None,
+    user: CurrentUser,
     payload: CreateOrderRequest,
-    user: CurrentUser = Depends(get_current_user),
-    db: Database = Depends(get_db),
+    idempotency: IdempotencyRecord | None,
 ) -> dict:
-    if user.role != "client":
-        raise HTTPException(status_code=403, detail="Создавать заказ может только клиент")
-
-    repo = OrdersRepo(db)
     if not payload.items:
         try:
-            order_id = await repo.create_order_from_cart(
+            order_id = await OrdersRepo(db).create_order_from_cart(
                 shop_id=payload.shop_id,
                 client_user_id=user.user_id,
                 comment=payload.comment,
                 fulfillment_type=payload.fulfillment_type,
             )
-            return {"order_id": order_id}
         except ValueError as exc:
             raise HTTPException(status_code=400, detail=str(exc)) from exc
+        if idempotency is not None:
+            # Корзину оформляет репозиторий бота своей транзакцией, поэтому ключ пишется
+            # следом, отдельно: при падении между ними повтор создаст второй заказ.
+            await run_write(db, queue, lambda conn: idempotency.save(conn, {"order_id": order_id}))
+        return {"order_id": order_id}
 
-    async with db.conn() as conn:
-        await conn.execute("BEGIN")
-        total = 0.0
-        collected: list[tuple[int, int, float]] = []
-        for item in payload.items:
-            cur = await conn.execute(
-                "SELECT id, price, shop_id FROM products WHERE id=? AND is_active=1",
-                (item.product_id,),
-            )
-            row = await cur.fetchone()
-            if not row:
-                await conn.execute("ROLLBACK")
-                raise HTTPException(status_code=400, detail=f"Товар {item.product_id} не найден")
-            if int(row["shop_id"]) != payload.shop_id:
-                await conn.execute("ROLLBACK")
-                raise HTTPException(status_code=400, detail="Все товары должны быть из одного магазина")
-            price = float(row["price"])
-            total += price * item.quantity
-            collected.append((item.product_id, item.quantity, price))
-
-        cur_order = await conn.execute(
-            """
-            INSERT INTO orders (shop_id, client_user_id, status, total_amount, comment, fulfillment_type, updated_at)
-            VALUES (?, ?, 'new', ?, ?, ?, CURRENT_TIMESTAMP)
-            """,
-            (payload.shop_id, user.user_id, total, payload.comment, payload.fulfillment_type),
+    try:
+        order_id = await OrdersWriteRepo(db, queue).create_order_with_items(
+            shop_id=payload.shop_id,
+            client_user_id=user.user_id,
+            comment=payload.comment,
+            fulfillment_type=payload.fulfillment_type,
+            items=merge_quantities([(item.product_id, item.quantity) for item in payload.items]),
+            idempotency=idempotency,
         )
-        order_id = int(cur_order.lastrowid)
-
-        for product_id, quantity, price in collected:
-            await conn.execute(
-                """
-                INSERT INTO order_items (order_id, product_id, quantity, price_at_moment)
-                VALUES (?, ?, ?, ?)
-                """,
-                (order_id, product_id, quantity, price),
-            )
-        await conn.commit()
-
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
     return {"order_id": order_id}
+
+
+@router.post("")
+async def create_order(
+    payload: CreateOrderRequest,
+    response: Response,
+    user: CurrentUser = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    queue: GroupCommitWriter | None = Depends(get_write_queue),
+    idempotency: IdempotencyStore = Depends(get_idempotency_store),
+    idempotency_key: str | None = Header(default=None, alias=IDEMPOTENCY_HEADER, min_length=1, max_length=128),
+) -> dict:
+    """Создаёт заказ из переданных позиций или из корзины.
+
+    С заголовком Idempotency-Key повтор запроса (например, после таймаута) в течение
+    API_IDEMPOTENCY_TTL_HOURS возвращает тот же order_id с заголовком
+    `Idempotent-Replayed: true`; тот же ключ с другим телом — 422.
+    """
+    if user.role != "client":
+        raise HTTPException(status_code=403, detail="Создавать заказ может только клиент")
+    if idempotency_key is None:
+        return await _create_order(db, queue, user, payload, None)
+
+    result, replayed = await idempotency.run(
+        db,
+        user.user_id,
+        idempotency_key,
+        request_fingerprint("POST /orders", payload),
+        lambda record: _create_order(db, queue, user, payload, record),
+    )
+    if replayed:
+        response.headers[REPLAYED_HEADER] = "true"
+    return result
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta, timezone
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+
+from app.api.authz import AdminScopeCache, allowed_shop_ids, get_scope_cache
+from app.api.deps import CurrentUser, get_current_user, get_db
+from app.api.repositories.stats_repo import StatsRepo
+from app.api.responses import trusted_response
+from app.db.database import Database
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+# Период по умолчанию и наибольший период одного запроса (часовой ряд — до 24 строк в день).
+STATS_DEFAULT_DAYS = 30
+STATS_MAX_DAYS = 92
+
+
+@router.get("/shops/{shop_id}")
+async def shop_stats(
+    shop_id: int,
+    date_from: date | None = Query(default=None, description="Первый день периода (UTC); по умолчанию — 30 дней назад"),
+    date_to: date | None = Query(default=None, description="Последний день периода (UTC); по умолчанию — сегодня"),
+    status: str | None = Query(default=None, description="Статусы через запятую; без параметра — все, кроме cancelled"),
+    top: int = Query(default=10, ge=1, le=100),
+    user: CurrentUser = Depends(get_current_user),
+    db: Database = Depends(get_db),
+    scope_cache: AdminScopeCache = Depends(get_scope_cache),
+) -> Response:
+    """Заказы и выручка магазина по статусам, дням и часам, топ товаров по выручке."""
+    if user.role == "client":
+        raise HTTPException(status_code=403, detail="Статистика доступна только администратору")
+    if shop_id not in await allowed_shop_ids(db, user, scope_cache):
+        raise HTTPException(status_code=403, detail="Нет доступа к магазину")
+
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=STATS_DEFAULT_DAYS - 1)
+    if date_from > date_to:
+        raise HTTPException(status_code=422, detail="date_from позже date_to")
+    if (date_to - date_from).days >= STATS_MAX_DAYS:
+        raise HTTPException(status_code=422, detail=f"Период статистики — не больше {STATS_MAX_DAYS} дней")
+    statuses = [s.strip() for s in status.split(",") if s.strip()] if status else None
+
+    stats = await StatsRepo(db).shop_stats(shop_id, date_from, date_to, statuses or None, top)
+    return trusted_response(stats)
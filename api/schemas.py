@@ -13,9 +13,15 @@ class TelegramAuthRequest(BaseModel):
     telegram_user_id: int = Field(gt=0)
 
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str = Field(min_length=1)
+
+
 class TokenResponse(BaseModel):
     access_token: str
     token_type: str = "bearer"
+    expires_in: int
+    refresh_token: str | None = None
 
 
 class CursorPage(BaseModel):
@@ -35,5 +41,20 @@ class CreateOrderRequest(BaseModel):
     items: list[OrderItemCreate] | None = None
 
 
+class BulkStatusRequest(BaseModel):
+    order_ids: list[int] = Field(min_length=1, max_length=500)
+    status: str = Field(min_length=1)
+
+
 class SendChatMessageRequest(BaseModel):
     text: str = Field(min_length=1, max_length=4000)
+
+
+class BatchSubRequest(BaseModel):
+    id: str = Field(min_length=1, max_length=64)
+    method: str = "GET"
+    path: str = Field(min_length=1, max_length=2048)
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchSubRequest] = Field(min_length=1, max_length=20)
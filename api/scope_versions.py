@@ -0,0 +1,175 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import json
+import logging
+
+from app.api.db_pool import read_conn
+from app.api.events import SCOPE_INVALIDATE, EventBus
+from app.api.repositories.admin_scope_repo import AdminScopeRepo
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+
+class ScopeVersions:
+    """Версии прав администраторов для токенов со встроенным списком магазинов.
+
+    Версия хранится в api_admin_scope_versions. Назначения меняет бот в своих
+    таблицах, поэтому API сам сверяет права: при входе (`observe`) и в фоне раз в
+    `recheck_seconds` для всех известных администраторов (`recheck`). Если роль
+    или магазины разошлись с записанными в api_admin_scopes, версия поднимается.
+    Поднять её вручную можно командой `manage scope-bump` или через `bump`.
+    Токен с другой версией отклоняется. Таблица версий перечитывается в фоне раз
+    в `refresh_seconds`, поэтому проверка токена не обращается к БД. Каждая
+    замеченная смена версии сбрасывает права пользователя в AdminScopeCache
+    этого воркера через событие SCOPE_INVALIDATE в `bus`.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: float = 5.0,
+        recheck_seconds: float = 60.0,
+        bus: EventBus | None = None,
+    ) -> None:
+        self.refresh_seconds = refresh_seconds
+        self.recheck_seconds = recheck_seconds
+        self.bus = bus
+        self._versions: dict[int, int] = {}
+        self._tasks: list[asyncio.Task[None]] = []
+
+    def current(self, user_id: int) -> int:
+        return self._versions.get(user_id, 0)
+
+    async def refresh(self, db: Database) -> None:
+        async with read_conn(db) as conn:
+            cur = await conn.execute("SELECT user_id, version FROM api_admin_scope_versions")
+            versions = {int(r[0]): int(r[1]) for r in await cur.fetchall()}
+        changed = [user_id for user_id, version in versions.items() if self._versions.get(user_id, 0) != version]
+        self._versions = versions
+        for user_id in changed:
+            self._notify(user_id)
+
+    def _set(self, user_id: int, version: int) -> None:
+        if self._versions.get(user_id, 0) != version:
+            self._versions[user_id] = version
+            self._notify(user_id)
+
+    def _notify(self, user_id: int) -> None:
+        if self.bus is not None:
+            self.bus.notify(SCOPE_INVALIDATE, {"user_id": user_id})
+
+    async def bump(self, db: Database, user_id: int) -> int:
+        async with db.conn() as conn:
+            cur = await conn.execute(
+                """
+                INSERT INTO api_admin_scope_versions(user_id, version)
+                VALUES (?, 1)
+                ON CONFLICT(user_id) DO UPDATE SET version=version + 1
+                RETURNING version
+                """,
+                (user_id,),
+            )
+            row = await cur.fetchone()
+            await conn.commit()
+        version = int(row[0])
+        self._set(user_id, version)
+        return version
+
+    async def observe(self, db: Database, user_id: int, role: str, shop_ids: list[int]) -> int:
+        """Запоминает права, полученные от бота; при расхождении с прежними поднимает версию.
+
+        Клиент без записи не сохраняется. Писатель занимается только при изменении.
+        """
+        shops = json.dumps(sorted(shop_ids))
+        async with read_conn(db) as conn:
+            cur = await conn.execute(
+                """
+                SELECT s.role, s.shops, COALESCE(v.version, 0)
+                FROM api_admin_scopes s LEFT JOIN api_admin_scope_versions v ON v.user_id = s.user_id
+                WHERE s.user_id = ?
+                """,
+                (user_id,),
+            )
+            row = await cur.fetchone()
+        if row is None and role == "client":
+            return self.current(user_id)
+        if row is not None and tuple(row[:2]) == (role, shops):
+            self._set(user_id, int(row[2]))
+            return int(row[2])
+        async with db.conn() as conn:
+            cur = await conn.execute(
+                """
+                INSERT INTO api_admin_scopes(user_id, role, shops) VALUES (?, ?, ?)
+                ON CONFLICT(user_id) DO UPDATE SET role=excluded.role, shops=excluded.shops
+                WHERE role IS NOT excluded.role OR shops IS NOT excluded.shops
+                """,
+                (user_id, role, shops),
+            )
+            if cur.rowcount:
+                cur = await conn.execute(
+                    """
+                    INSERT INTO api_admin_scope_versions(user_id, version)
+                    VALUES (?, 1)
+                    ON CONFLICT(user_id) DO UPDATE SET version=version + 1
+                    RETURNING version
+                    """,
+                    (user_id,),
+                )
+            else:
+                # Те же права уже записал другой воркер и сам поднял версию.
+                cur = await conn.execute(
+                    "SELECT COALESCE(MAX(version), 0) FROM api_admin_scope_versions WHERE user_id=?", (user_id,)
+                )
+            row = await cur.fetchone()
+            await conn.commit()
+        version = int(row[0])
+        self._set(user_id, version)
+        return version
+
+    async def recheck(self, db: Database) -> int:
+        """Сверяет с ботом права всех известных администраторов. Возвращает число изменившихся."""
+        async with read_conn(db) as conn:
+            cur = await conn.execute("SELECT user_id FROM api_admin_scopes WHERE role != 'client' ORDER BY user_id")
+            user_ids = [int(r[0]) for r in await cur.fetchall()]
+        repo = AdminScopeRepo(db)
+        changed = 0
+        for user_id in user_ids:
+            before = self.current(user_id)
+            role, shop_ids = await repo.resolve_role(user_id)
+            if await self.observe(db, user_id, role, shop_ids) != before:
+                changed += 1
+        return changed
+
+    def start(self, db: Database) -> None:
+        if self._tasks:
+            return
+        self._tasks.append(asyncio.create_task(self._refresh_loop(db)))
+        if self.recheck_seconds > 0:
+            self._tasks.append(asyncio.create_task(self._recheck_loop(db)))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+        self._tasks = []
+
+    async def _refresh_loop(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_seconds)
+            try:
+                await self.refresh(db)
+            except Exception:
+                logger.exception("Не удалось обновить версии прав администраторов")
+
+    async def _recheck_loop(self, db: Database) -> None:
+        while True:
+            await asyncio.sleep(self.recheck_seconds)
+            try:
+                await self.recheck(db)
+            except Exception:
+                logger.exception("Не удалось сверить права администраторов с ботом")
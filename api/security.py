@@ -6,6 +6,7 @@ import hmac
 import json
 import os
 import time
+from collections import OrderedDict
 from typing import Any
 
 from fastapi import HTTPException, status
@@ -13,6 +14,9 @@ from fastapi import HTTPException, status
 
 JWT_ALG = "HS256"
 JWT_EXPIRE_SECONDS = int(os.getenv("API_JWT_EXPIRE_SECONDS", "86400"))
+JWT_REFRESH_EXPIRE_SECONDS = int(os.getenv("API_JWT_REFRESH_EXPIRE_SECONDS", str(30 * 86400)))
+# Значение claim `typ` у refresh-токенов; access-токены его не содержат.
+REFRESH_TOKEN_TYPE = "refresh"
 
 
 def _b64url_encode(raw: bytes) -> str:
@@ -31,38 +35,147 @@ def _get_secret() -> str:
     return secret
 
 
-def create_access_token(payload: dict[str, Any]) -> str:
+class _KeyRing:
+    """HMAC-ключи, подготовленные один раз.
+
+    Подписываем активным ключом (kid из API_JWT_KID), проверяем любым из активных:
+    API_JWT_PREVIOUS_SECRETS="kid1:secret1,kid2:secret2" держит старые ключи на время ротации.
+    Токены без kid проверяются активным ключом.
+    """
+
+    def __init__(self) -> None:
+        self.signing_kid = os.getenv("API_JWT_KID", "main")
+        self.keys: dict[str, hmac.HMAC] = {self.signing_kid: self._prepare(_get_secret())}
+        self._header_kids: dict[str, str | None] = {}
+        for item in os.getenv("API_JWT_PREVIOUS_SECRETS", "").split(","):
+            kid, sep, secret = item.strip().partition(":")
+            if sep and kid and secret:
+                self.keys.setdefault(kid, self._prepare(secret))
+
+    def header_kid(self, header_b64: str) -> str | None:
+        # Заголовков в обороте единицы, поэтому разбор кэшируется по строке.
+        if header_b64 in self._header_kids:
+            return self._header_kids[header_b64]
+        header = json.loads(_b64url_decode(header_b64))
+        kid = header.get("kid") if isinstance(header, dict) else None
+        if kid is not None and not isinstance(kid, str):
+            raise ValueError("kid must be a string")
+        if len(self._header_kids) < 64:
+            self._header_kids[header_b64] = kid
+        return kid
+
+    @staticmethod
+    def _prepare(secret: str) -> hmac.HMAC:
+        return hmac.new(secret.encode("utf-8"), digestmod=hashlib.sha256)
+
+    def sign(self, signing_input: bytes, kid: str | None = None) -> bytes:
+        mac = self.keys[kid or self.signing_kid].copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+
+_keyring: _KeyRing | None = None
+_verified: OrderedDict[str, dict[str, Any]] = OrderedDict()
+VERIFIED_CACHE_SIZE = int(os.getenv("API_JWT_CACHE_SIZE", "4096"))
+
+
+def _get_keyring() -> _KeyRing:
+    global _keyring
+    if _keyring is None:
+        _keyring = _KeyRing()
+    return _keyring
+
+
+def reload_keys() -> None:
+    """Перечитывает секреты из окружения (ротация) и сбрасывает кэш проверенных токенов."""
+    global _keyring
+    _keyring = _KeyRing()
+    _verified.clear()
+
+
+def _encode(payload: dict[str, Any], expire_seconds: int) -> str:
     now = int(time.time())
     body = {
         **payload,
         "iat": now,
-        "exp": now + JWT_EXPIRE_SECONDS,
+        "exp": now + expire_seconds,
     }
-    header_json = json.dumps({"alg": JWT_ALG, "typ": "JWT"}, separators=(",", ":")).encode("utf-8")
+    keyring = _get_keyring()
+    header_json = json.dumps(
+        {"alg": JWT_ALG, "typ": "JWT", "kid": keyring.signing_kid}, separators=(",", ":")
+    ).encode("utf-8")
     body_json = json.dumps(body, separators=(",", ":")).encode("utf-8")
     header = _b64url_encode(header_json)
     body_part = _b64url_encode(body_json)
     signing_input = f"{header}.{body_part}".encode("utf-8")
-    signature = hmac.new(_get_secret().encode("utf-8"), signing_input, hashlib.sha256).digest()
+    signature = keyring.sign(signing_input)
     return f"{header}.{body_part}.{_b64url_encode(signature)}"
 
 
+def create_access_token(payload: dict[str, Any]) -> str:
+    return _encode(payload, JWT_EXPIRE_SECONDS)
+
+
+def create_refresh_token(payload: dict[str, Any]) -> str:
+    return _encode({**payload, "typ": REFRESH_TOKEN_TYPE}, JWT_REFRESH_EXPIRE_SECONDS)
+
+
+def _check_exp(payload: dict[str, Any]) -> None:
+    if int(payload.get("exp", 0)) < int(time.time()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Срок действия токена истек")
+
+
 def decode_access_token(token: str) -> dict[str, Any]:
+    payload = _decode(token)
+    if payload.get("typ") == REFRESH_TOKEN_TYPE:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен")
+    return payload
+
+
+def decode_refresh_token(token: str) -> dict[str, Any]:
+    payload = _decode(token)
+    if payload.get("typ") != REFRESH_TOKEN_TYPE:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Ожидается refresh-токен")
+    return payload
+
+
+def _decode(token: str) -> dict[str, Any]:
+    """Проверяет подпись и срок. Уже проверенные токены берутся из LRU-кэша; payload не изменять."""
+    cached = _verified.get(token)
+    if cached is not None:
+        try:
+            _check_exp(cached)
+        except HTTPException:
+            _verified.pop(token, None)
+            raise
+        _verified.move_to_end(token)
+        return cached
+
     parts = token.split(".")
     if len(parts) != 3:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен")
 
     header_b64, payload_b64, signature_b64 = parts
+    keyring = _get_keyring()
+    try:
+        kid = keyring.header_kid(header_b64)
+        actual = _b64url_decode(signature_b64)
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректный токен") from exc
+
+    if kid is not None and kid not in keyring.keys:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректная подпись токена")
     signing_input = f"{header_b64}.{payload_b64}".encode("utf-8")
-    expected = hmac.new(_get_secret().encode("utf-8"), signing_input, hashlib.sha256).digest()
+    expected = keyring.sign(signing_input, kid)
 
-    actual = _b64url_decode(signature_b64)
     if not hmac.compare_digest(expected, actual):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Некорректная подпись токена")
 
     payload_raw = _b64url_decode(payload_b64)
     payload: dict[str, Any] = json.loads(payload_raw.decode("utf-8"))
+    _check_exp(payload)
 
-    if int(payload.get("exp", 0)) < int(time.time()):
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Срок действия токена истек")
+    _verified[token] = payload
+    if len(_verified) > VERIFIED_CACHE_SIZE:
+        _verified.popitem(last=False)
     return payload
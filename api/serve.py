@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+
+import uvicorn
+from dotenv import load_dotenv
+
+from app.api.migrations import apply_migrations
+from app.db.database import DBConfig, Database
+
+
+async def _prepare(db_path: str) -> None:
+    """Один раз до старта воркеров: WAL (нужен для чтения параллельно с записью) и миграции."""
+    db = Database(DBConfig(path=db_path))
+    async with db.conn() as conn:
+        await conn.execute("PRAGMA journal_mode=WAL")
+    await apply_migrations(db)
+
+
+def main() -> None:
+    """Продакшн-запуск: N процессов uvicorn на одном порту и одной базе DB_PATH.
+
+    Кэши и подписчики чатов живут в каждом воркере; согласованность между ними
+    держат версии в SQLite (каталог, права) и EventBus с таблицей api_events.
+    """
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Запуск API в несколько процессов")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("API_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--host", default=os.getenv("API_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8000")))
+    parser.add_argument("--log-level", default=os.getenv("API_LOG_LEVEL", "info"))
+    args = parser.parse_args()
+    workers = max(args.workers, 1)
+
+    asyncio.run(_prepare(os.getenv("DB_PATH", "shop.db")))
+    # Воркеры наследуют окружение: миграции уже применены, события общие.
+    os.environ["API_MIGRATE_ON_STARTUP"] = "0"
+    os.environ["API_SHARED_EVENTS"] = "1" if workers > 1 else "0"
+    # Писатель с очередью и busy_timeout важнее при нескольких процессах на одной базе.
+    os.environ.setdefault("API_DB_POOL", "1")
+
+    uvicorn.run("app.api.main:app", host=args.host, port=args.port, workers=workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
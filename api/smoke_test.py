@@ -1,8 +1,13 @@
 from __future__ import annotations
 
+import argparse
+import asyncio
 import json
 import os
+import sys
 import urllib.request
+from pathlib import Path
+from urllib.parse import urlsplit
 
 
 BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
@@ -31,7 +36,7 @@ def _get(path: str, token: str) -> dict:
         return json.loads(resp.read().decode("utf-8"))
 
 
-def main() -> None:
+def smoke() -> None:
     auth = _post("/auth/telegram", {"telegram_user_id": TELEGRAM_USER_ID})
     token = auth["access_token"]
     merchants = _get("/catalog/merchants?type=shop&limit=5", token)
@@ -39,5 +44,121 @@ def main() -> None:
     print("MERCHANTS:", json.dumps(merchants, ensure_ascii=False))
 
 
+def _seed_config(args: argparse.Namespace):
+    from app.api.benchmarks.loadtest import SeedConfig
+
+    return SeedConfig(
+        shops=args.shops,
+        products=args.products,
+        clients=args.clients,
+        orders=args.orders,
+        messages=args.messages,
+        seed=args.seed,
+    )
+
+
+def seed(args: argparse.Namespace) -> None:
+    from app.api.benchmarks.loadtest import seed_database
+
+    timings = seed_database(Path(args.db), _seed_config(args))
+    print(json.dumps({"db": args.db, "seconds": timings}, ensure_ascii=False, indent=2))
+
+
+async def _load(args: argparse.Namespace) -> dict:
+    from app.api.benchmarks.loadtest import run_load, run_metadata, seed_database, spawn_server, wait_ready
+
+    report: dict = {"meta": run_metadata(), "params": vars(args).copy()}
+    server = None
+    if args.spawn:
+        db_path = Path(args.db)
+        if args.reseed or not db_path.exists():
+            report["seed_seconds"] = seed_database(db_path, _seed_config(args))
+        host, port = "127.0.0.1", args.port
+        server = spawn_server(db_path, port, args.workers)
+    else:
+        url = urlsplit(BASE_URL)
+        host, port = url.hostname or "127.0.0.1", url.port or 80
+    try:
+        await wait_ready(host, port)
+        if args.warmup:
+            await run_load(host, port, args.users, args.warmup, args.clients, args.think, args.seed + 1)
+        report["load"] = await run_load(host, port, args.users, args.seconds, args.clients, args.think, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return report
+
+
+def load(args: argparse.Namespace) -> None:
+    report = asyncio.run(_load(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+    print(text)
+
+
+def compare(args: argparse.Namespace) -> None:
+    from app.api.benchmarks.loadtest import compare as compare_reports
+
+    baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+    current = json.loads(Path(args.current).read_text(encoding="utf-8"))
+    lines, regressed = compare_reports(baseline, current, args.threshold)
+    print("\n".join(lines))
+    if regressed:
+        sys.exit(1)
+
+
+def main() -> None:
+    """Проверка живого API и нагрузочный стенд.
+
+    Без аргументов — как раньше: логин и одна страница магазинов на API_BASE_URL.
+    `seed` создаёт синтетическую базу, `load` гоняет смешанную нагрузку и пишет JSON,
+    `compare` сравнивает два JSON-отчёта. Всё работает локально, без внешней сети.
+    """
+    parser = argparse.ArgumentParser(description="Smoke-тест и нагрузочный стенд API")
+    sub = parser.add_subparsers(dest="command")
+    sub.add_parser("smoke", help="Логин и список магазинов на API_BASE_URL (по умолчанию)")
+
+    def add_seed_args(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--db", default="loadtest.db")
+        p.add_argument("--shops", type=int, default=200)
+        p.add_argument("--products", type=int, default=100_000)
+        p.add_argument("--clients", type=int, default=10_000)
+        p.add_argument("--orders", type=int, default=100_000)
+        p.add_argument("--messages", type=int, default=300_000)
+        p.add_argument("--seed", type=int, default=42)
+
+    seed_parser = sub.add_parser("seed", help="Создать синтетическую shop.db")
+    add_seed_args(seed_parser)
+
+    load_parser = sub.add_parser("load", help="Смешанная нагрузка: каталог, поиск, заказы, чаты")
+    add_seed_args(load_parser)
+    load_parser.add_argument("--spawn", action="store_true", help="Поднять локальный API на --db вместо API_BASE_URL")
+    load_parser.add_argument("--reseed", action="store_true", help="Пересоздать --db перед запуском")
+    load_parser.add_argument("--workers", type=int, default=1)
+    load_parser.add_argument("--port", type=int, default=8765)
+    load_parser.add_argument("--users", type=int, default=50, help="одновременных виртуальных пользователей")
+    load_parser.add_argument("--seconds", type=float, default=30.0)
+    load_parser.add_argument("--warmup", type=float, default=3.0)
+    load_parser.add_argument("--think", type=float, default=0.0, help="средняя пауза между действиями, с")
+    load_parser.add_argument("--out", help="куда сохранить JSON-отчёт")
+
+    compare_parser = sub.add_parser("compare", help="Сравнить два JSON-отчёта load")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.10)
+
+    args = parser.parse_args()
+    if args.command == "seed":
+        seed(args)
+    elif args.command == "load":
+        load(args)
+    elif args.command == "compare":
+        compare(args)
+    else:
+        smoke()
+
+
 if __name__ == "__main__":
     main()
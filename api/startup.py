@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+import re
+import subprocess
+import sys
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+# Таблицы бота, без которых API не работает. Таблицы api_* создают миграции.
+REQUIRED_TABLES = ("shops", "categories", "products", "orders", "order_items", "order_chat_messages")
+
+
+class StartupTimings:
+    """Длительность этапов старта воркера: отдаётся в /health/startup и пишется в лог."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.ready_at: float | None = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def ready(self) -> None:
+        self.ready_at = time.perf_counter()
+        logger.info("API готов к запросам: %s", self.as_dict())
+
+    def as_dict(self) -> dict:
+        total = (self.ready_at or time.perf_counter()) - self.started
+        return {
+            "phases_ms": {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()},
+            "total_ms": round(total * 1000, 2),
+        }
+
+
+async def check_schema(db: Database) -> None:
+    """Падает при старте, если база не та: лучше не принять трафик, чем отдавать 500."""
+    async with db.conn() as conn:
+        cur = await conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+        tables = {r[0] for r in await cur.fetchall()}
+    missing = [name for name in REQUIRED_TABLES if name not in tables]
+    if missing:
+        raise RuntimeError(f"В базе нет таблиц бота: {', '.join(missing)}")
+
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def import_profile(module: str = "app.api.main") -> list[dict]:
+    """Стоимость импорта `module` по модулям через `python -X importtime` в отдельном процессе.
+
+    Возвращает строки {module, self_ms, cumulative_ms, depth} в порядке импорта.
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append(
+                {
+                    "module": name,
+                    "self_ms": int(self_us) / 1000,
+                    "cumulative_ms": int(cumulative_us) / 1000,
+                    "depth": len(indent) // 2,
+                }
+            )
+    return rows
+
+
+def summarize_imports(rows: list[dict], top: int = 25) -> dict:
+    """Сводка профиля: самые дорогие модули и собственное время по пакетам верхнего уровня."""
+    by_package: dict[str, float] = {}
+    for row in rows:
+        parts = row["module"].split(".")
+        # Для app.* полезнее второй уровень: app.api, app.handlers_admin_shop, ...
+        package = ".".join(parts[:2]) if parts[0] == "app" else parts[0]
+        by_package[package] = by_package.get(package, 0.0) + row["self_ms"]
+    return {
+        "total_ms": round(sum(row["cumulative_ms"] for row in rows if row["depth"] == 0), 2),
+        "packages_ms": {
+            name: round(ms, 2) for name, ms in sorted(by_package.items(), key=lambda item: -item[1])[:top]
+        },
+        "modules": [
+            {"module": row["module"], "cumulative_ms": round(row["cumulative_ms"], 2), "self_ms": round(row["self_ms"], 2)}
+            for row in sorted(rows, key=lambda row: -row["cumulative_ms"])[:top]
+        ],
+    }
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import sqlite3
+from pathlib import Path
+
+import pytest
+
+from app.api.benchmarks.fixtures import create_synthetic_db
+from app.api.migrations import API_MIGRATIONS
+from app.db.database import DBConfig, Database
+
+
+@pytest.fixture
+def db_path(tmp_path: Path) -> Path:
+    """Синтетическая схема бота с таблицами и триггерами API."""
+    path = tmp_path / "api.db"
+    conn = create_synthetic_db(path)
+    for statement in API_MIGRATIONS:
+        conn.execute(statement)
+    conn.commit()
+    conn.close()
+    return path
+
+
+@pytest.fixture
+def conn(db_path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(db_path)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def database(db_path: Path) -> Database:
+    return Database(DBConfig(path=str(db_path)))
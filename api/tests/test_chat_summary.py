@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import random
+import sqlite3
+
+from app.api.migrations import CHAT_SUMMARY_BACKFILL
+
+SUMMARY = "SELECT * FROM api_chat_summary ORDER BY order_id, role"
+
+
+def _seed_orders(conn: sqlite3.Connection, count: int) -> None:
+    conn.execute("INSERT INTO shops(id, name, business_type, is_active) VALUES (1, 'Магазин', 'shop', 1)")
+    conn.executemany(
+        "INSERT INTO orders(id, shop_id, client_user_id, status, total_amount) VALUES (?, 1, ?, 'new', 100)",
+        ((order_id, 100 + order_id) for order_id in range(1, count + 1)),
+    )
+
+
+def _send(conn: sqlite3.Connection, order_id: int, role: str) -> None:
+    conn.execute(
+        "INSERT INTO order_chat_messages(order_id, sender_user_id, sender_role, message_text) VALUES (?, 1, ?, ?)",
+        (order_id, role, f"{role} → {order_id}"),
+    )
+
+
+def _backfill(conn: sqlite3.Connection) -> list[tuple]:
+    for statement in CHAT_SUMMARY_BACKFILL:
+        conn.execute(statement)
+    return conn.execute(SUMMARY).fetchall()
+
+
+def test_reply_resets_own_unread(conn: sqlite3.Connection) -> None:
+    _seed_orders(conn, 1)
+    for role in ("client", "client", "admin_shop", "client"):
+        _send(conn, 1, role)
+    unread = dict(conn.execute("SELECT role, unread_count FROM api_chat_summary WHERE order_id = 1"))
+    # Администратор ответил на два сообщения: непрочитанным осталось одно, последнее.
+    assert unread == {"admin": 1, "client": 0}
+
+
+def test_trigger_matches_backfill(conn: sqlite3.Connection) -> None:
+    _seed_orders(conn, 20)
+    rnd = random.Random(7)
+    for _ in range(400):
+        _send(conn, rnd.randint(1, 20), rnd.choice(["client", "client", "admin_shop", "admin_restaurant"]))
+    by_trigger = conn.execute(SUMMARY).fetchall()
+    assert by_trigger
+    assert _backfill(conn) == by_trigger
@@ -0,0 +1,82 @@
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from app.api.catalog_cache import _etag_matches
+from app.api.compression import CompressionMiddleware, parse_accept_encoding
+
+ETAG = '"catalog-1"'
+BODY = b'{"items": [' + b",".join(b'{"id": %d, "name": "\xd0\xa2\xd0\xbe\xd0\xb2\xd0\xb0\xd1\x80"}' % i for i in range(200)) + b"]}"
+
+
+@pytest.fixture
+def middleware() -> CompressionMiddleware:
+    app = FastAPI()
+
+    @app.get("/page")
+    def page(request: Request) -> Response:
+        headers = {"ETag": ETAG, "Cache-Control": "no-cache"}
+        if _etag_matches(request.headers.get("if-none-match"), ETAG):
+            return Response(status_code=304, headers=headers)
+        return Response(content=BODY, media_type="application/json", headers=headers)
+
+    @app.get("/weak")
+    def weak() -> Response:
+        return Response(content=BODY, media_type="application/json", headers={"ETag": 'W/"weak-1"'})
+
+    @app.get("/small")
+    def small() -> Response:
+        return Response(content=b'{"ok": true}', media_type="application/json", headers={"ETag": ETAG})
+
+    return CompressionMiddleware(app, min_bytes=1024)
+
+
+@pytest.fixture
+def client(middleware: CompressionMiddleware) -> TestClient:
+    return TestClient(middleware)
+
+
+def test_compressed_response_gets_weak_etag(client: TestClient) -> None:
+    r = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    assert r.status_code == 200
+    assert r.headers["content-encoding"] == "gzip"
+    assert r.headers["vary"] == "Accept-Encoding"
+    assert r.headers["etag"] == f"W/{ETAG}"
+    assert int(r.headers["content-length"]) < len(BODY)
+    assert r.content == BODY
+
+
+def test_uncompressed_responses_keep_strong_etag(client: TestClient) -> None:
+    r = client.get("/page", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["etag"] == ETAG and r.content == BODY
+    r = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in r.headers
+    assert r.headers["etag"] == ETAG
+
+
+def test_weak_etag_from_compressed_response_gives_304(client: TestClient) -> None:
+    etag = client.get("/page", headers={"Accept-Encoding": "gzip"}).headers["etag"]
+    r = client.get("/page", headers={"Accept-Encoding": "gzip", "If-None-Match": etag})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert "content-encoding" not in r.headers
+    r = client.get("/page", headers={"Accept-Encoding": "gzip", "If-None-Match": '"other", ' + etag})
+    assert r.status_code == 304
+    assert client.get("/page", headers={"Accept-Encoding": "gzip", "If-None-Match": '"other"'}).status_code == 200
+
+
+def test_strong_etag_bodies_are_compressed_once(middleware: CompressionMiddleware, client: TestClient) -> None:
+    first = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/page", headers={"Accept-Encoding": "gzip"})
+    assert first.content == second.content == BODY
+    assert list(middleware._cache) == [(ETAG.encode(), "gzip")]
+    client.get("/weak", headers={"Accept-Encoding": "gzip"})
+    assert len(middleware._cache) == 1
+
+
+def test_accept_encoding_weights() -> None:
+    assert parse_accept_encoding("gzip;q=0, br;q=0.5, identity") == {"gzip": 0.0, "br": 0.5, "identity": 1.0}
+    assert CompressionMiddleware(None).choose_encoding("gzip;q=0") is None
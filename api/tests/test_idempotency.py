@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+
+import aiosqlite
+import pytest
+from fastapi import HTTPException
+
+from app.api.idempotency import IdempotencyRecord, IdempotencyStore
+from app.api.write_queue import run_write
+from app.db.database import Database
+
+
+def _create_order(db: Database, calls: list[int]):
+    """execute для IdempotencyStore.run: заказ и ответ в одной транзакции, как в OrdersWriteRepo."""
+
+    async def execute(record: IdempotencyRecord) -> dict:
+        async def op(conn: aiosqlite.Connection) -> dict:
+            cur = await conn.execute(
+                "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (1, ?, 'new', 100)",
+                (record.user_id,),
+            )
+            result = {"order_id": cur.lastrowid}
+            calls.append(cur.lastrowid)
+            await record.save(conn, result)
+            return result
+
+        return await run_write(db, None, op)
+
+    return execute
+
+
+def _orders(db: Database) -> int:
+    conn = sqlite3.connect(db.config.path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM orders").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_replay_returns_stored_result(database: Database) -> None:
+    store, calls = IdempotencyStore(), []
+
+    async def scenario() -> None:
+        first = await store.run(database, 5, "k1", "hash", _create_order(database, calls))
+        again = await store.run(database, 5, "k1", "hash", _create_order(database, calls))
+        assert first == ({"order_id": calls[0]}, False)
+        assert again == ({"order_id": calls[0]}, True)
+        # Тот же ключ другого пользователя — другой запрос.
+        other = await store.run(database, 6, "k1", "hash", _create_order(database, calls))
+        assert other[1] is False and other[0] != first[0]
+
+    asyncio.run(scenario())
+    assert len(calls) == 2 and store.replayed == 1 and _orders(database) == 2
+
+
+def test_same_key_other_body_rejected(database: Database) -> None:
+    store, calls = IdempotencyStore(), []
+
+    async def scenario() -> None:
+        await store.run(database, 5, "k1", "hash", _create_order(database, calls))
+        with pytest.raises(HTTPException) as exc:
+            await store.run(database, 5, "k1", "other-hash", _create_order(database, calls))
+        assert exc.value.status_code == 422
+
+    asyncio.run(scenario())
+    assert len(calls) == 1
+
+
+def test_concurrent_retries_execute_once(database: Database) -> None:
+    store, calls = IdempotencyStore(), []
+
+    async def scenario() -> list[tuple[dict, bool]]:
+        return await asyncio.gather(
+            *(store.run(database, 5, "k1", "hash", _create_order(database, calls)) for _ in range(5))
+        )
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert {r[0]["order_id"] for r in results} == {calls[0]}
+    assert sorted(r[1] for r in results) == [False, True, True, True, True]
+
+
+def test_conflict_from_other_worker_rolls_back_and_replays(database: Database) -> None:
+    # Два воркера — два хранилища: второй успевает записать тот же ключ, пока первый выполняет запрос.
+    first, second, calls = IdempotencyStore(), IdempotencyStore(), []
+
+    async def scenario() -> tuple[dict, bool]:
+        async def other_worker() -> None:
+            other = Database(database.config)
+            await second.run(other, 5, "k1", "hash", _create_order(other, calls))
+
+        loser = _create_order(database, calls)
+
+        async def execute(record: IdempotencyRecord) -> dict:
+            await other_worker()
+            return await loser(record)
+
+        return await first.run(database, 5, "k1", "hash", execute)
+
+    result, replayed = asyncio.run(scenario())
+    assert replayed is True
+    assert result == {"order_id": calls[0]}
+    # Заказ проигравшего откатился вместе с его попыткой сохранить ключ.
+    assert len(calls) == 2 and _orders(database) == 1
+
+
+def test_expired_key_runs_again(database: Database) -> None:
+    store, calls = IdempotencyStore(ttl_seconds=60), []
+
+    async def scenario() -> None:
+        await store.run(database, 5, "k1", "hash", _create_order(database, calls))
+        conn = sqlite3.connect(database.config.path)
+        conn.execute("UPDATE api_idempotency SET created_at = created_at - 120")
+        conn.commit()
+        conn.close()
+        result, replayed = await store.run(database, 5, "k1", "hash", _create_order(database, calls))
+        assert replayed is False and result == {"order_id": calls[1]}
+
+    asyncio.run(scenario())
+    assert len(calls) == 2
@@ -0,0 +1,85 @@
+from __future__ import annotations
+
+import random
+import sqlite3
+
+from app.api.migrations import _stats_inserts
+
+STATUSES = ["new", "accepted", "delivering", "done", "cancelled"]
+
+# Триггеры оставляют строки с нулями после переноса заказа — пересборка их не создаёт.
+SNAPSHOTS = {
+    "api_stats_daily": "SELECT shop_id, day, status, orders, ROUND(revenue, 6) FROM api_stats_daily WHERE orders != 0",
+    "api_stats_hourly": "SELECT shop_id, hour, status, orders, ROUND(revenue, 6) FROM api_stats_hourly WHERE orders != 0",
+    "api_stats_products": """
+        SELECT shop_id, day, status, product_id, quantity, ROUND(revenue, 6) FROM api_stats_products
+        WHERE quantity != 0 OR ROUND(revenue, 6) != 0
+    """,
+}
+
+
+def _snapshot(conn: sqlite3.Connection) -> dict[str, list[tuple]]:
+    return {table: sorted(conn.execute(sql).fetchall()) for table, sql in SNAPSHOTS.items()}
+
+
+def _rebuild(conn: sqlite3.Connection) -> dict[str, list[tuple]]:
+    for table in SNAPSHOTS:
+        conn.execute(f"DELETE FROM {table}")
+    for statement in _stats_inserts("1"):
+        conn.execute(statement)
+    return _snapshot(conn)
+
+
+def _created_at(rnd: random.Random) -> str:
+    return f"2026-06-{rnd.randint(1, 3):02d} {rnd.randrange(24):02d}:{rnd.randrange(60):02d}:00"
+
+
+def _random_history(conn: sqlite3.Connection, steps: int) -> None:
+    rnd = random.Random(5)
+    for step in range(steps):
+        orders = [r[0] for r in conn.execute("SELECT id FROM orders")]
+        items = [r[0] for r in conn.execute("SELECT id FROM order_items")]
+        action = rnd.random()
+        if action < 0.3 or not orders:
+            cur = conn.execute(
+                "INSERT INTO orders(shop_id, client_user_id, status, total_amount, created_at) VALUES (?, 5, ?, ?, ?)",
+                (rnd.randint(1, 3), rnd.choice(STATUSES), round(rnd.uniform(50, 500), 2), _created_at(rnd)),
+            )
+            conn.executemany(
+                "INSERT INTO order_items(order_id, product_id, quantity, price_at_moment) VALUES (?, ?, ?, ?)",
+                ((cur.lastrowid, rnd.randint(1, 8), rnd.randint(1, 3), round(rnd.uniform(10, 90), 2)) for _ in range(2)),
+            )
+        elif action < 0.5:
+            conn.execute("UPDATE orders SET status = ? WHERE id = ?", (rnd.choice(STATUSES), rnd.choice(orders)))
+        elif action < 0.55:
+            conn.execute("UPDATE orders SET shop_id = ? WHERE id = ?", (rnd.randint(1, 3), rnd.choice(orders)))
+        elif action < 0.6:
+            conn.execute("UPDATE orders SET created_at = ? WHERE id = ?", (_created_at(rnd), rnd.choice(orders)))
+        elif action < 0.65:
+            conn.execute("UPDATE orders SET total_amount = total_amount + 1 WHERE id = ?", (rnd.choice(orders),))
+        elif action < 0.7:
+            conn.execute("UPDATE orders SET comment = ? WHERE id = ?", (f"#{step}", rnd.choice(orders)))
+        elif action < 0.8 and items:
+            conn.execute("UPDATE order_items SET quantity = quantity + 1 WHERE id = ?", (rnd.choice(items),))
+        elif action < 0.85 and items:
+            conn.execute("UPDATE order_items SET order_id = ? WHERE id = ?", (rnd.choice(orders), rnd.choice(items)))
+        elif action < 0.9 and items:
+            conn.execute("DELETE FROM order_items WHERE id = ?", (rnd.choice(items),))
+        else:
+            order_id = rnd.choice(orders)
+            conn.execute("DELETE FROM order_items WHERE order_id = ?", (order_id,))
+            conn.execute("DELETE FROM orders WHERE id = ?", (order_id,))
+    conn.commit()
+
+
+def test_triggers_match_rebuild(conn: sqlite3.Connection) -> None:
+    _random_history(conn, 600)
+    by_triggers = _snapshot(conn)
+    assert all(by_triggers.values())
+    assert _rebuild(conn) == by_triggers
+
+
+def test_no_negative_counters(conn: sqlite3.Connection) -> None:
+    _random_history(conn, 600)
+    assert conn.execute("SELECT COUNT(*) FROM api_stats_daily WHERE orders < 0").fetchone()[0] == 0
+    assert conn.execute("SELECT COUNT(*) FROM api_stats_products WHERE quantity < 0").fetchone()[0] == 0
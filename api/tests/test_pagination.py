@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import pagination
+from app.api.pagination import Keyset, parse_sort, sort_options
+
+
+@pytest.fixture(autouse=True)
+def cursor_secret(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("API_CURSOR_SECRET", "test-secret")
+    monkeypatch.setattr(pagination, "_cursor_mac", None)
+
+
+KEYSET = Keyset("orders:created_at", ("o.created_at", "o.id"))
+
+
+def _assert_rejected(keyset: Keyset, cursor: str, filters: tuple = ()) -> None:
+    with pytest.raises(HTTPException) as exc:
+        keyset.decode(cursor, filters)
+    assert exc.value.status_code == 400
+
+
+def test_round_trip() -> None:
+    cursor = KEYSET.encode(["2026-05-01 10:00:00", 42], ("new",))
+    assert KEYSET.decode(cursor, ("new",)) == ["2026-05-01 10:00:00", 42]
+    assert KEYSET.decode(None) is None
+    assert KEYSET.decode("") is None
+
+
+def test_tampered_values_rejected() -> None:
+    payload, signature = KEYSET.encode(["2026-05-01 10:00:00", 42]).split(".")
+    forged = base64.urlsafe_b64encode(json.dumps(["2026-05-01 10:00:00", 1]).encode()).rstrip(b"=").decode()
+    _assert_rejected(KEYSET, f"{forged}.{signature}")
+    _assert_rejected(KEYSET, f"{payload}.{signature[:-2]}AA")
+    _assert_rejected(KEYSET, payload)
+    _assert_rejected(KEYSET, "не-base64.подпись")
+
+
+def test_cursor_bound_to_sort_and_filters() -> None:
+    options = sort_options("orders", {"created_at": ("o.created_at", "o.id")})
+    cursor = options["created_at"].encode(["2026-05-01 10:00:00", 42], ("new",))
+    _assert_rejected(options["-created_at"], cursor, ("new",))
+    _assert_rejected(options["created_at"], cursor, ("done",))
+    _assert_rejected(Keyset("chats:created_at", KEYSET.columns), cursor, ("new",))
+
+
+def test_cursor_bound_to_secret(monkeypatch: pytest.MonkeyPatch) -> None:
+    cursor = KEYSET.encode(["2026-05-01 10:00:00", 42])
+    monkeypatch.setenv("API_CURSOR_SECRET", "other-secret")
+    monkeypatch.setattr(pagination, "_cursor_mac", None)
+    _assert_rejected(KEYSET, cursor)
+
+
+def test_wrong_key_width_rejected() -> None:
+    cursor = Keyset(KEYSET.name, ("o.id",)).encode([42])
+    _assert_rejected(KEYSET, cursor)
+
+
+def test_predicate_and_order() -> None:
+    descending = parse_sort("-created_at", sort_options("orders", {"created_at": KEYSET.columns}), "created_at")
+    assert descending.predicate(False) == "1"
+    assert descending.predicate(True) == "(o.created_at, o.id) < (?, ?)"
+    assert descending.order_by() == "o.created_at DESC, o.id DESC"
+    with pytest.raises(HTTPException):
+        parse_sort("price", {"id": KEYSET}, "id")
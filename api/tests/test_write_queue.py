@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+
+import aiosqlite
+import pytest
+from fastapi import HTTPException
+
+from app.api.write_queue import GroupCommitWriter
+from app.db.database import Database
+
+
+def _insert(client_user_id: int, fail: bool = False):
+    async def op(conn: aiosqlite.Connection) -> int:
+        cur = await conn.execute(
+            "INSERT INTO orders(shop_id, client_user_id, status, total_amount) VALUES (1, ?, 'new', 100)",
+            (client_user_id,),
+        )
+        if fail:
+            raise ValueError("отказ операции")
+        return cur.lastrowid
+
+    return op
+
+
+def _clients(db: Database) -> list[int]:
+    conn = sqlite3.connect(db.config.path)
+    try:
+        return [r[0] for r in conn.execute("SELECT client_user_id FROM orders ORDER BY id")]
+    finally:
+        conn.close()
+
+
+def test_failed_op_rolls_back_only_its_savepoint(database: Database) -> None:
+    queue = GroupCommitWriter()
+
+    async def scenario() -> list:
+        loop = asyncio.get_running_loop()
+        batch = [(_insert(client), loop.create_future()) for client in (1, 2, 3)]
+        batch[1] = (_insert(2, fail=True), batch[1][1])
+        await queue._commit(database, batch)
+        return [future.exception() or future.result() for _, future in batch]
+
+    first, failed, third = asyncio.run(scenario())
+    assert isinstance(failed, ValueError)
+    assert isinstance(first, int) and isinstance(third, int)
+    assert _clients(database) == [1, 3]
+    assert queue.batches == 1 and queue.ops == 3
+
+
+def test_cancelled_op_is_skipped(database: Database) -> None:
+    queue = GroupCommitWriter()
+
+    async def scenario() -> None:
+        loop = asyncio.get_running_loop()
+        batch = [(_insert(client), loop.create_future()) for client in (1, 2)]
+        batch[0][1].cancel()
+        await queue._commit(database, batch)
+        assert isinstance(batch[1][1].result(), int)
+
+    asyncio.run(scenario())
+    assert _clients(database) == [2]
+
+
+def test_queued_writes_share_one_commit(database: Database) -> None:
+    queue = GroupCommitWriter(max_batch=64)
+
+    async def scenario() -> list:
+        submits = [asyncio.create_task(queue.submit(_insert(client, fail=client == 3))) for client in range(1, 6)]
+        await asyncio.sleep(0)
+        queue.start(database)
+        results = await asyncio.gather(*submits, return_exceptions=True)
+        await queue.stop()
+        return results
+
+    results = asyncio.run(scenario())
+    assert isinstance(results[2], ValueError)
+    assert _clients(database) == [1, 2, 4, 5]
+    assert queue.batches == 1 and queue.largest_batch == 5
+
+
+def test_full_queue_rejects(database: Database) -> None:
+    queue = GroupCommitWriter(max_queue=1)
+
+    async def scenario() -> None:
+        pending = asyncio.create_task(queue.submit(_insert(1)))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as exc:
+            await queue.submit(_insert(2))
+        assert exc.value.status_code == 503
+        queue.start(database)
+        await pending
+        await queue.stop()
+
+    asyncio.run(scenario())
+    assert queue.rejected == 1 and _clients(database) == [1]
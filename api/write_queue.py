@@ -0,0 +1,153 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+import aiosqlite
+from fastapi import HTTPException, Request
+
+from app.db.database import Database
+
+
+logger = logging.getLogger(__name__)
+
+WriteOp = Callable[[aiosqlite.Connection], Awaitable[Any]]
+
+
+async def run_write(db: Database, queue: GroupCommitWriter | None, op: WriteOp) -> Any:
+    """Одна пишущая операция: через очередь group commit, если она включена, иначе своей транзакцией.
+
+    В обоих случаях результат возвращается только после COMMIT.
+    """
+    if queue is not None:
+        return await queue.submit(op)
+    async with db.conn() as conn:
+        # IMMEDIATE сразу берёт блокировку записи и не апгрейдит её посреди транзакции.
+        await conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = await op(conn)
+        except BaseException:
+            await conn.rollback()
+            raise
+        await conn.commit()
+    return result
+
+
+class GroupCommitWriter:
+    """Очередь записей с group commit: одна транзакция SQLite на пачку запросов.
+
+    Запросы кладут операцию в ограниченную очередь и ждут future. Фоновая задача
+    забирает всё, что накопилось (не больше `max_batch`), выполняет операции в одной
+    транзакции — каждую в своём SAVEPOINT, чтобы ошибка одной не откатывала соседей, —
+    и резолвит future только после COMMIT. Искусственной задержки нет: пачка
+    собирается сама, пока предыдущая коммитится.
+    """
+
+    def __init__(self, max_queue: int = 1000, max_batch: int = 64) -> None:
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue[tuple[WriteOp, asyncio.Future]] = asyncio.Queue(maxsize=max_queue)
+        self._task: asyncio.Task[None] | None = None
+        self.batches = 0
+        self.ops = 0
+        self.largest_batch = 0
+        self.rejected = 0
+
+    async def submit(self, op: WriteOp) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((op, future))
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Сервер перегружен, повторите запрос позже",
+                headers={"Retry-After": "1"},
+            ) from None
+        return await future
+
+    def start(self, db: Database) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(db))
+
+    async def stop(self) -> None:
+        """Дописывает уже принятые операции и останавливает задачу."""
+        if self._task is None:
+            return
+        with contextlib.suppress(asyncio.TimeoutError):
+            await asyncio.wait_for(self._queue.join(), timeout=10)
+        self._task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await self._task
+        self._task = None
+
+    async def _run(self, db: Database) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._commit(db, batch)
+            except Exception:
+                logger.exception("Не удалось записать пачку из %d операций", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _commit(self, db: Database, batch: list[tuple[WriteOp, asyncio.Future]]) -> None:
+        outcomes: list[tuple[bool, Any]] = []
+        try:
+            async with db.conn() as conn:
+                await conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for op, future in batch:
+                        if future.cancelled():
+                            # Клиент ушёл до записи: ответ никому не нужен, операцию не выполняем.
+                            outcomes.append((False, None))
+                            continue
+                        await conn.execute("SAVEPOINT write_op")
+                        try:
+                            value = await op(conn)
+                        except Exception as exc:
+                            await conn.execute("ROLLBACK TO write_op")
+                            await conn.execute("RELEASE write_op")
+                            outcomes.append((False, exc))
+                        else:
+                            await conn.execute("RELEASE write_op")
+                            outcomes.append((True, value))
+                except BaseException:
+                    await conn.rollback()
+                    raise
+                await conn.commit()
+        except Exception as exc:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(exc)
+            raise
+
+        self.batches += 1
+        self.ops += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        for (_, future), (ok, value) in zip(batch, outcomes):
+            if future.done():
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+
+    def stats(self) -> dict[str, int | float]:
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "ops": self.ops,
+            "avg_batch": round(self.ops / self.batches, 2) if self.batches else 0.0,
+            "largest_batch": self.largest_batch,
+            "rejected": self.rejected,
+        }
+
+
+def get_write_queue(request: Request) -> GroupCommitWriter | None:
+    return getattr(request.app.state, "write_queue", None)